@@ -22,6 +22,15 @@ echo "Loading initial data..."
 
 python manage.py loaddata /app/database_export.json || echo "Data already loaded or file not found, continuing..."
 
+# Rebuild precomputed ranking summary (kept up to date by signals afterwards)
+echo "Refreshing ranking summary..."
+python manage.py refresh_ranking_summary || echo "Ranking summary refresh failed, continuing..."
+python manage.py refresh_major_leaderboard || echo "Major leaderboard refresh failed, continuing..."
+
+# Trigram search indexes (PostgreSQL only, no-op elsewhere)
+echo "Creating search indexes..."
+python manage.py create_search_indexes || echo "Search index creation failed, continuing..."
+
 # Run migrations (safe to run multiple times)
 echo "Running database migrations..."
 python manage.py migrate --noinput || echo "Migrations failed, but continuing..."
@@ -32,6 +41,12 @@ python manage.py migrate --noinput || echo "Migrations failed, but continuing...
 echo "Collecting static files..."
 python manage.py collectstatic --noinput || echo "Static collection failed, but continuing..."
 
+# Shared embedding sidecar is started and supervised by gunicorn.conf.py when running
+# more than one worker (EMBEDDING_SIDECAR=auto); with a single worker it stays off
+
+# Load the chatbot in each worker right after boot (see /healthz/ready)
+export CHATBOT_WARMUP_ON_BOOT="${CHATBOT_WARMUP_ON_BOOT:-True}"
+
 # Start Gunicorn
 echo "Starting Gunicorn on 0.0.0.0:$PORT..."
 exec gunicorn university_project.wsgi \
@@ -4,9 +4,73 @@ Pre-download ML models during build phase to avoid runtime OOM
 This downloads models to cache, so they don't need to be downloaded when app starts
 """
 
+import json
 import os
 import sys
 
+MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# Bản export ONNX int8 cho EMBEDDING_BACKEND=onnx-int8
+# (tên file phải khớp với university_app/services/embeddings.py)
+ONNX_DIR = os.getenv(
+    'EMBEDDING_ONNX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'onnx', MODEL_NAME)
+)
+ONNX_MODEL_FILE = 'model_quantized.onnx'
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+
+def export_onnx_int8(model, output_dir):
+    """
+    Export transformer của SentenceTransformer sang ONNX rồi lượng tử hóa động sang int8
+
+    Mean pooling làm ở runtime (numpy) nên chỉ export token embeddings.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = model.tokenizer
+    transformer = model[0].auto_model.eval()
+    fp32_path = os.path.join(output_dir, 'model_fp32.onnx')
+
+    sample = tokenizer(["Trường đại học tốt nhất cho Computer Science"], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            (sample['input_ids'], sample['attention_mask']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['token_embeddings'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'token_embeddings': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=14,
+        )
+
+    quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': MODEL_NAME,
+            'max_length': model.max_seq_length,
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+        }, f, indent=2)
+
+
 def main():
     print("=" * 60)
     print("  Pre-downloading ML Models for Chatbot")
@@ -29,7 +93,7 @@ def main():
     try:
         from sentence_transformers import SentenceTransformer
 
-        model_name = "paraphrase-multilingual-MiniLM-L12-v2"
+        model_name = MODEL_NAME
         print(f"   → Initializing SentenceTransformer('{model_name}')...")
         model = SentenceTransformer(model_name)
 
@@ -45,7 +109,20 @@ def main():
         traceback.print_exc()
         return False
 
-    # 2. Verify ChromaDB is importable (no need to initialize)
+    # 2. Export int8-quantized ONNX model (optional backend, PyTorch not needed at runtime)
+    print("📦 Exporting int8-quantized ONNX model...")
+    print(f"   Output: {ONNX_DIR}")
+    try:
+        export_onnx_int8(model, ONNX_DIR)
+        size_mb = os.path.getsize(os.path.join(ONNX_DIR, ONNX_MODEL_FILE)) / 1024 / 1024
+        print(f"✅ ONNX int8 model ready ({size_mb:.0f}MB)")
+        print()
+    except Exception as e:
+        print(f"⚠️ ONNX export warning: {type(e).__name__}: {e}")
+        print("   (EMBEDDING_BACKEND=onnx-int8 will fall back to sentence-transformers)")
+        print()
+
+    # 3. Verify ChromaDB is importable (no need to initialize)
     print("📦 Verifying ChromaDB installation...")
     try:
         import chromadb
@@ -56,7 +133,7 @@ def main():
         print("   (This is OK, will work at runtime)")
         print()
 
-    # 3. Verify Google Generative AI (no API call, just import)
+    # 4. Verify Google Generative AI (no API call, just import)
     print("📦 Verifying Google Generative AI...")
     try:
         import google.generativeai as genai
@@ -0,0 +1,82 @@
+"""
+Gunicorn hooks (gunicorn tự đọc file này khi chạy từ thư mục gốc project)
+Các tham số bind/workers/timeout vẫn truyền trên command line như trước.
+
+Embedding sidecar (EMBEDDING_SIDECAR=auto|on|off, mặc định auto): khi chạy nhiều worker,
+master khởi động `manage.py run_embedding_server` để model embedding chỉ nạp một lần
+cho mọi worker, theo dõi và khởi động lại nếu nó thoát. Với một worker (auto) sidecar
+chỉ thêm một process Django nên không bật; worker tự nạp model như trước.
+"""
+import os
+import subprocess
+import sys
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_EMBEDDING_SOCKET = '/tmp/embedding.sock'
+# Chờ trước khi khởi động lại sidecar: tăng gấp đôi sau mỗi lần thoát, tối đa 30 giây
+SIDECAR_RESTART_DELAYS = (1, 2, 4, 8, 16, 30)
+
+_sidecar_stop = threading.Event()
+_sidecar_process = None
+
+
+def _sidecar_enabled(workers: int) -> bool:
+    mode = os.getenv('EMBEDDING_SIDECAR', 'auto').lower()
+    if mode == 'on':
+        return True
+    if mode == 'off':
+        return False
+    return workers > 1
+
+
+def _supervise_sidecar(server, socket_path):
+    """Chạy sidecar, khởi động lại khi nó thoát cho tới khi gunicorn dừng"""
+    global _sidecar_process
+
+    restarts = 0
+    while not _sidecar_stop.is_set():
+        _sidecar_process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'run_embedding_server', '--socket', socket_path],
+            cwd=BASE_DIR,
+        )
+        code = _sidecar_process.wait()
+        if _sidecar_stop.is_set():
+            return
+        delay = SIDECAR_RESTART_DELAYS[min(restarts, len(SIDECAR_RESTART_DELAYS) - 1)]
+        server.log.warning(f"Embedding sidecar thoát (mã {code}), khởi động lại sau {delay}s")
+        restarts += 1
+        _sidecar_stop.wait(delay)
+
+
+def on_starting(server):
+    if not _sidecar_enabled(server.cfg.workers):
+        return
+    # Worker được fork sau hook này nên kế thừa biến môi trường và kết nối tới sidecar
+    socket_path = os.environ.setdefault('EMBEDDING_SERVER_SOCKET', DEFAULT_EMBEDDING_SOCKET)
+    server.log.info(f"Khởi động embedding sidecar tại {socket_path} cho {server.cfg.workers} worker")
+    threading.Thread(
+        target=_supervise_sidecar, args=(server, socket_path), name='embedding-sidecar', daemon=True
+    ).start()
+
+
+def on_exit(server):
+    _sidecar_stop.set()
+    if _sidecar_process is not None and _sidecar_process.poll() is None:
+        _sidecar_process.terminate()
+        try:
+            _sidecar_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _sidecar_process.kill()
+
+
+def post_worker_init(worker):
+    # Worker đã nạp Django và sắp nhận request: nạp trước thư viện AI trong thread nền
+    # nếu AI_PRELOAD_DEPENDENCIES=True, để request chatbot/so sánh đầu tiên không phải chờ import
+    from university_app.services.ai_dependencies import start_background_preload
+    from university_app.services.chatbot import start_warmup
+
+    start_background_preload()
+    # Nạp hẳn chatbot (model, Chroma, truy vấn thử) nếu CHATBOT_WARMUP_ON_BOOT=True;
+    # /healthz/ready trả 503 cho tới khi xong
+    start_warmup()
@@ -1,10 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.db.models import Count, Avg
 from .models import (
     Country, University, Major, Program, Criteria,
     RankingSource, Ranking, UniversityAdmissionRequirement,
-    UniversityProgram
+    UniversityProgram, AIAnalysisCache
+)
+from .services.analysis_cache import (
+    evict_analysis_cache, purge_analysis_cache, get_analysis_cache_stats
 )
 
 # Customize Admin Site
@@ -239,4 +242,39 @@ class UniversityProgramAdmin(admin.ModelAdmin):
         if obj.duration:
             return format_html('<span style="background:#fce4ec;padding:4px 12px;border-radius:12px;color:#c2185b;font-weight:500;">⏱️ {} năm</span>', obj.duration)
         return '-'
-    duration_badge.short_description = 'Thời gian' 
+    duration_badge.short_description = 'Thời gian'
+
+@admin.register(AIAnalysisCache)
+class AIAnalysisCacheAdmin(admin.ModelAdmin):
+    list_display = ('major', 'university_ids', 'hit_badge', 'created_at', 'last_accessed', 'expires_at')
+    search_fields = ('major', 'university_ids')
+    ordering = ('-last_accessed',)
+    readonly_fields = ('cache_key', 'university_ids', 'major', 'analysis', 'hit_count', 'created_at', 'last_accessed', 'expires_at')
+    list_per_page = 25
+    actions = ('purge_expired', 'purge_all')
+
+    def has_add_permission(self, request):
+        return False
+
+    def hit_badge(self, obj):
+        return format_html('<span style="background:#e8f5e9;padding:4px 12px;border-radius:12px;font-weight:500;color:#2e7d32;">♻️ {}</span>', obj.hit_count)
+    hit_badge.short_description = 'Số lần dùng lại'
+
+    def changelist_view(self, request, extra_context=None):
+        stats = get_analysis_cache_stats()
+        extra_context = extra_context or {}
+        extra_context['subtitle'] = (
+            f"Hit: {stats['hits']} · Miss: {stats['misses']} · "
+            f"Tỷ lệ hit: {stats['hit_rate']:.0%} · {stats['entries']} bản ghi"
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+    @admin.action(description='Xóa bản hết hạn / vượt giới hạn')
+    def purge_expired(self, request, queryset):
+        deleted = evict_analysis_cache()
+        self.message_user(request, f'Đã xóa {deleted} bản cache phân tích.', messages.SUCCESS)
+
+    @admin.action(description='Xóa TOÀN BỘ cache phân tích AI')
+    def purge_all(self, request, queryset):
+        deleted = purge_analysis_cache()
+        self.message_user(request, f'Đã xóa toàn bộ {deleted} bản cache phân tích.', messages.SUCCESS)
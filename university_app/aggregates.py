@@ -0,0 +1,40 @@
+"""
+Aggregate dùng chung cho nhiều database backend
+(PostgreSQL production, SQL Server local, SQLite khi chạy test)
+"""
+from django.db.models import Aggregate, Func, TextField, Value
+
+
+class GroupConcat(Aggregate):
+    """
+    Nối các giá trị trong nhóm thành một chuỗi
+
+    STRING_AGG trên PostgreSQL / SQL Server, GROUP_CONCAT trên SQLite.
+    Không hỗ trợ DISTINCT (SQL Server không cho phép) - lọc trùng ở Python.
+    SQL Server trả kết quả cùng kiểu với cột (NVARCHAR(n)) và báo lỗi khi vượt 8000 byte,
+    nên ép sang NVARCHAR(MAX) trước khi nối.
+    """
+    function = 'STRING_AGG'
+    output_field = TextField()
+
+    def __init__(self, expression, separator='|', **extra):
+        super().__init__(expression, Value(separator), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='GROUP_CONCAT', **extra_context)
+
+    def as_microsoft(self, compiler, connection, **extra_context):
+        clone = self.copy()
+        expressions = clone.get_source_expressions()
+        expressions[0] = Func(
+            expressions[0], template='CAST(%(expressions)s AS NVARCHAR(MAX))', output_field=TextField()
+        )
+        clone.set_source_expressions(expressions)
+        return super(GroupConcat, clone).as_sql(compiler, connection, **extra_context)
+
+
+def split_group_concat(value, separator='|'):
+    """Tách chuỗi GroupConcat thành list, bỏ giá trị rỗng và trùng lặp (giữ thứ tự)"""
+    if not value:
+        return []
+    return list(dict.fromkeys(item for item in value.split(separator) if item))
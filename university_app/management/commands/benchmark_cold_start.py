@@ -0,0 +1,94 @@
+"""
+Management command to measure cold-start time-to-first-byte
+Starts fresh interpreters that load the WSGI app and serve one request, with the AI
+libraries imported lazily (current behaviour) or eagerly at boot (previous behaviour)
+Usage: python manage.py benchmark_cold_start [--path /] [--runs 3]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from university_app.services.ai_dependencies import HEAVY_MODULES, PRELOAD_MODULES
+from university_app.services.import_audit import find_modules, measure_imports, DJANGO_BOOT
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Process con: nạp WSGI app như gunicorn worker, phục vụ một request, in mốc thời gian (epoch)
+CHILD_SCRIPT = """
+import importlib, json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+eager, path, host = sys.argv[1] == 'eager', sys.argv[2], sys.argv[3]
+from university_project.wsgi import application
+if eager:
+    for name in {modules!r}:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+booted = time.time()
+
+environ = {{'PATH_INFO': path, 'HTTP_HOST': host, 'SERVER_NAME': host}}
+setup_testing_defaults(environ)
+status = []
+body = iter(application(environ, lambda s, h, exc_info=None: status.append(s)))
+next(body, b'')
+first_byte = time.time()
+print(json.dumps({{'booted': booted, 'first_byte': first_byte, 'status': status[0]}}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start TTFB with lazy vs eager AI imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL path requested after boot')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts per mode')
+        parser.add_argument('--host', default=settings.ALLOWED_HOSTS[0], help='Host header')
+
+    def _cold_start(self, mode, path, host):
+        script = CHILD_SCRIPT.format(modules=PRELOAD_MODULES)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='university_project.settings')
+        started = time.time()
+        result = subprocess.run(
+            [sys.executable, '-c', script, mode, path, host],
+            capture_output=True, text=True, timeout=300, env=env,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        return timings['booted'] - started, timings['first_byte'] - started, timings['status']
+
+    def handle(self, *args, **options):
+        heavy = find_modules(measure_imports(DJANGO_BOOT), HEAVY_MODULES)
+        if heavy:
+            self.stdout.write(self.style.WARNING(f'⚠ Boot imports heavy modules: {", ".join(sorted(heavy))}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Boot imports no AI/vector libraries'))
+
+        results = {}
+        for mode in ('eager', 'lazy'):
+            boots, ttfbs = [], []
+            for _ in range(options['runs']):
+                try:
+                    boot, ttfb, status = self._cold_start(mode, options['path'], options['host'])
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'✗ {mode}: {e}'))
+                    return
+                boots.append(boot)
+                ttfbs.append(ttfb)
+            results[mode] = (boots, ttfbs, status)
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f'Cold start: GET {options["path"]} x {options["runs"]} runs'))
+        for mode, (boots, ttfbs, status) in results.items():
+            self.stdout.write('')
+            self.stdout.write(f'{mode} imports (status {status}):')
+            self.stdout.write(f'  - worker boot: {statistics.mean(boots) * 1000:.0f} ms')
+            self.stdout.write(f'  - TTFB from process start: {statistics.mean(ttfbs) * 1000:.0f} ms')
+
+        saved = statistics.mean(results['eager'][1]) - statistics.mean(results['lazy'][1])
+        self.stdout.write('')
+        self.stdout.write(f'TTFB saved by lazy imports: {saved * 1000:.0f} ms')
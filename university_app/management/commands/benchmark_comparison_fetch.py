@@ -0,0 +1,111 @@
+"""
+Management command to benchmark the comparison data fetch of AIAnalysisService
+Resolves 5 / 50 / 500 schools in one batch and one school at a time, reporting query
+count and latency; --synthetic measures on generated rows inside a rolled-back transaction
+Usage: python manage.py benchmark_comparison_fetch [--sizes 5 50 500] [--major NAME] [--runs 3] [--synthetic]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from university_app.models import (
+    Country, Criteria, Major, Program, Ranking, RankingSource, University,
+    UniversityAdmissionRequirement, UniversityProgram
+)
+from university_app.services.ai_analysis import AIAnalysisService
+from university_app.services.ranking_summary import refresh_ranking_summary
+import statistics
+import time
+
+SYNTHETIC_MAJOR = 'Benchmark Major'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batched vs per-school comparison data fetch (queries, latency)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[5, 50, 500], help='Schools per request')
+        parser.add_argument('--major', help='Major to compare (default: major with most programs)')
+        parser.add_argument('--runs', type=int, default=3, help='Timing repetitions per size')
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Generate max(sizes) schools in a transaction that is rolled back')
+
+    def _create_synthetic(self, count):
+        """Dữ liệu mẫu bằng bulk_create (không chạy signals), rồi tính xếp hạng tổng hợp một lần"""
+        country = Country.objects.create(name='Benchmark Country')
+        source = RankingSource.objects.create(name='Benchmark Source')
+        program = Program.objects.create(name='Benchmark Program', level='Bachelor')
+        major = Major.objects.create(name=SYNTHETIC_MAJOR)
+        ielts = Criteria.objects.create(name='IELTS', unit='')
+
+        universities = University.objects.bulk_create([
+            University(name=f'Benchmark University {i}', short_name=f'BU{i}', country=country)
+            for i in range(count)
+        ])
+        Ranking.objects.bulk_create([
+            Ranking(university=uni, ranking_sources=source, fyear=2024, frank=i + 1)
+            for i, uni in enumerate(universities)
+        ])
+        UniversityProgram.objects.bulk_create([
+            UniversityProgram(university=uni, program=program, major=major, tuition_fee=20000 + i, duration='4')
+            for i, uni in enumerate(universities)
+        ])
+        UniversityAdmissionRequirement.objects.bulk_create([
+            UniversityAdmissionRequirement(university=uni, criteria=ielts, program=program, value='6.5')
+            for uni in universities
+        ])
+        refresh_ranking_summary([uni.id for uni in universities])
+        return SYNTHETIC_MAJOR
+
+    def _existing_major(self, major):
+        if major:
+            return major
+        top = Major.objects.annotate(total=Count('universityprogram')).order_by('-total').first()
+        if top is None:
+            raise CommandError('No majors in the database; use --synthetic')
+        return top.name
+
+    def _measure(self, func, runs):
+        timings = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                rows = func()
+                timings.append(time.perf_counter() - started)
+        return len(rows), len(queries), statistics.median(timings) * 1000
+
+    def _run(self, major, sizes, runs):
+        names = list(
+            University.objects.filter(universityprogram__major__name=major)
+            .order_by('name').values_list('name', flat=True).distinct()[:max(sizes)]
+        )
+        if not names:
+            raise CommandError(f'No universities offer "{major}"')
+
+        service = AIAnalysisService()
+        self.stdout.write(self.style.SUCCESS(f'Comparison fetch for "{major}" (median of {runs} runs)'))
+        for size in sizes:
+            if size > len(names):
+                self.stdout.write(self.style.WARNING(f'⚠ Only {len(names)} schools offer this major, skipping {size}'))
+                continue
+            schools = [{'ten_truong': name} for name in names[:size]]
+            batched = self._measure(lambda: service._lay_du_lieu_truong_tu_db(schools, major), runs)
+            one_by_one = self._measure(
+                lambda: [row for school in schools for row in service._lay_du_lieu_truong_tu_db([school], major)],
+                runs
+            )
+            self.stdout.write('')
+            self.stdout.write(f'{size} schools ({batched[0]} matched):')
+            self.stdout.write(f'  - batched:    {batched[1]:>5} queries, {batched[2]:8.1f} ms')
+            self.stdout.write(f'  - one-by-one: {one_by_one[1]:>5} queries, {one_by_one[2]:8.1f} ms')
+
+    def handle(self, *args, **options):
+        sizes = sorted(set(options['sizes']))
+        if not options['synthetic']:
+            self._run(self._existing_major(options['major']), sizes, options['runs'])
+            return
+
+        with transaction.atomic():
+            major = self._create_synthetic(max(sizes))
+            self._run(major, sizes, options['runs'])
+            transaction.set_rollback(True)
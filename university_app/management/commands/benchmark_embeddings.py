@@ -0,0 +1,134 @@
+"""
+Management command to benchmark chatbot embedding backends
+Compares sentence-transformers (PyTorch) with the int8 ONNX export on the university corpus:
+model RSS, query latency and retrieval recall@5
+Usage: python manage.py benchmark_embeddings [--backend onnx-int8] [--limit 200] [--repeat 5]
+"""
+from django.core.management.base import BaseCommand
+from university_app.services.embeddings import (
+    EMBEDDING_BACKENDS, create_local_embedding_function
+)
+from university_app.services.rag_corpus import iter_document_chunks
+import gc
+import numpy as np
+import resource
+import statistics
+import time
+
+TOP_K = 5
+
+
+def _rss_mb():
+    """RSS hiện tại (Linux: /proc), ngược lại RSS đỉnh"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Benchmark embedding backends (memory, latency, recall@5) on the university corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', action='append', choices=sorted(EMBEDDING_BACKENDS),
+                            help='Backend to measure (repeatable, default: all). '
+                                 'Run one backend per process for exact memory numbers')
+        parser.add_argument('--limit', type=int, default=200, help='Max universities in the corpus')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions per query')
+
+    def _build_corpus(self, limit):
+        ids, documents, queries = [], [], []
+        for chunk in iter_document_chunks():
+            for doc_id, document, metadata in chunk:
+                if len(ids) >= limit:
+                    return ids, documents, queries
+                ids.append(doc_id)
+                documents.append(document)
+                # Câu hỏi kiểu người dùng hỏi chatbot, đáp án là document của chính trường đó
+                queries.append((f"Thông tin về {metadata['name']}", doc_id))
+                queries.append((f"{metadata['name']} có học phí bao nhiêu?", doc_id))
+        return ids, documents, queries
+
+    @staticmethod
+    def _top_k(matrix, vector):
+        # Chroma mặc định dùng khoảng cách L2
+        distances = np.linalg.norm(matrix - vector, axis=1)
+        return np.argsort(distances)[:TOP_K]
+
+    def _run_backend(self, backend, ids, documents, queries, repeat):
+        gc.collect()
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        embed = create_local_embedding_function(backend)
+        embed(['warm up'])
+        load_seconds = time.perf_counter() - start
+        model_mb = _rss_mb() - rss_before
+
+        start = time.perf_counter()
+        matrix = np.asarray(embed(documents), dtype=np.float32)
+        index_seconds = time.perf_counter() - start
+
+        timings = []
+        hits = 0
+        top_ids = []
+        for query, expected_id in queries:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                vector = np.asarray(embed([query])[0], dtype=np.float32)
+                timings.append((time.perf_counter() - start) * 1000)
+            found = [ids[i] for i in self._top_k(matrix, vector)]
+            hits += expected_id in found
+            top_ids.append(found)
+
+        del embed
+        gc.collect()
+        return {
+            'load_seconds': load_seconds,
+            'model_mb': model_mb,
+            'index_seconds': index_seconds,
+            'timings': sorted(timings),
+            'recall': hits / len(queries),
+            'top_ids': top_ids,
+        }
+
+    def handle(self, *args, **options):
+        ids, documents, queries = self._build_corpus(options['limit'])
+        if not documents:
+            self.stdout.write(self.style.WARNING('⚠ No universities found, load data first'))
+            return
+
+        backends = options['backend'] or list(EMBEDDING_BACKENDS)
+        results = {}
+        for backend in backends:
+            self.stdout.write(f'Measuring {backend}...')
+            try:
+                results[backend] = self._run_backend(backend, ids, documents, queries, options['repeat'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'✗ {backend}: {type(e).__name__}: {e}'))
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Benchmark: {len(documents)} documents, {len(queries)} queries x {options["repeat"]} runs'
+        ))
+        for backend, result in results.items():
+            timings = result['timings']
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write('')
+            self.stdout.write(f'{backend}:')
+            self.stdout.write(f'  - model load: {result["load_seconds"]:.1f} s, RSS +{result["model_mb"]:.0f} MB')
+            self.stdout.write(f'  - index {len(documents)} documents: {result["index_seconds"]:.1f} s')
+            self.stdout.write(f'  - query embedding mean: {statistics.mean(timings):.1f} ms, p95: {p95:.1f} ms')
+            self.stdout.write(f'  - recall@{TOP_K}: {result["recall"]:.3f}')
+
+        # Độ trùng khớp top-5 so với backend đầu tiên (backend tham chiếu)
+        if len(results) > 1:
+            reference, *others = results
+            for backend in others:
+                overlaps = [
+                    len(set(a) & set(b)) / TOP_K
+                    for a, b in zip(results[reference]['top_ids'], results[backend]['top_ids'])
+                ]
+                self.stdout.write('')
+                self.stdout.write(f'{backend} vs {reference}: top-{TOP_K} overlap {statistics.mean(overlaps):.3f}')
@@ -0,0 +1,85 @@
+"""
+Management command to benchmark university name search
+Compares the legacy icontains lookup with services.university_search
+Usage: python manage.py benchmark_search [--repeat 20]
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from university_app.models import University
+from university_app.services.university_search import (
+    search_universities, get_trigram_index, normalize_text
+)
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark icontains vs trigram university search (latency and top-1 accuracy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timing repetitions per query')
+        parser.add_argument('--limit', type=int, default=50, help='Max universities used to build queries')
+
+    def _build_queries(self, limit):
+        """Sinh từ khóa từ dữ liệu thật: tên đầy đủ, một phần, không dấu, gõ sai 1 ký tự"""
+        queries = []
+        for university_id, name in University.objects.values_list('id', 'name')[:limit]:
+            if not name:
+                continue
+            words = name.split()
+            queries.append(('full', name, university_id))
+            queries.append(('partial', ' '.join(words[:2]).lower(), university_id))
+            queries.append(('no_accent', normalize_text(name), university_id))
+            longest = max(words, key=len)
+            if len(longest) > 4:
+                typo = name.replace(longest, longest[:2] + longest[3:], 1)
+                queries.append(('typo', typo, university_id))
+        return queries
+
+    def _time(self, func, repeat):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, timings
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        queries = self._build_queries(options['limit'])
+        if not queries:
+            self.stdout.write(self.style.WARNING('⚠ No universities found, load data first'))
+            return
+
+        # Build index trước để không tính thời gian build vào từng query
+        get_trigram_index()
+
+        def icontains(query):
+            return list(University.objects.filter(
+                Q(name__icontains=query) | Q(short_name__icontains=query)
+            ).order_by('name').values_list('id', flat=True))
+
+        def trigram(query):
+            return [university_id for university_id, _ in search_universities(query)]
+
+        results = {}
+        for label, func in (('icontains', icontains), ('trigram', trigram)):
+            timings = []
+            top1_by_kind = {}
+            for kind, query, expected_id in queries:
+                ids, query_timings = self._time(lambda: func(query), repeat)
+                timings.extend(query_timings)
+                hit = bool(ids) and ids[0] == expected_id
+                top1_by_kind.setdefault(kind, []).append(hit)
+            results[label] = (timings, top1_by_kind)
+
+        self.stdout.write(self.style.SUCCESS(f'Benchmark: {len(queries)} queries x {repeat} runs'))
+        for label, (timings, top1_by_kind) in results.items():
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write('')
+            self.stdout.write(f'{label}:')
+            self.stdout.write(f'  - mean: {statistics.mean(timings):.3f} ms, p95: {p95:.3f} ms')
+            for kind, hits in top1_by_kind.items():
+                self.stdout.write(f'  - top-1 {kind}: {sum(hits)}/{len(hits)}')
@@ -0,0 +1,46 @@
+"""
+Management command to create trigram search indexes for university names (PostgreSQL only)
+SQLite / SQL Server use the in-process trigram index in services/university_search.py
+Usage: python manage.py create_search_indexes
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Create pg_trgm GIN indexes (accent-insensitive) for university name search'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'⚠ Database backend is {connection.vendor}, skipping. '
+                'Search will use the in-process trigram index.'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Creating search indexes...'))
+
+        with connection.cursor() as cursor:
+            self.stdout.write('Enabling pg_trgm and unaccent extensions...')
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent;")
+
+            # unaccent() is STABLE, an IMMUTABLE wrapper is required to use it in an index
+            self.stdout.write('Creating f_unaccent function...')
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+                    SELECT public.unaccent('public.unaccent', $1)
+                $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+            """)
+
+            self.stdout.write('Creating trigram indexes...')
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_universities_name_trgm
+                ON universities USING gin (f_unaccent(lower(name)) gin_trgm_ops);
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_universities_short_name_trgm
+                ON universities USING gin (f_unaccent(lower(short_name)) gin_trgm_ops);
+            """)
+
+        self.stdout.write(self.style.SUCCESS('✓ Search indexes created successfully!'))
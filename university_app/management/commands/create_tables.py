@@ -113,6 +113,57 @@ class Command(BaseCommand):
                 );
             """)
 
+            # Create university_ranking_summary table (derived from rankings)
+            self.stdout.write('Creating university_ranking_summary table...')
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS university_ranking_summary (
+                    university_id INTEGER PRIMARY KEY REFERENCES universities(id) ON DELETE CASCADE,
+                    latest_rank INTEGER,
+                    latest_year INTEGER,
+                    latest_source VARCHAR(255),
+                    best_rank INTEGER,
+                    best_year INTEGER,
+                    best_source VARCHAR(255),
+                    latest_by_source JSONB NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                );
+            """)
+
+            # Create ai_analysis_cache table (Gemini comparison analysis cache)
+            self.stdout.write('Creating ai_analysis_cache table...')
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ai_analysis_cache (
+                    cache_key VARCHAR(64) PRIMARY KEY,
+                    university_ids VARCHAR(255) NOT NULL,
+                    major VARCHAR(255) NOT NULL,
+                    analysis TEXT NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    last_accessed TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+                    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+                );
+            """)
+
+            # Create major_leaderboard table (derived from programs, rankings and requirements)
+            self.stdout.write('Creating major_leaderboard table...')
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS major_leaderboard (
+                    id SERIAL PRIMARY KEY,
+                    major_id INTEGER NOT NULL REFERENCES majors(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    university_id INTEGER NOT NULL REFERENCES universities(id) ON DELETE CASCADE,
+                    university_program_id INTEGER NOT NULL REFERENCES university_programs(id) ON DELETE CASCADE,
+                    score DOUBLE PRECISION NOT NULL,
+                    rank_score INTEGER NOT NULL,
+                    tuition_score INTEGER NOT NULL,
+                    requirement_score INTEGER NOT NULL,
+                    latest_rank INTEGER,
+                    tuition_fee DOUBLE PRECISION,
+                    ielts DOUBLE PRECISION,
+                    computed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+                );
+            """)
+
             # Create indexes for better performance
             self.stdout.write('Creating indexes...')
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_universities_country ON universities(country_id);")
@@ -121,9 +172,17 @@ class Command(BaseCommand):
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_university_programs_university ON university_programs(university_id);")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_university_programs_major ON university_programs(major_id);")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_admission_reqs_university ON university_admission_requirements(university_id);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_rankings_university_year ON rankings(university_id, fyear DESC);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ranking_summary_best_rank ON university_ranking_summary(best_rank);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_analysis_cache_last_accessed ON ai_analysis_cache(last_accessed);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ai_analysis_cache_expires ON ai_analysis_cache(expires_at);")
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_major_leaderboard_major_position ON major_leaderboard(major_id, position);")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_major_leaderboard_university ON major_leaderboard(university_id);")
 
         self.stdout.write(self.style.SUCCESS('✓ All tables created successfully!'))
         self.stdout.write('')
         self.stdout.write('Next steps:')
         self.stdout.write('1. Run: railway run python manage.py loaddata database_export.json')
-        self.stdout.write('2. Run: railway run python manage.py createsuperuser')
+        self.stdout.write('2. Run: railway run python manage.py refresh_ranking_summary')
+        self.stdout.write('3. Run: railway run python manage.py refresh_major_leaderboard')
+        self.stdout.write('4. Run: railway run python manage.py createsuperuser')
@@ -28,6 +28,7 @@ class Command(BaseCommand):
                 self.stdout.write(f'  - Total universities indexed: {stats.get("total_documents", 0)}')
                 self.stdout.write(f'  - Collection name: {stats.get("collection_name", "N/A")}')
                 self.stdout.write(f'  - Embedding model: {stats.get("embedding_model", "N/A")}')
+                self.stdout.write(f'  - Embedding backend: {stats.get("embedding_backend", "N/A")}')
                 self.stdout.write('')
                 self.stdout.write('Chatbot is ready to use! 🤖')
             else:
@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the per-major leaderboard table
+Schedule nightly (cron) and run after bulk imports; signals refresh affected majors on commit
+Usage: python manage.py refresh_major_leaderboard [--major-id ID ...]
+"""
+from django.core.management.base import BaseCommand
+from university_app.services.leaderboard import refresh_major_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed composite-score leaderboard per major'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--major-id', type=int, nargs='+', dest='major_ids',
+            help='Only refresh these majors (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Refreshing major leaderboard...'))
+        count = refresh_major_leaderboard(options.get('major_ids'))
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} leaderboard rows'))
@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the university_ranking_summary table
+Signals keep it up to date incrementally; run this after bulk imports or on first deploy
+Usage: python manage.py refresh_ranking_summary [--university-id ID ...]
+"""
+from django.core.management.base import BaseCommand
+from university_app.services.ranking_summary import refresh_ranking_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed latest/preferred ranking per university'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--university-id', type=int, nargs='+', dest='university_ids',
+            help='Only refresh these universities (default: all)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Refreshing ranking summary...'))
+        count = refresh_ranking_summary(options.get('university_ids'))
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} ranking summary rows'))
@@ -0,0 +1,52 @@
+"""
+Management command to run the shared embedding sidecar
+Loads the embedding model (EMBEDDING_BACKEND) once and serves all gunicorn workers over a Unix socket
+Usage: python manage.py run_embedding_server [--socket /tmp/embedding.sock] [--max-batch 64] [--max-wait-ms 10] [--preload]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from university_app.services.embeddings import (
+    EmbeddingServer, EMBEDDING_MODEL_NAME, create_local_embedding_function, resolve_backend
+)
+
+
+class Command(BaseCommand):
+    help = 'Serve chatbot embeddings to the web workers over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.EMBEDDING_SERVER_SOCKET, help='Unix socket path')
+        parser.add_argument('--max-batch', type=int, default=64, help='Max texts encoded together')
+        parser.add_argument('--max-wait-ms', type=float, default=10, help='Max time to wait for a batch to fill')
+        parser.add_argument('--preload', action='store_true', help='Load the model at startup instead of on first request')
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError('Set EMBEDDING_SERVER_SOCKET or pass --socket')
+
+        model = None
+
+        def encode(texts):
+            # Nạp model ở request đầu tiên (chỉ thread gộp batch gọi hàm này)
+            # để container khởi động nhẹ như khi chatbot còn nạp model lazy
+            nonlocal model
+            if model is None:
+                backend = resolve_backend()
+                self.stdout.write(f'Loading embedding model {EMBEDDING_MODEL_NAME} ({backend})...')
+                model = create_local_embedding_function(backend)
+            return model(texts)
+
+        if options['preload']:
+            encode(['warm up'])
+
+        server = EmbeddingServer(
+            options['socket'], encode,
+            max_batch=options['max_batch'], max_wait=options['max_wait_ms'] / 1000
+        )
+        server.bind()
+        self.stdout.write(self.style.SUCCESS(f'✓ Embedding server listening on {options["socket"]}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
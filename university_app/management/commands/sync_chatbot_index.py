@@ -0,0 +1,46 @@
+"""
+Management command to incrementally sync the chatbot ChromaDB index with the database
+Only universities whose generated document changed are re-embedded; removed ones are deleted
+Usage: python manage.py sync_chatbot_index [--university-id ID ...] [--rebuild]
+"""
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from university_app.services.chatbot import INDEX_DIRTY_KEY
+from university_app.services.gemini_rag import GeminiChatbotRAG
+
+
+class Command(BaseCommand):
+    help = 'Incrementally sync the chatbot vector index (content-hash based)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--university-id', type=int, nargs='+', dest='university_ids',
+            help='Only sync these universities (default: all)'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Full rebuild into a shadow collection, then swap it in'
+        )
+
+    def handle(self, *args, **options):
+        chatbot = GeminiChatbotRAG()
+
+        if options['rebuild']:
+            self.stdout.write(self.style.SUCCESS('Rebuilding chatbot index into shadow collection...'))
+            if not chatbot.rebuild_database():
+                self.stdout.write(self.style.ERROR('✗ Failed to rebuild chatbot index'))
+                return
+            cache.delete(INDEX_DIRTY_KEY)
+            self.stdout.write(self.style.SUCCESS(f'✓ Swapped in new index ({chatbot.get_stats()["total_universities"]} universities)'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Syncing chatbot index...'))
+        university_ids = options.get('university_ids')
+        stats = chatbot.sync_index(university_ids)
+        if university_ids is None:
+            cache.delete(INDEX_DIRTY_KEY)
+
+        self.stdout.write(self.style.SUCCESS('✓ Chatbot index synced'))
+        self.stdout.write(f'  - Re-embedded: {stats["upserted"]}')
+        self.stdout.write(f'  - Deleted: {stats["deleted"]}')
+        self.stdout.write(f'  - Unchanged: {stats["unchanged"]}')
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('university_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniversityRankingSummary',
+            fields=[
+                ('university', models.OneToOneField(db_column='university_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking_summary', serialize=False, to='university_app.university', verbose_name='Trường đại học')),
+                ('latest_rank', models.IntegerField(blank=True, null=True, verbose_name='Thứ hạng mới nhất')),
+                ('latest_year', models.IntegerField(blank=True, null=True, verbose_name='Năm xếp hạng mới nhất')),
+                ('latest_source', models.CharField(blank=True, max_length=255, null=True, verbose_name='Nguồn xếp hạng mới nhất')),
+                ('best_rank', models.IntegerField(blank=True, null=True, verbose_name='Thứ hạng ưu tiên')),
+                ('best_year', models.IntegerField(blank=True, null=True, verbose_name='Năm xếp hạng ưu tiên')),
+                ('best_source', models.CharField(blank=True, max_length=255, null=True, verbose_name='Nguồn xếp hạng ưu tiên')),
+                ('latest_by_source', models.JSONField(default=dict, verbose_name='Xếp hạng mới nhất theo nguồn')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lúc')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp xếp hạng',
+                'verbose_name_plural': 'Tổng hợp xếp hạng',
+                'db_table': 'university_ranking_summary',
+                'managed': False,
+            },
+        ),
+    ]
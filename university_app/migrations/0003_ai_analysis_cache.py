@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('university_app', '0002_university_ranking_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIAnalysisCache',
+            fields=[
+                ('cache_key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Khóa cache')),
+                ('university_ids', models.CharField(max_length=255, verbose_name='ID các trường')),
+                ('major', models.CharField(max_length=255, verbose_name='Chuyên ngành')),
+                ('analysis', models.TextField(verbose_name='Nội dung phân tích')),
+                ('hit_count', models.IntegerField(default=0, verbose_name='Số lần dùng lại')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Tạo lúc')),
+                ('last_accessed', models.DateTimeField(verbose_name='Truy cập gần nhất')),
+                ('expires_at', models.DateTimeField(verbose_name='Hết hạn lúc')),
+            ],
+            options={
+                'verbose_name': 'Cache phân tích AI',
+                'verbose_name_plural': 'Cache phân tích AI',
+                'db_table': 'ai_analysis_cache',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('university_app', '0003_ai_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MajorLeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('position', models.IntegerField(verbose_name='Vị trí')),
+                ('score', models.FloatField(verbose_name='Điểm tổng hợp')),
+                ('rank_score', models.IntegerField(verbose_name='Điểm xếp hạng')),
+                ('tuition_score', models.IntegerField(verbose_name='Điểm học phí')),
+                ('requirement_score', models.IntegerField(verbose_name='Điểm yêu cầu tuyển sinh')),
+                ('latest_rank', models.IntegerField(blank=True, null=True, verbose_name='Thứ hạng mới nhất')),
+                ('tuition_fee', models.FloatField(blank=True, null=True, verbose_name='Học phí')),
+                ('ielts', models.FloatField(blank=True, null=True, verbose_name='IELTS yêu cầu')),
+                ('computed_at', models.DateTimeField(verbose_name='Tính lúc')),
+            ],
+            options={
+                'verbose_name': 'Bảng xếp hạng chuyên ngành',
+                'verbose_name_plural': 'Bảng xếp hạng chuyên ngành',
+                'db_table': 'major_leaderboard',
+                'managed': False,
+            },
+        ),
+    ]
@@ -145,6 +145,74 @@ class UniversityAdmissionRequirement(models.Model):
     def __str__(self):
         return f"{self.university.name} - {self.criteria.name}: {self.value}"
 
+class UniversityRankingSummary(models.Model):
+    """Model cho university_ranking_summary table - xếp hạng mới nhất tính sẵn cho mỗi trường"""
+    university = models.OneToOneField(University, on_delete=models.CASCADE, primary_key=True, db_column='university_id', related_name='ranking_summary', verbose_name="Trường đại học")
+    latest_rank = models.IntegerField(blank=True, null=True, verbose_name="Thứ hạng mới nhất")
+    latest_year = models.IntegerField(blank=True, null=True, verbose_name="Năm xếp hạng mới nhất")
+    latest_source = models.CharField(max_length=255, blank=True, null=True, verbose_name="Nguồn xếp hạng mới nhất")
+    best_rank = models.IntegerField(blank=True, null=True, verbose_name="Thứ hạng ưu tiên")
+    best_year = models.IntegerField(blank=True, null=True, verbose_name="Năm xếp hạng ưu tiên")
+    best_source = models.CharField(max_length=255, blank=True, null=True, verbose_name="Nguồn xếp hạng ưu tiên")
+    latest_by_source = models.JSONField(default=dict, verbose_name="Xếp hạng mới nhất theo nguồn")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lúc")
+
+    class Meta:
+        db_table = 'university_ranking_summary'
+        managed = False
+        verbose_name = "Tổng hợp xếp hạng"
+        verbose_name_plural = "Tổng hợp xếp hạng"
+
+    def __str__(self):
+        return f"{self.university_id} - #{self.best_rank} ({self.best_source})"
+
+
+class AIAnalysisCache(models.Model):
+    """Model cho ai_analysis_cache table - kết quả phân tích Gemini đã lưu cho trang so sánh"""
+    cache_key = models.CharField(max_length=64, primary_key=True, verbose_name="Khóa cache")
+    university_ids = models.CharField(max_length=255, verbose_name="ID các trường")
+    major = models.CharField(max_length=255, verbose_name="Chuyên ngành")
+    analysis = models.TextField(verbose_name="Nội dung phân tích")
+    hit_count = models.IntegerField(default=0, verbose_name="Số lần dùng lại")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Tạo lúc")
+    last_accessed = models.DateTimeField(verbose_name="Truy cập gần nhất")
+    expires_at = models.DateTimeField(verbose_name="Hết hạn lúc")
+
+    class Meta:
+        db_table = 'ai_analysis_cache'
+        managed = False
+        verbose_name = "Cache phân tích AI"
+        verbose_name_plural = "Cache phân tích AI"
+
+    def __str__(self):
+        return f"{self.major} [{self.university_ids}]"
+
+class MajorLeaderboardEntry(models.Model):
+    """Model cho major_leaderboard table - bảng xếp hạng điểm tổng hợp tính sẵn theo chuyên ngành"""
+    id = models.AutoField(primary_key=True)
+    major = models.ForeignKey(Major, on_delete=models.CASCADE, db_column='major_id', related_name='leaderboard_entries', verbose_name="Chuyên ngành")
+    position = models.IntegerField(verbose_name="Vị trí")
+    university = models.ForeignKey(University, on_delete=models.CASCADE, db_column='university_id', verbose_name="Trường đại học")
+    university_program = models.ForeignKey(UniversityProgram, on_delete=models.CASCADE, db_column='university_program_id', verbose_name="Chương trình trường")
+    score = models.FloatField(verbose_name="Điểm tổng hợp")
+    rank_score = models.IntegerField(verbose_name="Điểm xếp hạng")
+    tuition_score = models.IntegerField(verbose_name="Điểm học phí")
+    requirement_score = models.IntegerField(verbose_name="Điểm yêu cầu tuyển sinh")
+    latest_rank = models.IntegerField(blank=True, null=True, verbose_name="Thứ hạng mới nhất")
+    tuition_fee = models.FloatField(blank=True, null=True, verbose_name="Học phí")
+    ielts = models.FloatField(blank=True, null=True, verbose_name="IELTS yêu cầu")
+    computed_at = models.DateTimeField(verbose_name="Tính lúc")
+
+    class Meta:
+        db_table = 'major_leaderboard'
+        managed = False
+        unique_together = [('major', 'position')]
+        verbose_name = "Bảng xếp hạng chuyên ngành"
+        verbose_name_plural = "Bảng xếp hạng chuyên ngành"
+
+    def __str__(self):
+        return f"{self.major_id} #{self.position} - {self.university_id} ({self.score})"
+
 # Legacy aliases để tương thích ngược
 QuocGia = Country
 TruongDaiHoc = University
@@ -1,9 +1,13 @@
 import json
 from django.conf import settings
-from django.db.models import Q
-from typing import List, Dict, Any
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.db.models.functions import Lower
+from typing import List, Dict, Any, Optional, Sequence
 import logging
-from ..models import University, UniversityProgram, UniversityAdmissionRequirement, Major, Country, Ranking
+from ..models import University, UniversityProgram, UniversityAdmissionRequirement, Major, Country
+from .ranking_summary import get_ranking_summary
+from .scoring import score_universities
+from .university_search import search_universities
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +17,15 @@ class AIAnalysisService:
     def __init__(self):
         pass
 
-    def so_sanh_truong_dai_hoc(self, danh_sach_truong: List[Dict], chuyen_nganh: str) -> Dict[str, Any]:
+    def so_sanh_truong_dai_hoc(self, danh_sach_truong: List[Dict], chuyen_nganh: str,
+                               trong_so: Optional[Sequence[float]] = None) -> Dict[str, Any]:
         """
         So sánh các trường đại học dựa trên chuyên ngành
         
         Args:
             danh_sach_truong: Danh sách trường để so sánh
             chuyen_nganh: Chuyên ngành cần so sánh
+            trong_so: Trọng số (xếp hạng, học phí, tỷ lệ chấp nhận, học bổng), mặc định 0.4/0.3/0.2/0.1
         
         Returns:
             Dict chứa kết quả so sánh, điểm số, và biểu đồ
@@ -32,7 +38,7 @@ class AIAnalysisService:
             ket_qua_ai = self._so_sanh_mac_dinh(chuyen_nganh, truong_phu_hop)
             
             # Tính điểm cho các trường
-            bang_diem = self._tinh_diem_truong(truong_phu_hop)
+            bang_diem = self._tinh_diem_truong(truong_phu_hop, trong_so)
             
             # Tạo dữ liệu biểu đồ
             ket_qua_bieu_do = self._tao_du_lieu_bieu_do(bang_diem)
@@ -51,39 +57,80 @@ class AIAnalysisService:
             logger.error(f"Lỗi trong quá trình so sánh: {str(e)}")
             return self._ket_qua_mac_dinh(chuyen_nganh)
 
+    def _tim_truong_theo_ten(self, ten_truong_list: List[str]) -> Dict[str, University]:
+        """
+        Tìm trường cho cả danh sách tên
+
+        Tên khớp đúng (không phân biệt hoa thường) với tên hoặc tên viết tắt được tìm trong
+        một query; tên còn lại (gõ sai, thiếu dấu...) mới dùng tìm kiếm gần đúng từng tên.
+        Trường trả về đã kèm quốc gia và xếp hạng tổng hợp.
+        """
+        ten_can_tim = {ten for ten in ten_truong_list if ten}
+        if not ten_can_tim:
+            return {}
+
+        universities = University.objects.select_related('country', 'ranking_summary')
+        tim_thay = {}
+        for university in universities.annotate(
+            ten_thuong=Lower('name'), ten_viet_tat_thuong=Lower('short_name')
+        ).filter(Q(ten_thuong__in=ten_can_tim) | Q(ten_viet_tat_thuong__in=ten_can_tim)).order_by('id'):
+            # Ưu tiên khớp tên đầy đủ hơn khớp tên viết tắt
+            tim_thay.setdefault(university.ten_thuong, university)
+        for university in list(tim_thay.values()):
+            if university.ten_viet_tat_thuong:
+                tim_thay.setdefault(university.ten_viet_tat_thuong, university)
+
+        con_lai = {}
+        for ten in ten_can_tim - tim_thay.keys():
+            ket_qua_tim = search_universities(ten, limit=1)
+            if ket_qua_tim:
+                con_lai[ten] = ket_qua_tim[0][0]
+        if con_lai:
+            theo_id = universities.in_bulk(set(con_lai.values()))
+            tim_thay.update({ten: theo_id[uid] for ten, uid in con_lai.items() if uid in theo_id})
+        return tim_thay
+
     def _lay_du_lieu_truong_tu_db(self, danh_sach_truong: List[Dict], chuyen_nganh: str) -> List[Dict]:
-        """Lấy dữ liệu trường từ database dựa trên danh sách trường và chuyên ngành"""
+        """
+        Lấy dữ liệu trường từ database dựa trên danh sách trường và chuyên ngành
+
+        Số query cố định bất kể số trường: tìm tên, chương trình theo chuyên ngành,
+        yêu cầu tuyển sinh (quốc gia và xếp hạng tổng hợp đi kèm query tìm tên).
+        """
+        ten_truong_list = [truong.get('ten_truong', '').lower().strip() for truong in danh_sach_truong]
+        theo_ten = self._tim_truong_theo_ten(ten_truong_list)
+        theo_id = {university.id: university for university in theo_ten.values()}
+        prefetch_related_objects(
+            list(theo_id.values()),
+            Prefetch('universityprogram_set', to_attr='chuong_trinh_phu_hop',
+                     queryset=UniversityProgram.objects.filter(
+                         major__name__icontains=chuyen_nganh
+                     ).select_related('program').order_by('id')),
+            Prefetch('universityadmissionrequirement_set', to_attr='yeu_cau',
+                     queryset=UniversityAdmissionRequirement.objects.select_related('criteria').order_by('id')),
+        )
+
         truong_phu_hop = []
-        for truong in danh_sach_truong:
-            ten_truong = truong.get('ten_truong', '').lower().strip()
-            university = University.objects.filter(name__icontains=ten_truong).first()
-            if not university:
-                continue
-            
-            # Lấy chương trình phù hợp với chuyên ngành
-            university_program = UniversityProgram.objects.filter(
-                university=university,
-                major__name__icontains=chuyen_nganh
-            ).first()
-            if not university_program:
+        for truong, ten_truong in zip(danh_sach_truong, ten_truong_list):
+            university = theo_id[theo_ten[ten_truong].id] if ten_truong in theo_ten else None
+            if not university or not university.chuong_trinh_phu_hop:
                 continue
-            
-            # Lấy yêu cầu tuyển sinh
-            yeu_cau_tuyen_sinh = {}
-            requirements = UniversityAdmissionRequirement.objects.filter(
-                university=university,
-                program=university_program.program
-            )
-            for req in requirements:
-                yeu_cau_tuyen_sinh[req.criteria.name] = req.value
-            
-            # Lấy xếp hạng mới nhất
-            xep_hang = Ranking.objects.filter(university=university).order_by('-fyear').first()
-            
+            university_program = university.chuong_trinh_phu_hop[0]
+
+            # Yêu cầu tuyển sinh của bậc học tương ứng
+            yeu_cau_tuyen_sinh = {
+                req.criteria.name: req.value
+                for req in university.yeu_cau
+                if req.program_id == university_program.program_id
+            }
+
+            # Xếp hạng mới nhất (bảng tổng hợp tính sẵn)
+            xep_hang = get_ranking_summary(university)
+
             truong_data = {
                 'ten_truong': university.name,
                 'quoc_gia': university.country.name if university.country else 'N/A',
-                'xep_hang_the_gioi': xep_hang.frank if xep_hang else 0,
+                'xep_hang_the_gioi': (xep_hang.latest_rank or 0) if xep_hang else 0,
                 'hoc_phi': university_program.tuition_fee or 0,
                 'nam_thanh_lap': university.founded_year or 0,
                 'thoi_gian_hoc': university_program.duration or 'N/A',
@@ -165,89 +212,34 @@ class AIAnalysisService:
         """
         return so_sanh
 
-    def _tinh_diem_truong(self, truong_phu_hop: List[Dict]) -> Dict:
-        """Tính điểm so sánh cho từng trường"""
+    def _tinh_diem_truong(self, truong_phu_hop: List[Dict], trong_so: Optional[Sequence[float]] = None) -> Dict:
+        """Tính điểm so sánh cho các trường (một lần cho cả danh sách, xem services/scoring.py)"""
+        if not truong_phu_hop:
+            return {}
+
+        ket_qua = score_universities(
+            [truong.get('xep_hang_the_gioi', 0) for truong in truong_phu_hop],
+            [truong.get('hoc_phi', 0) for truong in truong_phu_hop],
+            [truong.get('ty_le_chap_nhan', 0) for truong in truong_phu_hop],
+            [truong.get('co_hoc_bong', False) for truong in truong_phu_hop],
+            weights=trong_so,
+        )
+
         bang_diem = {}
-        for truong in truong_phu_hop:
-            ten_truong = truong.get('ten_truong', 'N/A')
-            diem_xep_hang = self._tinh_diem_xep_hang(truong.get('xep_hang_the_gioi', 0))
-            diem_hoc_phi = self._tinh_diem_hoc_phi(truong.get('hoc_phi', 0))
-            diem_ty_le = self._tinh_diem_ty_le(truong.get('ty_le_chap_nhan', 0))
-            diem_hoc_bong = 10 if truong.get('co_hoc_bong', False) else 0
-            
-            diem_tong = (
-                diem_xep_hang * 0.4 +
-                diem_hoc_phi * 0.3 +
-                diem_ty_le * 0.2 +
-                diem_hoc_bong * 0.1
-            )
-            
-            bang_diem[ten_truong] = {
-                'diem_tong': round(diem_tong, 2),
+        for truong, diem, diem_tong, xep_loai in zip(
+            truong_phu_hop, ket_qua['components'].tolist(), ket_qua['total'].tolist(), ket_qua['grade'].tolist()
+        ):
+            diem_xep_hang, diem_hoc_phi, diem_ty_le, diem_hoc_bong = diem
+            bang_diem[truong.get('ten_truong', 'N/A')] = {
+                'diem_tong': diem_tong,
                 'diem_xep_hang': diem_xep_hang,
                 'diem_hoc_phi': diem_hoc_phi,
                 'diem_ty_le': diem_ty_le,
                 'diem_hoc_bong': diem_hoc_bong,
-                'xep_loai': self._xep_loai_truong(diem_tong)
+                'xep_loai': xep_loai
             }
-        
-        return bang_diem
 
-    def _tinh_diem_xep_hang(self, xep_hang: int) -> float:
-        if not xep_hang or xep_hang <= 0:
-            return 0
-        elif xep_hang <= 10:
-            return 100
-        elif xep_hang <= 50:
-            return 90
-        elif xep_hang <= 100:
-            return 80
-        elif xep_hang <= 200:
-            return 70
-        elif xep_hang <= 500:
-            return 60
-        else:
-            return 40
-
-    def _tinh_diem_hoc_phi(self, hoc_phi: float) -> float:
-        if not hoc_phi or hoc_phi <= 0:
-            return 0
-        elif hoc_phi <= 20000:
-            return 100
-        elif hoc_phi <= 30000:
-            return 85
-        elif hoc_phi <= 40000:
-            return 70
-        elif hoc_phi <= 50000:
-            return 50
-        else:
-            return 30
-
-    def _tinh_diem_ty_le(self, ty_le: float) -> float:
-        if not ty_le or ty_le <= 0:
-            return 0
-        elif ty_le >= 80:
-            return 100
-        elif ty_le >= 60:
-            return 85
-        elif ty_le >= 40:
-            return 70
-        elif ty_le >= 20:
-            return 50
-        else:
-            return 30
-
-    def _xep_loai_truong(self, diem_tong: float) -> str:
-        if diem_tong >= 85:
-            return "Xuất sắc"
-        elif diem_tong >= 75:
-            return "Tốt"
-        elif diem_tong >= 65:
-            return "Khá"
-        elif diem_tong >= 50:
-            return "Trung bình"
-        else:
-            return "Kém"
+        return bang_diem
 
     def _tao_du_lieu_bieu_do(self, bang_diem: Dict) -> Dict:
         """Tạo dữ liệu cho biểu đồ so sánh"""
@@ -0,0 +1,93 @@
+"""
+Nạp lazy các thư viện AI/vector (chromadb, google.generativeai, numpy...)
+
+Các thư viện này import mất hàng giây; trang không dùng AI không nên trả giá đó lúc
+worker khởi động. Module này chỉ dùng thư viện chuẩn để views/urls import được mà
+không kéo theo thư viện nặng. Có thể nạp trước trong thread nền sau khi worker
+sẵn sàng nhận request (AI_PRELOAD_DEPENDENCIES, xem gunicorn.conf.py).
+"""
+from django.conf import settings
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự nạp trước: thư viện nền trước, module của app (kéo theo phần còn lại) sau
+PRELOAD_MODULES = (
+    'numpy',
+    'chromadb',
+    'google.generativeai',
+    'university_app.services.gemini_rag',
+)
+
+# Module không được import khi nạp views/urls (kiểm tra bằng test import-time)
+HEAVY_MODULES = (
+    'numpy',
+    'chromadb',
+    'google.generativeai',
+    'sentence_transformers',
+    'torch',
+    'onnxruntime',
+)
+
+_genai_lock = threading.Lock()
+_genai_configured = False
+_preload_started = False
+_preload_lock = threading.Lock()
+
+
+def load_chromadb():
+    return importlib.import_module('chromadb')
+
+
+def load_genai():
+    """google.generativeai đã cấu hình API key (cấu hình một lần mỗi process)"""
+    global _genai_configured
+
+    genai = importlib.import_module('google.generativeai')
+    if not _genai_configured:
+        with _genai_lock:
+            if not _genai_configured:
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                _genai_configured = True
+    return genai
+
+
+def preload_ai_dependencies():
+    """Import trước các module nặng, trả về thời gian import (giây) của từng module"""
+    timings = {}
+    for name in PRELOAD_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Không nạp trước được {name}: {str(e)}")
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info("Đã nạp trước thư viện AI: " + ", ".join(
+        f"{name} {seconds:.2f}s" for name, seconds in timings.items()
+    ))
+    return timings
+
+
+def start_background_preload(force: bool = False):
+    """
+    Nạp trước thư viện AI trong thread nền (mỗi process một lần)
+
+    Args:
+        force: bỏ qua AI_PRELOAD_DEPENDENCIES
+    """
+    global _preload_started
+
+    if not (force or settings.AI_PRELOAD_DEPENDENCIES):
+        return None
+    with _preload_lock:
+        if _preload_started:
+            return None
+        _preload_started = True
+
+    thread = threading.Thread(target=preload_ai_dependencies, name='ai-preload', daemon=True)
+    thread.start()
+    return thread
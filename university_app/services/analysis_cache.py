@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+from typing import Iterable, Optional
+import hashlib
+import logging
+from ..models import AIAnalysisCache
+from .data_version import get_data_version
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = 'ai_analysis_cache:hits'
+MISSES_KEY = 'ai_analysis_cache:misses'
+
+
+def make_analysis_key(university_ids: Iterable[int], major: str, prompt_version: int) -> str:
+    """Khóa cache: hash của (id trường đã sắp xếp, chuyên ngành, phiên bản dữ liệu, phiên bản prompt)"""
+    ids = ','.join(str(university_id) for university_id in sorted(set(university_ids)))
+    raw = f"{ids}|{major}|{get_data_version()}|{prompt_version}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _count(key: str):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_cached_analysis(cache_key: str) -> Optional[str]:
+    """Lấy phân tích đã lưu (còn hạn), cập nhật thời điểm truy cập cho LRU"""
+    now = timezone.now()
+    try:
+        entry = AIAnalysisCache.objects.filter(
+            cache_key=cache_key, expires_at__gt=now
+        ).only('analysis').first()
+        if entry is None:
+            _count(MISSES_KEY)
+            return None
+        AIAnalysisCache.objects.filter(cache_key=cache_key).update(
+            hit_count=F('hit_count') + 1, last_accessed=now
+        )
+    except DatabaseError as e:
+        logger.error(f"Lỗi đọc cache phân tích AI: {str(e)}")
+        return None
+
+    _count(HITS_KEY)
+    return entry.analysis
+
+
+def store_analysis(cache_key: str, university_ids: Iterable[int], major: str, analysis: str):
+    """Lưu phân tích mới, xóa bản hết hạn và bản ít dùng gần đây nhất khi vượt giới hạn"""
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            AIAnalysisCache.objects.update_or_create(
+                cache_key=cache_key,
+                defaults={
+                    'university_ids': ','.join(str(university_id) for university_id in sorted(set(university_ids))),
+                    'major': major,
+                    'analysis': analysis,
+                    'hit_count': 0,
+                    'last_accessed': now,
+                    'expires_at': now + timedelta(seconds=settings.AI_ANALYSIS_CACHE_TTL),
+                }
+            )
+            evict_analysis_cache(now)
+    except DatabaseError as e:
+        logger.error(f"Lỗi lưu cache phân tích AI: {str(e)}")
+
+
+def evict_analysis_cache(now=None) -> int:
+    """Xóa bản hết hạn, sau đó giữ lại tối đa AI_ANALYSIS_CACHE_MAX_ENTRIES bản dùng gần nhất"""
+    now = now or timezone.now()
+    deleted, _ = AIAnalysisCache.objects.filter(expires_at__lte=now).delete()
+
+    max_entries = settings.AI_ANALYSIS_CACHE_MAX_ENTRIES
+    stale_keys = list(
+        AIAnalysisCache.objects.order_by('-last_accessed', 'cache_key')
+        .values_list('cache_key', flat=True)[max_entries:]
+    )
+    if stale_keys:
+        deleted += AIAnalysisCache.objects.filter(cache_key__in=stale_keys).delete()[0]
+    return deleted
+
+
+def purge_analysis_cache() -> int:
+    """Xóa toàn bộ cache phân tích và reset bộ đếm hit/miss"""
+    deleted, _ = AIAnalysisCache.objects.all().delete()
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+    return deleted
+
+
+def get_analysis_cache_stats() -> dict:
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': (hits / total) if total else 0.0,
+        'entries': AIAnalysisCache.objects.count(),
+    }
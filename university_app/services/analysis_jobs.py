@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from typing import Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_TIMEOUT = 'timeout'
+
+# Trạng thái job lưu trong Django cache để worker khác (file/redis cache) cũng đọc được
+JOB_TTL = 15 * 60
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _job_key(job_id: str) -> str:
+    return f"ai_analysis_job:{job_id}"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Thread pool riêng cho phân tích AI, không chiếm thread xử lý request của gunicorn"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.AI_ANALYSIS_WORKERS,
+                    thread_name_prefix='ai-analysis'
+                )
+    return _executor
+
+
+def _run_job(job_id: str, job: dict, func, args):
+    # Dùng bản job của submit_job, không đọc lại cache: entry có thể đã bị evict và mất submitted_at
+    key = _job_key(job_id)
+    job = dict(job, status=JOB_RUNNING, started_at=time.time())
+    cache.set(key, job, timeout=JOB_TTL)
+
+    try:
+        job.update(status=JOB_DONE, result=func(*args))
+    except Exception as e:
+        # Job lỗi lưu là FAILED (kèm kết quả dự phòng) để lần gửi sau chạy lại được
+        logger.error(f"Job phân tích AI {job_id} lỗi: {str(e)}")
+        job.update(status=JOB_FAILED, result=job['fallback'], error=str(e))
+    finally:
+        # Thread nền tự mở kết nối DB - đóng lại để không rò kết nối
+        close_old_connections()
+
+    job['finished_at'] = time.time()
+    cache.set(key, job, timeout=JOB_TTL)
+
+
+def submit_job(job_id: str, func, *args, fallback: str = '') -> dict:
+    """
+    Đưa job vào hàng đợi (bỏ qua nếu job cùng id đang chạy hoặc đã xong)
+
+    Args:
+        job_id: id ổn định cho cùng một yêu cầu (các request giống nhau dùng chung job)
+        fallback: kết quả trả về khi job lỗi hoặc quá thời gian; func nên raise khi lỗi
+            (không tự trả kết quả dự phòng) để job được đánh dấu FAILED và có thể chạy lại
+    """
+    job = {'status': JOB_PENDING, 'submitted_at': time.time(), 'result': None, 'fallback': fallback}
+    if not cache.add(_job_key(job_id), job, timeout=JOB_TTL):
+        existing = get_job(job_id)
+        if existing and existing['status'] not in (JOB_FAILED, JOB_TIMEOUT):
+            return existing
+        cache.set(_job_key(job_id), job, timeout=JOB_TTL)
+
+    _get_executor().submit(_run_job, job_id, job, func, args)
+    return job
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Trạng thái job; job chờ/chạy quá AI_ANALYSIS_JOB_TIMEOUT giây được đánh dấu timeout"""
+    key = _job_key(job_id)
+    job = cache.get(key)
+    if job is None:
+        return None
+
+    if job['status'] in (JOB_PENDING, JOB_RUNNING):
+        if time.time() - job['submitted_at'] > settings.AI_ANALYSIS_JOB_TIMEOUT:
+            job.update(status=JOB_TIMEOUT, result=job.get('fallback', ''))
+            cache.set(key, job, timeout=JOB_TTL)
+    return job
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from typing import Optional, Sequence, Tuple
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+import numpy as np
+from .data_version import get_data_version, versioned_key
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Chuẩn hóa câu hỏi cho cache khớp chính xác (giữ dấu tiếng Việt vì dấu đổi nghĩa)"""
+    text = unicodedata.normalize('NFC', question or '').lower()
+    text = ' '.join(text.split())
+    return text.rstrip(' ?!.')
+
+
+def _exact_key(question: str) -> str:
+    digest = hashlib.sha256(normalize_question(question).encode('utf-8')).hexdigest()
+    return versioned_key(f"chatbot_answer:{digest}")
+
+
+def get_exact_answer(question: str) -> Optional[Tuple[str, str]]:
+    """Tầng 1: câu hỏi giống hệt sau chuẩn hóa (dùng chung giữa các worker qua Django cache)"""
+    return cache.get(_exact_key(question))
+
+
+def set_exact_answer(question: str, answer: str, footer: str):
+    cache.set(_exact_key(question), (answer, footer), timeout=settings.CHATBOT_CACHE_TTL)
+
+
+class SemanticAnswerCache:
+    """
+    Tầng 2: câu hỏi gần nghĩa - cosine similarity giữa embedding câu hỏi
+
+    Chỉ dùng lại câu trả lời khi tập trường tìm được giống hệt, để câu trả lời
+    luôn dựa trên cùng dữ liệu. Giới hạn số bản ghi (LRU), có TTL và tự xóa
+    khi phiên bản dữ liệu thay đổi.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        version = get_data_version()
+        if self._version != version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, embedding, university_ids: Sequence[int]) -> Optional[Tuple[str, str]]:
+        key = tuple(sorted(university_ids))
+        query = self._unit(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+            best_id, best_score = None, self.threshold
+            for entry_id, (ids, vector, answer, footer, created_at) in list(self._entries.items()):
+                if now - created_at > self.ttl:
+                    del self._entries[entry_id]
+                    continue
+                if ids != key:
+                    continue
+                score = float(np.dot(query, vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            _, _, answer, footer, _ = self._entries[best_id]
+            return answer, footer
+
+    def set(self, embedding, university_ids: Sequence[int], answer: str, footer: str):
+        with self._lock:
+            self._check_version()
+            self._entries[self._next_id] = (
+                tuple(sorted(university_ids)), self._unit(embedding), answer, footer, time.time()
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_semantic_cache: Optional[SemanticAnswerCache] = None
+_semantic_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    global _semantic_cache
+
+    if _semantic_cache is None:
+        with _semantic_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticAnswerCache(
+                    max_entries=settings.CHATBOT_CACHE_MAX_ENTRIES,
+                    ttl=settings.CHATBOT_CACHE_TTL,
+                    threshold=settings.CHATBOT_SEMANTIC_THRESHOLD,
+                )
+    return _semantic_cache
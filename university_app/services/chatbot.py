@@ -0,0 +1,213 @@
+"""
+Chatbot instance dùng chung trong process và đồng bộ vector index khi dữ liệu thay đổi
+
+Module này không import chromadb/genai ở top-level để signals và views import được
+kể cả khi chatbot chưa được dùng.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+import logging
+import threading
+import time
+from .data_version import versioned_key
+
+logger = logging.getLogger(__name__)
+
+# Có thay đổi dữ liệu trong lúc chưa process nào nạp chatbot - đồng bộ khi nạp
+INDEX_DIRTY_KEY = 'chatbot_index_dirty'
+# Process đã nhận làm nóng câu hỏi gợi ý cho phiên bản dữ liệu hiện tại
+PREWARM_KEY_PREFIX = 'chatbot_prewarm'
+
+# ============================================================================
+# SINGLETON CHATBOT INSTANCE (Memory Optimization for 1GB RAM limit)
+# ============================================================================
+# Create chatbot instance ONCE and reuse for all requests
+# This prevents loading 800MB of ML models on every single request
+_chatbot_instance = None
+_chatbot_lock = threading.Lock()
+
+# Trạng thái làm nóng chatbot khi worker khởi động (mỗi process)
+WARMUP_DISABLED = 'disabled'
+WARMUP_RUNNING = 'warming'
+WARMUP_READY = 'ready'
+WARMUP_FAILED = 'failed'
+
+# Làm nóng lỗi: /healthz/ready thử lại sau ngần này giây, worker chưa sẵn sàng cho tới khi xong
+WARMUP_RETRY_SECONDS = 30
+
+_warmup_lock = threading.Lock()
+_warmup = {'state': WARMUP_DISABLED, 'started_at': None, 'finished_at': None, 'error': None}
+
+# Một thread duy nhất để các lần đồng bộ index không chạy chồng lên nhau
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chatbot-index-sync')
+_pending_lock = threading.Lock()
+_pending_ids = set()
+_pending_full = False
+_sync_scheduled = False
+
+
+def get_chatbot_instance():
+    """
+    Get or create global chatbot instance (thread-safe singleton)
+
+    Returns:
+        GeminiChatbotRAG: Singleton chatbot instance
+    """
+    global _chatbot_instance
+
+    # Double-check locking pattern for thread safety
+    if _chatbot_instance is None:
+        with _chatbot_lock:
+            if _chatbot_instance is None:
+                from .gemini_rag import GeminiChatbotRAG
+
+                logger.info("=" * 60)
+                logger.info("🤖 Initializing chatbot instance for the FIRST time...")
+                logger.info("   This will load ~800MB of ML models into RAM")
+                logger.info("   Subsequent requests will REUSE this instance")
+                logger.info("=" * 60)
+
+                _chatbot_instance = GeminiChatbotRAG()
+
+                logger.info("✅ Chatbot instance created and cached!")
+                logger.info("   Ready to serve requests")
+
+                if settings.CHATBOT_PREWARM_SUGGESTIONS and _claim_prewarm():
+                    threading.Thread(
+                        target=_prewarm_chatbot, args=(_chatbot_instance,),
+                        name='chatbot-prewarm', daemon=True
+                    ).start()
+
+    # Process khác đã sửa dữ liệu lúc chưa nạp chatbot: đồng bộ (gộp trong thread đồng bộ
+    # nên gọi lặp lại trong lúc đang chạy không tạo thêm việc)
+    if cache.get(INDEX_DIRTY_KEY):
+        schedule_index_sync()
+
+    return _chatbot_instance
+
+
+def get_loaded_chatbot():
+    """Chatbot instance nếu process này đã nạp, không tự nạp model"""
+    return _chatbot_instance
+
+
+def _claim_prewarm() -> bool:
+    """
+    Chỉ một process làm nóng câu hỏi gợi ý cho mỗi phiên bản dữ liệu: câu trả lời nằm
+    trong cache dùng chung, các worker khác không cần gọi Gemini lại cho cùng câu hỏi
+    """
+    return cache.add(versioned_key(PREWARM_KEY_PREFIX), 1, timeout=settings.CHATBOT_CACHE_TTL)
+
+
+def _prewarm_chatbot(chatbot):
+    """Chạy nền: trả lời trước các câu hỏi gợi ý"""
+    try:
+        chatbot.warm_answer_cache()
+    except Exception as e:
+        logger.error(f"Lỗi làm nóng cache chatbot: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def start_warmup(force: bool = False):
+    """
+    Làm nóng chatbot trong thread nền: nạp model, mở Chroma, chạy một truy vấn thử
+
+    Gọi từ gunicorn post_worker_init khi CHATBOT_WARMUP_ON_BOOT=True, để người dùng
+    đầu tiên sau deploy / sau khi worker bị thay (--max-requests) không phải chờ.
+
+    Args:
+        force: bỏ qua CHATBOT_WARMUP_ON_BOOT
+    """
+    if not (force or settings.CHATBOT_WARMUP_ON_BOOT):
+        return None
+    with _warmup_lock:
+        if _warmup['state'] in (WARMUP_RUNNING, WARMUP_READY):
+            return None
+        _warmup.update(state=WARMUP_RUNNING, started_at=time.time(), finished_at=None, error=None)
+
+    thread = threading.Thread(target=_run_warmup, name='chatbot-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_warmup():
+    try:
+        get_chatbot_instance().warm_up()
+    except Exception as e:
+        logger.error(f"Lỗi làm nóng chatbot: {str(e)}")
+        with _warmup_lock:
+            _warmup.update(state=WARMUP_FAILED, finished_at=time.time(), error=str(e))
+    else:
+        with _warmup_lock:
+            _warmup.update(state=WARMUP_READY, finished_at=time.time())
+            seconds = _warmup['finished_at'] - _warmup['started_at']
+        logger.info(f"Chatbot đã sẵn sàng sau {seconds:.1f}s")
+    finally:
+        close_old_connections()
+
+
+def retry_failed_warmup():
+    """Làm nóng lại nếu lần trước lỗi và đã qua WARMUP_RETRY_SECONDS"""
+    with _warmup_lock:
+        failed_at = _warmup['finished_at'] if _warmup['state'] == WARMUP_FAILED else None
+    if failed_at is None or time.time() - failed_at < WARMUP_RETRY_SECONDS:
+        return None
+    return start_warmup(force=True)
+
+
+def get_warmup_status() -> dict:
+    """Trạng thái làm nóng của process hiện tại (cho /healthz/ready)"""
+    with _warmup_lock:
+        status = dict(_warmup)
+    if status['started_at'] is not None:
+        end = status['finished_at'] or time.time()
+        status['seconds'] = round(end - status['started_at'], 2)
+    return status
+
+
+def schedule_index_sync(university_ids=None):
+    """
+    Đưa yêu cầu đồng bộ vector index vào hàng đợi (gộp các thay đổi liên tiếp)
+
+    Args:
+        university_ids: các trường cần đồng bộ, None = toàn bộ (VD: đổi tên quốc gia)
+    """
+    global _pending_full, _sync_scheduled
+
+    if _chatbot_instance is None:
+        # Không nạp model ~800MB chỉ vì một lần sửa dữ liệu
+        cache.add(INDEX_DIRTY_KEY, True, timeout=None)
+        return
+
+    with _pending_lock:
+        if university_ids is None:
+            _pending_full = True
+        else:
+            _pending_ids.update(university_ids)
+        if _sync_scheduled:
+            return
+        _sync_scheduled = True
+    _sync_executor.submit(_run_index_sync)
+
+
+def _run_index_sync():
+    global _pending_full, _sync_scheduled
+
+    with _pending_lock:
+        university_ids = None if _pending_full else sorted(_pending_ids)
+        _pending_ids.clear()
+        _pending_full = False
+        _sync_scheduled = False
+
+    try:
+        if university_ids is None:
+            cache.delete(INDEX_DIRTY_KEY)
+        _chatbot_instance.sync_index(university_ids)
+    except Exception as e:
+        logger.error(f"Lỗi đồng bộ vector index: {str(e)}")
+        cache.set(INDEX_DIRTY_KEY, True, timeout=None)
+    finally:
+        close_old_connections()
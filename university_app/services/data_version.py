@@ -0,0 +1,63 @@
+from django.core.cache import cache
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSION_KEY = 'data_version'
+
+
+def _initial_version() -> int:
+    # Khởi tạo theo thời gian (nano giây) để phiên bản không quay lại giá trị cũ khi key bị evict
+    return time.time_ns()
+
+
+def get_data_version() -> int:
+    """Lấy phiên bản dữ liệu hiện tại (tăng mỗi khi admin sửa dữ liệu)"""
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        initial = _initial_version()
+        cache.add(DATA_VERSION_KEY, initial, timeout=None)
+        version = cache.get(DATA_VERSION_KEY, initial)
+    return version
+
+
+def bump_data_version() -> int:
+    """
+    Tăng phiên bản dữ liệu, làm mọi cache gắn với phiên bản cũ hết hiệu lực
+
+    Không dùng cache.incr: với FileBasedCache đó là get + set không nguyên tử và đặt lại
+    thời hạn mặc định cho key. Giá trị mới lấy theo đồng hồ nano giây nên hai lần tăng
+    đồng thời vẫn cho hai phiên bản khác nhau và không trùng phiên bản nào đã dùng.
+    """
+    version = max(_initial_version(), (cache.get(DATA_VERSION_KEY) or 0) + 1)
+    cache.set(DATA_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def versioned_key(prefix: str) -> str:
+    """Tạo cache key gắn với phiên bản dữ liệu hiện tại"""
+    return f"{prefix}:v{get_data_version()}"
+
+
+class VersionedProcessCache:
+    """
+    Giá trị dùng chung trong process (index, bảng tra cứu...) được build lại
+    khi phiên bản dữ liệu thay đổi
+    """
+
+    def __init__(self, builder):
+        self._builder = builder
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_data_version()
+        if self._value is None or self._version != version:
+            with self._lock:
+                if self._value is None or self._version != version:
+                    self._value = self._builder()
+                    self._version = version
+        return self._value
@@ -0,0 +1,329 @@
+"""
+Embedding cho chatbot: dùng chung một model giữa các worker qua sidecar
+
+Sidecar (python manage.py run_embedding_server) nạp model một lần và phục vụ các
+gunicorn worker qua Unix socket, gộp request đồng thời thành một lần encode.
+Khi không cấu hình hoặc không kết nối được sidecar, worker tự nạp model trong process.
+
+Giao thức: mỗi message là 4 byte độ dài (big-endian) + JSON UTF-8.
+
+Backend (EMBEDDING_BACKEND):
+- sentence-transformers: model PyTorch đầy đủ
+- onnx-int8: bản export ONNX lượng tử hóa int8 của cùng model (download_models.py tạo
+  lúc build), nhẹ RAM và nhanh hơn trên CPU; thiếu file export thì dùng sentence-transformers
+"""
+from concurrent.futures import Future
+from django.conf import settings
+from typing import Callable, List, Optional
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
+BACKEND_SENTENCE_TRANSFORMERS = 'sentence-transformers'
+BACKEND_ONNX_INT8 = 'onnx-int8'
+
+# Tên file phải khớp với download_models.py
+ONNX_MODEL_FILE = 'model_quantized.onnx'
+ONNX_CONFIG_FILE = 'embedding_config.json'
+
+_HEADER = struct.Struct('>I')
+
+
+def _recv_exact(conn, size: int) -> Optional[bytes]:
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def send_message(conn, payload: dict):
+    body = json.dumps(payload).encode('utf-8')
+    conn.sendall(_HEADER.pack(len(body)) + body)
+
+
+def recv_message(conn) -> Optional[dict]:
+    header = _recv_exact(conn, _HEADER.size)
+    if header is None:
+        return None
+    body = _recv_exact(conn, _HEADER.unpack(header)[0])
+    if body is None:
+        return None
+    return json.loads(body.decode('utf-8'))
+
+
+class EmbeddingServer:
+    """
+    Sidecar phục vụ embedding qua Unix socket
+
+    Mỗi kết nối được xử lý trên một thread; một thread gộp các request đang chờ
+    (tối đa max_batch văn bản hoặc chờ max_wait giây) thành một lần gọi encode.
+    """
+
+    def __init__(self, socket_path: str, encode: Callable[[List[str]], List[List[float]]],
+                 max_batch: int = 64, max_wait: float = 0.01):
+        self.socket_path = socket_path
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._socket = None
+        self._stopped = threading.Event()
+
+    def _batch_loop(self):
+        while not self._stopped.is_set():
+            try:
+                items = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            count = len(items[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                items.append(item)
+                count += len(item[0])
+
+            texts = [text for batch_texts, _ in items for text in batch_texts]
+            try:
+                vectors = self.encode(texts)
+            except Exception as e:
+                logger.error(f"Lỗi encode {len(texts)} văn bản: {str(e)}")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for batch_texts, future in items:
+                future.set_result(vectors[offset:offset + len(batch_texts)])
+                offset += len(batch_texts)
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = recv_message(conn)
+                except (OSError, ValueError):
+                    return
+                if request is None:
+                    return
+
+                if request.get('ping'):
+                    send_message(conn, {'ok': True})
+                    continue
+
+                future = Future()
+                self._queue.put((list(request.get('texts', [])), future))
+                try:
+                    send_message(conn, {'embeddings': future.result()})
+                except OSError:
+                    return
+                except Exception as e:
+                    send_message(conn, {'error': str(e)})
+
+    def bind(self):
+        # Xóa socket cũ còn sót khi sidecar trước bị kill
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._socket.listen(64)
+
+    def serve_forever(self):
+        if self._socket is None:
+            self.bind()
+        threading.Thread(target=self._batch_loop, name='embedding-batcher', daemon=True).start()
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._socket is not None:
+            self._socket.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class SocketEmbeddingFunction:
+    """
+    Embedding function (giao diện giống embedding function của Chroma) gọi sidecar
+
+    Nếu sidecar ngừng hoạt động giữa chừng, tự nạp model trong process để chatbot
+    vẫn trả lời được.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0, fallback_factory=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._fallback_factory = fallback_factory
+        self._fallback = None
+        self._fallback_lock = threading.Lock()
+
+    def _request(self, payload: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            send_message(conn, payload)
+            response = recv_message(conn)
+        if response is None:
+            raise ConnectionError('Embedding server đóng kết nối')
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    def ping(self) -> bool:
+        try:
+            return bool(self._request({'ping': True}).get('ok'))
+        except (OSError, ConnectionError, ValueError):
+            return False
+
+    def wait_until_ready(self, timeout: float) -> bool:
+        """Chờ sidecar sẵn sàng (sidecar mất vài giây để nạp model khi container khởi động)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.ping():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        if self._fallback is None:
+            try:
+                return self._request({'texts': list(input)})['embeddings']
+            except (FileNotFoundError, ConnectionError) as e:
+                # Chỉ khi sidecar không còn chạy; timeout (VD: đang nạp model) thì báo lỗi như bình thường
+                if self._fallback_factory is None:
+                    raise
+                logger.error(f"Không gọi được embedding server ({str(e)}), nạp model trong process")
+                with self._fallback_lock:
+                    if self._fallback is None:
+                        self._fallback = self._fallback_factory()
+        return self._fallback(input)
+
+
+def mean_pooling(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Trung bình embedding các token thật (bỏ padding) - giống pooling của sentence-transformers"""
+    mask = attention_mask[..., np.newaxis].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class OnnxEmbeddingFunction:
+    """Embedding function chạy bản export ONNX int8 bằng ONNX Runtime (không cần PyTorch)"""
+
+    def __init__(self, model_dir: str, batch_size: int = 32):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding='utf-8') as f:
+            config = json.load(f)
+
+        self.batch_size = batch_size
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self._tokenizer.enable_truncation(max_length=config['max_length'])
+        self._tokenizer.enable_padding(pad_id=config['pad_token_id'], pad_token=config['pad_token'])
+
+        options = onnxruntime.SessionOptions()
+        # Arena giữ lại bộ nhớ đỉnh của batch lớn nhất - tắt để RSS không phình theo lúc build index
+        options.enable_cpu_mem_arena = False
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options, providers=['CPUExecutionProvider']
+        )
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self._input_names:
+            feeds['token_type_ids'] = np.zeros_like(input_ids)
+        token_embeddings = self._session.run(None, feeds)[0]
+        return mean_pooling(token_embeddings, attention_mask)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        texts = list(input)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+
+def onnx_export_available() -> bool:
+    model_dir = settings.EMBEDDING_ONNX_DIR
+    return all(os.path.exists(os.path.join(model_dir, name))
+               for name in (ONNX_MODEL_FILE, ONNX_CONFIG_FILE, 'tokenizer.json'))
+
+
+def _sentence_transformer_function():
+    from chromadb.utils import embedding_functions
+
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME)
+
+
+def _onnx_function():
+    return OnnxEmbeddingFunction(settings.EMBEDDING_ONNX_DIR)
+
+
+EMBEDDING_BACKENDS = {
+    BACKEND_SENTENCE_TRANSFORMERS: _sentence_transformer_function,
+    BACKEND_ONNX_INT8: _onnx_function,
+}
+
+
+def resolve_backend() -> str:
+    """Backend sẽ dùng thực tế: theo EMBEDDING_BACKEND, trừ khi thiếu file export ONNX"""
+    backend = settings.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        logger.error(f"EMBEDDING_BACKEND không hợp lệ: {backend}, dùng {BACKEND_SENTENCE_TRANSFORMERS}")
+        return BACKEND_SENTENCE_TRANSFORMERS
+    if backend == BACKEND_ONNX_INT8 and not onnx_export_available():
+        logger.warning(
+            f"Không thấy bản export ONNX tại {settings.EMBEDDING_ONNX_DIR} "
+            f"(chạy download_models.py), dùng {BACKEND_SENTENCE_TRANSFORMERS}"
+        )
+        return BACKEND_SENTENCE_TRANSFORMERS
+    return backend
+
+
+def create_local_embedding_function(backend: Optional[str] = None):
+    """Nạp model trong process hiện tại (backend=None: theo cấu hình)"""
+    return EMBEDDING_BACKENDS[backend or resolve_backend()]()
+
+
+def get_embedding_function():
+    """Embedding function cho chatbot: sidecar nếu có, ngược lại nạp model trong process"""
+    socket_path = settings.EMBEDDING_SERVER_SOCKET
+    if socket_path:
+        client = SocketEmbeddingFunction(
+            socket_path, timeout=settings.EMBEDDING_SERVER_TIMEOUT, fallback_factory=create_local_embedding_function
+        )
+        if client.wait_until_ready(settings.EMBEDDING_SERVER_WAIT):
+            logger.info(f"Dùng embedding server tại {socket_path}")
+            return client
+        logger.warning(f"Không kết nối được embedding server tại {socket_path}, nạp model trong process")
+    return create_local_embedding_function()
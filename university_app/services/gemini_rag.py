@@ -1,183 +1,280 @@
-import chromadb
-from chromadb.utils import embedding_functions
 from django.conf import settings
-from django.db.models import Avg
-from ..models import University, UniversityProgram, Ranking
-import google.generativeai as genai
+from ..models import University
+from .ai_dependencies import load_chromadb
+from .answer_cache import get_exact_answer, set_exact_answer, get_semantic_cache
+from .embeddings import get_embedding_function, resolve_backend, EMBEDDING_MODEL_NAME, BACKEND_SENTENCE_TRANSFORMERS
+from .hybrid_search import get_bm25_index, detect_constraints, to_chroma_where, reciprocal_rank_fusion
+from .llm_gateway import LLMStreamTruncated, get_llm_gateway
+from .rag_context import build_context
+from .rag_corpus import iter_document_chunks
 import logging
+import os
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+COLLECTION_NAME = "universities_gemini"
+CHROMA_PATH = "./chromadb_data"
+# Tên collection đang phục vụ. Rebuild tạo collection mới rồi ghi đè file này (một lần
+# os.replace), nên lúc nào cũng có collection để đọc. Lưu cạnh dữ liệu Chroma thay vì
+# trong Django cache: cache file/locmem có thể bị evict hoặc không dùng chung giữa process.
+LIVE_COLLECTION_FILE = os.path.join(CHROMA_PATH, 'live_collection')
+
+NO_DATA_ANSWER = """
+Xin lỗi, tôi không tìm thấy thông tin liên quan trong cơ sở dữ liệu.
+
+Gợi ý:
+- Thử hỏi về trường cụ thể (VD: "Thông tin về MIT")
+- Hỏi về chuyên ngành (VD: "Trường nào tốt cho Computer Science?")
+- Hỏi về quốc gia (VD: "Các trường đại học ở Mỹ")
+"""
+
+
+def _read_live_collection_name() -> str:
+    """Tên collection đang phục vụ (COLLECTION_NAME nếu chưa rebuild lần nào)"""
+    try:
+        with open(LIVE_COLLECTION_FILE, encoding='utf-8') as f:
+            return f.read().strip() or COLLECTION_NAME
+    except FileNotFoundError:
+        return COLLECTION_NAME
+
+
+def _write_live_collection_name(name: str):
+    tmp_path = f"{LIVE_COLLECTION_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(tmp_path, LIVE_COLLECTION_FILE)
+
+
+def _error_answer(error: Exception) -> str:
+    return f"""
+Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi của bạn.
+
+Chi tiết lỗi: {str(error)}
+
+Vui lòng thử lại hoặc liên hệ quản trị viên nếu lỗi vẫn tiếp tục.
+"""
+
+
 class GeminiChatbotRAG:
     """RAG chatbot sử dụng Google Gemini - Hoàn toàn MIỄN PHÍ"""
 
     def __init__(self):
-        # 1. Cấu hình Gemini
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # Sử dụng Gemini 2.5 Flash (mới nhất, FREE)
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+        # 1. Gemini (2.5 Flash, FREE) được gọi qua cổng LLM dùng chung
+        #    (giới hạn đồng thời/tốc độ, gộp prompt trùng, deadline, thử lại)
+        self.llm = get_llm_gateway()
 
         # 2. ChromaDB với Sentence Transformers (FREE embedding)
-        self.client = chromadb.PersistentClient(path="./chromadb_data")
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+        self.client = load_chromadb().PersistentClient(path=CHROMA_PATH)
+        # Dùng embedding server chung giữa các worker nếu có (tiết kiệm RAM)
+        self.embedding_fn = get_embedding_function()
+        self.embedding_backend = resolve_backend()
 
         # 3. Tạo collection
+        self._live_name = _read_live_collection_name()
         try:
             self.collection = self.client.get_collection(
-                name="universities_gemini",
+                name=self._live_name,
                 embedding_function=self.embedding_fn
             )
             logger.info("Đã tải collection có sẵn")
-        except:
-            self.collection = self.client.create_collection(
-                name="universities_gemini",
+            self._check_index_backend()
+        except Exception:
+            # Chưa có index; get_or_create để các worker khởi động cùng lúc không lỗi
+            self.collection = self.client.get_or_create_collection(
+                name=self._live_name,
+                embedding_function=self.embedding_fn,
+                metadata=self._collection_metadata()
+            )
+            if self.collection.count() == 0:
+                self._build_initial_data()
+
+    def _collection_metadata(self):
+        return {'embedding_backend': self.embedding_backend}
+
+    def _check_index_backend(self):
+        """Vector của hai backend gần nhau nhưng không trùng khớp - nhắc rebuild khi đổi backend"""
+        # Collection tạo trước khi có nhiều backend không có metadata: sentence-transformers
+        indexed = (self.collection.metadata or {}).get('embedding_backend', BACKEND_SENTENCE_TRANSFORMERS)
+        if indexed != self.embedding_backend:
+            logger.warning(
+                f"Vector index được tạo bằng {indexed} nhưng đang dùng {self.embedding_backend}, "
+                f"chạy 'python manage.py rebuild_chatbot' để đồng bộ"
+            )
+
+    def _live_collection(self):
+        """Collection đang phục vụ; nạp lại nếu process khác vừa rebuild và hoán đổi"""
+        name = _read_live_collection_name()
+        if name != self._live_name:
+            self.collection = self.client.get_collection(
+                name=name,
                 embedding_function=self.embedding_fn
             )
-            self._build_initial_data()
+            self._live_name = name
+        return self.collection
 
     def _build_initial_data(self):
         """Tạo dữ liệu vector lần đầu"""
         logger.info("Đang tạo vector database...")
 
-        universities = University.objects.select_related('country').all()  # LẤY TẤT CẢ
-
         # Kiểm tra nếu database trống, skip để tránh OOM
-        if not universities.exists():
+        if not University.objects.exists():
             logger.warning("Database trống, bỏ qua việc build ChromaDB để tránh OOM. Hãy load data trước!")
             return
 
-        documents = []
-        metadatas = []
-        ids = []
-
-        for uni in universities:
-            # Lấy thông tin
-            programs = uni.universityprogram_set.all()[:5]
-            majors = ", ".join([p.major.name for p in programs if p.major])
-            ranking = uni.ranking_set.order_by('-fyear').first()
-            avg_tuition = uni.universityprogram_set.aggregate(
-                avg_fee=Avg('tuition_fee')
-            )['avg_fee']
-
-            # Tạo document text
-            doc = f"""
-            Tên trường: {uni.name}
-            Tên viết tắt: {uni.short_name or 'N/A'}
-            Quốc gia: {uni.country.name if uni.country else 'Không xác định'}
-            Mô tả: {uni.description or 'Chưa có mô tả'}
-            Chuyên ngành đào tạo: {majors or 'Chưa cập nhật'}
-            Xếp hạng thế giới: {ranking.frank if ranking else 'Chưa có xếp hạng'}
-            Nguồn xếp hạng: {ranking.ranking_sources.name if ranking and ranking.ranking_sources else 'N/A'}
-            Năm thành lập: {uni.founded_year or 'Không rõ'}
-            Học phí trung bình: {f'${avg_tuition:,.0f}/năm' if avg_tuition else 'Chưa có thông tin'}
-            Website: {uni.website or 'Chưa có'}
-            """
-
-            documents.append(doc)
-            metadatas.append({
-                'name': uni.name,
-                'country': uni.country.name if uni.country else 'Unknown',
-                'id': uni.id,
-                'ranking': ranking.frank if ranking else 9999
-            })
-            ids.append(f"uni_{uni.id}")
-
-        # Thêm vào ChromaDB
-        if documents:
-            self.collection.add(
+        stats = self.sync_index(collection=self.collection)
+        logger.info(f"Đã tạo embeddings cho {stats['upserted']} trường đại học")
+
+    def _embed_documents(self, documents: list) -> list:
+        """Embed theo từng batch cố định để bộ nhớ đỉnh không tăng theo số document"""
+        embeddings = []
+        batch_size = settings.CHATBOT_EMBEDDING_BATCH_SIZE
+        for start in range(0, len(documents), batch_size):
+            embeddings.extend(
+                [float(value) for value in vector]
+                for vector in self.embedding_fn(documents[start:start + batch_size])
+            )
+        return embeddings
+
+    def _upsert_changed(self, collection, batch, stats):
+        """Chỉ embed lại document có content_hash khác bản đang lưu"""
+        existing = collection.get(ids=[doc_id for doc_id, _, _ in batch], include=['metadatas'])
+        stored_hashes = {
+            doc_id: (metadata or {}).get('content_hash')
+            for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+        }
+        changed = [item for item in batch if stored_hashes.get(item[0]) != item[2]['content_hash']]
+        stats['unchanged'] += len(batch) - len(changed)
+        if changed:
+            documents = [doc for _, doc, _ in changed]
+            collection.upsert(
+                ids=[doc_id for doc_id, _, _ in changed],
                 documents=documents,
-                metadatas=metadatas,
-                ids=ids
+                embeddings=self._embed_documents(documents),
+                metadatas=[metadata for _, _, metadata in changed]
             )
-            logger.info(f"Đã tạo embeddings cho {len(documents)} trường đại học")
+            stats['upserted'] += len(changed)
 
-    def chat(self, user_message: str) -> str:
+    def sync_index(self, university_ids=None, collection=None) -> dict:
         """
-        Hàm chính - Nhận câu hỏi, trả về câu trả lời
+        Đồng bộ tăng dần vector index với database
 
         Args:
-            user_message: Câu hỏi của người dùng
+            university_ids: chỉ đồng bộ các trường này (None = toàn bộ)
+            collection: collection đích (mặc định collection đang phục vụ)
 
         Returns:
-            Câu trả lời từ Gemini dựa trên dữ liệu DB
+            Số document đã embed lại / đã xóa / không đổi
         """
-        try:
-            # 1. Tìm kiếm semantic trong vector DB
-            results = self.collection.query(
-                query_texts=[user_message],
-                n_results=5
-            )
+        collection = collection or self._live_collection()
+        stats = {'upserted': 0, 'deleted': 0, 'unchanged': 0}
+        seen = set()
+
+        # Document được sinh và embed theo từng lô - chỉ một lô nằm trong bộ nhớ
+        for chunk in iter_document_chunks(university_ids, chunk_size=settings.CHATBOT_INDEX_CHUNK_SIZE):
+            seen.update(doc_id for doc_id, _, _ in chunk)
+            self._upsert_changed(collection, chunk, stats)
+
+        # Xóa document của trường không còn trong database
+        if university_ids is None:
+            indexed_ids = collection.get(include=[])['ids']
+        else:
+            indexed_ids = collection.get(ids=[f"uni_{uid}" for uid in university_ids], include=[])['ids']
+        removed = sorted(set(indexed_ids) - seen)
+        if removed:
+            collection.delete(ids=removed)
+            stats['deleted'] = len(removed)
+
+        logger.info(
+            f"Đồng bộ vector index: {stats['upserted']} cập nhật, "
+            f"{stats['deleted']} xóa, {stats['unchanged']} không đổi"
+        )
+        return stats
 
-            # 2. Lấy thông tin chi tiết từ SQL Database
-            context = ""
-            universities_found = []
-
-            if results['ids'] and results['ids'][0]:
-                uni_ids = [meta['id'] for meta in results['metadatas'][0]]
-                universities = University.objects.filter(
-                    id__in=uni_ids
-                ).select_related('country').prefetch_related(
-                    'ranking_set__ranking_sources',
-                    'universityprogram_set__major',
-                    'universityprogram_set__program'
-                )
-
-                for uni in universities:
-                    # Xếp hạng
-                    ranking = uni.ranking_set.order_by('-fyear').first()
-
-                    # Chương trình học
-                    programs = uni.universityprogram_set.all()[:3]
-                    program_details = []
-                    for prog in programs:
-                        if prog.major and prog.program:
-                            fee_str = f"${prog.tuition_fee:,.0f}/năm" if prog.tuition_fee else "N/A"
-                            program_details.append(
-                                f"{prog.major.name} ({prog.program.level}): {fee_str}"
-                            )
-
-                    # Yêu cầu tuyển sinh
-                    requirements = uni.universityadmissionrequirement_set.all()[:3]
-                    req_details = []
-                    for req in requirements:
-                        if req.criteria:
-                            req_details.append(f"{req.criteria.name}: {req.value}")
-
-                    context += f"""
-========================================
-TRƯỜNG: {uni.name}
-========================================
-Quốc gia: {uni.country.name if uni.country else 'N/A'}
-Xếp hạng thế giới: #{ranking.frank if ranking else 'N/A'} ({ranking.ranking_sources.name if ranking and ranking.ranking_sources else 'N/A'})
-Năm thành lập: {uni.founded_year or 'N/A'}
-Website: {uni.website or 'N/A'}
-
-Chương trình đào tạo:
-{chr(10).join(['  - ' + p for p in program_details]) if program_details else '  Chưa có thông tin'}
-
-Yêu cầu tuyển sinh:
-{chr(10).join(['  - ' + r for r in req_details]) if req_details else '  Chưa có thông tin'}
-
-Mô tả: {(uni.description or 'Chưa có mô tả')[:200]}...
+    def _search(self, user_message: str):
+        """
+        Tìm trường liên quan: vector (Chroma) + BM25, gộp bằng RRF
 
-"""
-                    universities_found.append(uni.name)
+        Quốc gia / top N xếp hạng nhận ra trong câu hỏi được lọc ngay ở cả hai phía.
+        Embedding câu hỏi được tính một lần và dùng cho cả Chroma lẫn cache gần nghĩa.
 
-            # 3. Kiểm tra có dữ liệu không
-            if not context.strip():
-                return """
-Xin lỗi, tôi không tìm thấy thông tin liên quan trong cơ sở dữ liệu.
+        Returns:
+            (embedding, uni_ids) - uni_ids theo thứ tự liên quan giảm dần
+        """
+        embedding = [float(value) for value in self.embedding_fn([user_message])[0]]
+        bm25 = get_bm25_index()
+        constraints = detect_constraints(user_message, bm25.countries)
+        candidates = settings.CHATBOT_RETRIEVAL_CANDIDATES
+
+        vector_ids = self._vector_search(embedding, candidates, to_chroma_where(constraints))
+        lexical_ids = [bm25.metadatas[doc_id]['id'] for doc_id, _ in bm25.search(user_message, candidates, constraints)]
+        if constraints and not vector_ids and not lexical_ids:
+            # Ràng buộc nhận nhầm hoặc không trường nào thỏa: tìm lại không lọc
+            logger.info(f"Không có trường thỏa {constraints}, tìm không lọc")
+            vector_ids = self._vector_search(embedding, candidates, None)
+            lexical_ids = [bm25.metadatas[doc_id]['id'] for doc_id, _ in bm25.search(user_message, candidates)]
+
+        uni_ids = reciprocal_rank_fusion([vector_ids, lexical_ids])[:settings.CHATBOT_CONTEXT_UNIVERSITIES]
+        return embedding, uni_ids
+
+    def _vector_search(self, embedding, n_results: int, where) -> list:
+        collection = self._live_collection()
+        try:
+            results = collection.query(query_embeddings=[embedding], n_results=n_results, where=where)
+        except Exception as e:
+            # hnswlib có thể lỗi khi bộ lọc còn quá ít phần tử so với n_results
+            if where is None:
+                raise
+            logger.warning(f"Lỗi query có lọc {where}: {str(e)}, lọc lại trên kết quả không lọc")
+            results = collection.query(query_embeddings=[embedding], n_results=collection.count())
+            allowed = set(collection.get(where=where, include=[])['ids'])
+            pairs = [(doc_id, meta) for doc_id, meta in zip(results['ids'][0], results['metadatas'][0])
+                     if doc_id in allowed]
+            return [meta['id'] for _, meta in pairs[:n_results]]
+
+        if results['ids'] and results['ids'][0]:
+            return [meta['id'] for meta in results['metadatas'][0]]
+        return []
+
+    def warm_up(self):
+        """Chạy một lượt truy xuất thử: embedding, Chroma, BM25 và các query DB của context"""
+        _, uni_ids = self._search("Trường đại học tốt nhất cho Computer Science")
+        self._build_context(uni_ids)
+
+    def _build_context(self, uni_ids: list):
+        """
+        Dựng context từ SQL Database cho các trường tìm được (3 query, giới hạn token)
 
-Gợi ý:
-- Thử hỏi về trường cụ thể (VD: "Thông tin về MIT")
-- Hỏi về chuyên ngành (VD: "Trường nào tốt cho Computer Science?")
-- Hỏi về quốc gia (VD: "Các trường đại học ở Mỹ")
-"""
+        Returns:
+            (context, universities_found)
+        """
+        return build_context(uni_ids, settings.CHATBOT_CONTEXT_TOKEN_BUDGET)
 
-            # 4. Tạo prompt cho Gemini
-            prompt = f"""
+    def _lookup_cache(self, user_message: str):
+        """
+        Tra cache câu trả lời: khớp chính xác, sau đó gần nghĩa (cùng tập trường)
+
+        Returns:
+            (cached, embedding, uni_ids) - cached là (answer, footer) hoặc None
+        """
+        cached = get_exact_answer(user_message)
+        if cached is not None:
+            return cached, None, None
+
+        embedding, uni_ids = self._search(user_message)
+        if uni_ids:
+            cached = get_semantic_cache().get(embedding, uni_ids)
+            if cached is not None:
+                set_exact_answer(user_message, *cached)
+        return cached, embedding, uni_ids
+
+    def _remember(self, user_message: str, embedding, uni_ids: list, answer: str, footer: str):
+        set_exact_answer(user_message, answer, footer)
+        get_semantic_cache().set(embedding, uni_ids, answer, footer)
+
+    def _build_prompt(self, context: str, user_message: str) -> str:
+        return f"""
 Bạn là trợ lý tư vấn giáo dục thông minh, chuyên về các trường đại học trên thế giới.
 
 DỮ LIỆU CÁC TRƯỜNG LIÊN QUAN:
@@ -197,26 +294,111 @@ YÊU CẦU TRẢ LỜI:
 Hãy trả lời một cách chuyên nghiệp và hữu ích!
 """
 
+    def _build_footer(self, universities_found: list) -> str:
+        """Thông tin tham khảo: các trường đã dùng làm context"""
+        footer = f"\n\n📚 Thông tin dựa trên: {', '.join(universities_found[:3])}"
+        if len(universities_found) > 3:
+            footer += f" và {len(universities_found) - 3} trường khác"
+        return footer
+
+    def chat(self, user_message: str) -> str:
+        """
+        Hàm chính - Nhận câu hỏi, trả về câu trả lời
+
+        Args:
+            user_message: Câu hỏi của người dùng
+
+        Returns:
+            Câu trả lời từ Gemini dựa trên dữ liệu DB
+        """
+        try:
+            # 1. Cache câu trả lời (khớp chính xác / gần nghĩa)
+            cached, embedding, uni_ids = self._lookup_cache(user_message)
+            if cached is not None:
+                return cached[0] + cached[1]
+
+            # 2. Lấy thông tin chi tiết từ SQL Database
+            context, universities_found = self._build_context(uni_ids)
+
+            # 3. Kiểm tra có dữ liệu không
+            if not context.strip():
+                return NO_DATA_ANSWER
+
+            # 4. Tạo prompt cho Gemini
+            prompt = self._build_prompt(context, user_message)
+
             # 5. Gọi Gemini API (FREE)
-            response = self.model.generate_content(prompt)
-            answer = response.text
+            answer = self.llm.generate(prompt)
 
             # 6. Thêm thông tin tham khảo
-            footer = f"\n\n📚 Thông tin dựa trên: {', '.join(universities_found[:3])}"
-            if len(universities_found) > 3:
-                footer += f" và {len(universities_found) - 3} trường khác"
-
+            footer = self._build_footer(universities_found)
+            self._remember(user_message, embedding, uni_ids, answer, footer)
             return answer + footer
 
         except Exception as e:
             logger.error(f"Lỗi chatbot Gemini: {str(e)}")
-            return f"""
-Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi của bạn.
+            return _error_answer(e)
 
-Chi tiết lỗi: {str(e)}
+    def chat_stream(self, user_message: str):
+        """
+        Giống chat() nhưng trả từng phần câu trả lời ngay khi Gemini sinh ra
 
-Vui lòng thử lại hoặc liên hệ quản trị viên nếu lỗi vẫn tiếp tục.
-"""
+        Yields:
+            (event, data): ('token', đoạn văn bản) lặp lại, sau đó ('footer', thông tin
+            tham khảo); ('truncated', thông báo) trước footer nếu câu trả lời bị cắt do vượt
+            tổng thời gian; ('error', thông báo) nếu có lỗi
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        chunks = 0
+
+        try:
+            cached, embedding, uni_ids = self._lookup_cache(user_message)
+            if cached is not None:
+                logger.info(f"Chatbot stream trả lời từ cache sau {(time.perf_counter() - start) * 1000:.0f} ms")
+                yield 'token', cached[0]
+                yield 'footer', cached[1]
+                return
+
+            context, universities_found = self._build_context(uni_ids)
+            retrieved_at = time.perf_counter()
+
+            if not context.strip():
+                yield 'token', NO_DATA_ANSWER
+                return
+
+            prompt = self._build_prompt(context, user_message)
+            parts = []
+            truncated = False
+
+            try:
+                for text in self.llm.stream(prompt):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        logger.info(
+                            f"Chatbot stream TTFT: {(first_token_at - start) * 1000:.0f} ms "
+                            f"(retrieval {(retrieved_at - start) * 1000:.0f} ms)"
+                        )
+                    chunks += 1
+                    parts.append(text)
+                    yield 'token', text
+            except LLMStreamTruncated as e:
+                logger.warning(f"Chatbot stream bị cắt sau {chunks} chunk: {str(e)}")
+                truncated = True
+                yield 'truncated', str(e)
+
+            footer = self._build_footer(universities_found)
+            # Không cache câu trả lời bị cắt
+            if parts and not truncated:
+                self._remember(user_message, embedding, uni_ids, ''.join(parts), footer)
+            yield 'footer', footer
+
+        except Exception as e:
+            logger.error(f"Lỗi chatbot Gemini (stream): {str(e)}")
+            yield 'error', _error_answer(e)
+
+        finally:
+            logger.info(f"Chatbot stream tổng thời gian: {(time.perf_counter() - start) * 1000:.0f} ms, {chunks} chunk")
 
     def get_suggestions(self) -> list:
         """Trả về danh sách câu hỏi gợi ý"""
@@ -229,35 +411,65 @@ Vui lòng thử lại hoặc liên hệ quản trị viên nếu lỗi vẫn ti
             "Yêu cầu tuyển sinh vào Harvard"
         ]
 
+    def warm_answer_cache(self):
+        """Trả lời trước các câu hỏi gợi ý để người dùng bấm vào là có ngay"""
+        warmed = 0
+        for question in self.get_suggestions():
+            if get_exact_answer(question) is None:
+                self.chat(question)
+                warmed += 1
+        logger.info(f"Đã làm nóng cache chatbot cho {warmed} câu hỏi gợi ý")
+
     def rebuild_database(self):
-        """Xóa và tái tạo lại vector database (khi có dữ liệu mới)"""
-        try:
-            # Xóa collection cũ
-            self.client.delete_collection(name="universities_gemini")
-            logger.info("Đã xóa collection cũ")
+        """
+        Build lại toàn bộ vector database vào collection mới rồi hoán đổi
 
-            # Tạo collection mới
-            self.collection = self.client.create_collection(
-                name="universities_gemini",
-                embedding_function=self.embedding_fn
+        Collection đang phục vụ vẫn trả lời câu hỏi trong lúc build. Hoán đổi chỉ là ghi
+        con trỏ LIVE_COLLECTION_FILE; bản cũ được giữ lại đến lần rebuild sau để process
+        khác đang query kịp chuyển sang bản mới.
+        """
+        new_name = f"{COLLECTION_NAME}_{uuid.uuid4().hex[:12]}"
+        try:
+            collection = self.client.create_collection(
+                name=new_name,
+                embedding_function=self.embedding_fn,
+                metadata=self._collection_metadata()
             )
+            stats = self.sync_index(collection=collection)
+
+            previous_name = _read_live_collection_name()
+            _write_live_collection_name(new_name)
+            self.collection, self._live_name = collection, new_name
+            self._drop_collections(keep={new_name, previous_name})
 
-            # Build lại data
-            self._build_initial_data()
-            logger.info("Đã rebuild vector database thành công")
+            logger.info(f"Đã rebuild vector database thành công ({stats['upserted']} trường)")
             return True
         except Exception as e:
             logger.error(f"Lỗi khi rebuild database: {str(e)}")
+            if _read_live_collection_name() != new_name:
+                self._drop_collections(keep=set(), names=[new_name])
             return False
 
+    def _drop_collections(self, keep: set, names=None):
+        """Xóa collection của chatbot không còn dùng (bản cũ, bản build lỗi)"""
+        if names is None:
+            names = [collection.name for collection in self.client.list_collections()]
+        for name in names:
+            if name.startswith(COLLECTION_NAME) and name not in keep:
+                try:
+                    self.client.delete_collection(name=name)
+                except Exception:
+                    pass
+
     def get_stats(self):
         """Lấy thống kê về vector database"""
         try:
-            count = self.collection.count()
+            count = self._live_collection().count()
             return {
                 'total_universities': count,
-                'collection_name': 'universities_gemini',
-                'embedding_model': 'paraphrase-multilingual-MiniLM-L12-v2'
+                'collection_name': self._live_name,
+                'embedding_model': EMBEDDING_MODEL_NAME,
+                'embedding_backend': self.embedding_backend
             }
         except Exception as e:
             logger.error(f"Lỗi khi lấy thống kê: {str(e)}")
@@ -0,0 +1,190 @@
+"""
+Truy xuất lai cho chatbot: BM25 trong process + vector (Chroma), gộp bằng RRF
+
+- BM25 build từ cùng document với vector index (rag_corpus), không dấu để khớp cả
+  câu hỏi gõ không dấu; build lại khi phiên bản dữ liệu thay đổi.
+- Ràng buộc nhận ra trong câu hỏi (quốc gia, top N xếp hạng) được đẩy xuống cả hai
+  phía: `where` của Chroma và bộ lọc metadata của BM25.
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import math
+import re
+import unicodedata
+from .data_version import VersionedProcessCache
+from .rag_corpus import iter_document_chunks
+from .university_search import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Hằng số k của Reciprocal Rank Fusion (giá trị chuẩn trong bài báo gốc)
+RRF_K = 60
+# "xếp hạng cao", "hàng đầu"... không kèm số
+DEFAULT_TOP_RANK = 100
+
+# Tên gọi tiếng Việt/tiếng Anh -> tên quốc gia có thể có trong database.
+# Các từ dễ nhầm ("Anh" trong "tiếng Anh", "Nhật" trong "cập nhật", "Pháp" trong
+# "phương pháp") chỉ được nhận khi đi sau "ở/tại/du học/nước".
+_PLACE = r'(?:ở|tại|du học|nước)\s+'
+COUNTRY_PATTERNS = (
+    (r'mỹ(?!\s+thuật)|hoa kỳ|usa|united states|america', ('United States', 'US', 'USA')),
+    (r'vương quốc anh|anh quốc|' + _PLACE + r'anh|uk|united kingdom|england', ('United Kingdom', 'UK')),
+    (r'nhật bản|' + _PLACE + r'nhật|japan', ('Japan',)),
+    (r'hàn quốc|' + _PLACE + r'hàn|korea', ('Korea', 'South Korea')),
+    (r'thụy sĩ|thuỵ sĩ|switzerland', ('Switzerland',)),
+    (_PLACE + r'ý|italia|italy', ('Italy',)),
+    (r'canada', ('Canada',)),
+    (r'úc|australia', ('Australia',)),
+    (_PLACE + r'đức|germany', ('Germany',)),
+    (_PLACE + r'pháp|france', ('France',)),
+    (r'singapore', ('Singapore',)),
+    (r'hà lan|netherlands|holland', ('Netherlands',)),
+)
+_COUNTRY_REGEXES = [
+    (re.compile(r'(?<!\w)(?:' + pattern + r')(?!\w)'), names) for pattern, names in COUNTRY_PATTERNS
+]
+_TOP_N = re.compile(r'(?<!\w)top\s*(\d{1,4})(?!\w)')
+_HIGH_RANK = re.compile(r'xếp hạng cao|hạng cao|hàng đầu|top đầu')
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(normalize_text(text))
+
+
+def detect_constraints(question: str, known_countries: Iterable[str]) -> dict:
+    """
+    Nhận ra ràng buộc trong câu hỏi
+
+    Args:
+        known_countries: tên quốc gia đang có trong index (chỉ lọc theo quốc gia có dữ liệu)
+
+    Returns:
+        {'countries': [...], 'max_rank': N} - chỉ có các khóa nhận ra được
+    """
+    text = unicodedata.normalize('NFC', question or '').lower()
+    known = {name.lower(): name for name in known_countries if name}
+    constraints = {}
+
+    countries = set()
+    for regex, names in _COUNTRY_REGEXES:
+        if regex.search(text):
+            countries.update(known[name.lower()] for name in names if name.lower() in known)
+    # Tên quốc gia đúng như trong database (VD: "Singapore", "Netherlands")
+    for lowered, name in known.items():
+        if len(lowered) > 2 and re.search(r'(?<!\w)' + re.escape(lowered) + r'(?!\w)', text):
+            countries.add(name)
+    if countries:
+        constraints['countries'] = sorted(countries)
+
+    match = _TOP_N.search(text)
+    if match and int(match.group(1)) > 0:
+        constraints['max_rank'] = int(match.group(1))
+    elif _HIGH_RANK.search(text):
+        constraints['max_rank'] = DEFAULT_TOP_RANK
+
+    return constraints
+
+
+def to_chroma_where(constraints: dict) -> Optional[dict]:
+    """Bộ lọc metadata cho collection.query (None = không lọc)"""
+    clauses = []
+    countries = constraints.get('countries')
+    if countries:
+        if len(countries) == 1:
+            clauses.append({'country': countries[0]})
+        else:
+            clauses.append({'$or': [{'country': name} for name in countries]})
+    if constraints.get('max_rank'):
+        clauses.append({'ranking': {'$lte': constraints['max_rank']}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def matches_constraints(metadata: dict, constraints: dict) -> bool:
+    countries = constraints.get('countries')
+    if countries and metadata.get('country') not in countries:
+        return False
+    max_rank = constraints.get('max_rank')
+    if max_rank and metadata.get('ranking', 9999) > max_rank:
+        return False
+    return True
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int = RRF_K) -> List:
+    """Gộp nhiều danh sách đã xếp hạng: điểm = tổng 1/(k + hạng)"""
+    scores: Dict = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    # Cùng điểm thì giữ thứ tự xuất hiện đầu tiên (ưu tiên danh sách đứng trước)
+    order = {item: i for i, item in enumerate(dict.fromkeys(x for ranking in rankings for x in ranking))}
+    return sorted(scores, key=lambda item: (-scores[item], order[item]))
+
+
+class BM25Index:
+    """Okapi BM25 trên document của vector index, giữ metadata để lọc"""
+
+    def __init__(self, documents: Iterable[Tuple[str, str, dict]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.metadatas: Dict[str, dict] = {}
+        self.term_freqs: Dict[str, Counter] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, List[str]] = {}
+
+        for doc_id, document, metadata in documents:
+            tokens = tokenize(document)
+            freqs = Counter(tokens)
+            self.metadatas[doc_id] = metadata
+            self.term_freqs[doc_id] = freqs
+            self.lengths[doc_id] = len(tokens)
+            for term in freqs:
+                self.postings.setdefault(term, []).append(doc_id)
+
+        self.avg_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0.0
+        total = len(self.metadatas)
+        self.idf = {
+            term: math.log(1 + (total - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            for term, doc_ids in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.metadatas)
+
+    @property
+    def countries(self) -> set:
+        return {metadata.get('country') for metadata in self.metadatas.values()}
+
+    def search(self, query: str, limit: int = 10, constraints: Optional[dict] = None) -> List[Tuple[str, float]]:
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id in self.postings[term]:
+                if constraints and not matches_constraints(self.metadatas[doc_id], constraints):
+                    continue
+                freq = self.term_freqs[doc_id][term]
+                norm = 1 - self.b + self.b * self.lengths[doc_id] / self.avg_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+def _build_bm25_index() -> BM25Index:
+    index = BM25Index(doc for chunk in iter_document_chunks() for doc in chunk)
+    logger.info(f"Đã build BM25 index cho {len(index)} trường")
+    return index
+
+
+# Index dùng chung trong process, build lại khi phiên bản dữ liệu thay đổi
+_bm25_index = VersionedProcessCache(_build_bm25_index)
+
+
+def get_bm25_index() -> BM25Index:
+    return _bm25_index.get()
@@ -0,0 +1,46 @@
+"""
+Đo thời gian import bằng `python -X importtime` trong một process mới (cold start)
+"""
+from typing import Dict
+import os
+import subprocess
+import sys
+
+DJANGO_BOOT = (
+    "import django; django.setup(); "
+    "import university_project.urls"
+)
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """{module: thời gian import tích lũy (micro giây)} từ output của -X importtime"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # dòng tiêu đề
+        timings[parts[2].strip()] = int(parts[1])
+    return timings
+
+
+def measure_imports(code: str = DJANGO_BOOT, timeout: int = 120) -> Dict[str, int]:
+    """Chạy code trong interpreter mới với -X importtime, trả về module đã import"""
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'university_project.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, timeout=timeout, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'import failed')
+    return parse_importtime(result.stderr)
+
+
+def find_modules(timings: Dict[str, int], packages) -> Dict[str, int]:
+    """Module thuộc các package cho trước (VD: 'chromadb' khớp cả 'chromadb.api')"""
+    return {
+        name: micros for name, micros in timings.items()
+        if any(name == package or name.startswith(package + '.') for package in packages)
+    }
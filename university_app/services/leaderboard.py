@@ -0,0 +1,196 @@
+"""
+Bảng xếp hạng tính sẵn theo chuyên ngành (major_leaderboard)
+
+Mỗi chương trình (UniversityProgram) được chấm điểm tổng hợp từ xếp hạng trường,
+học phí và IELTS yêu cầu, sắp xếp trong từng chuyên ngành và lưu kèm vị trí. Đọc một
+trang là range scan trên index (major_id, position), không tính lại điểm.
+
+Làm mới toàn bộ bằng `manage.py refresh_major_leaderboard` (cron hằng đêm, sau
+loaddata); signals làm mới các chuyên ngành bị ảnh hưởng sau khi transaction commit.
+"""
+from django.db import DatabaseError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+import re
+import threading
+from ..models import MajorLeaderboardEntry, UniversityAdmissionRequirement, UniversityProgram
+
+logger = logging.getLogger(__name__)
+
+# Tiêu chí tuyển sinh dùng cho điểm yêu cầu
+REQUIREMENT_CRITERIA = 'IELTS'
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def parse_requirement_value(value) -> Optional[float]:
+    """Số đầu tiên trong giá trị yêu cầu ("6.5", "6,5 (no band < 6.0)"), None nếu không có"""
+    match = _NUMBER.search(value or '')
+    return float(match.group().replace(',', '.')) if match else None
+
+
+def _load_requirements(university_ids=None) -> Dict[Tuple[int, Optional[int]], float]:
+    """IELTS yêu cầu theo (trường, bậc học); bậc None = yêu cầu chung của trường"""
+    requirements = UniversityAdmissionRequirement.objects.filter(
+        criteria__name__iexact=REQUIREMENT_CRITERIA
+    ).order_by('id')
+    if university_ids is not None:
+        requirements = requirements.filter(university_id__in=university_ids)
+
+    result = {}
+    for university_id, program_id, value in requirements.values_list('university_id', 'program_id', 'value'):
+        parsed = parse_requirement_value(value)
+        if parsed is not None:
+            result.setdefault((university_id, program_id), parsed)
+    return result
+
+
+def refresh_major_leaderboard(major_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Tính lại bảng major_leaderboard
+
+    Args:
+        major_ids: Danh sách id chuyên ngành cần cập nhật, None để rebuild toàn bộ
+
+    Returns:
+        Số dòng đã ghi
+    """
+    # NumPy chỉ nạp khi tính lại, không nạp theo views
+    import numpy as np
+    from .scoring import score_leaderboard
+
+    programs = UniversityProgram.objects.filter(major__isnull=False)
+    entries = MajorLeaderboardEntry.objects.all()
+    if major_ids is not None:
+        major_ids = set(major_ids)
+        if not major_ids:
+            return 0
+        programs = programs.filter(major_id__in=major_ids)
+        entries = entries.filter(major_id__in=major_ids)
+
+    rows = list(programs.order_by('major_id', 'id').values_list(
+        'id', 'university_id', 'major_id', 'program_id', 'tuition_fee',
+        'university__ranking_summary__latest_rank'
+    ))
+    requirements = _load_requirements(
+        {row[1] for row in rows} if major_ids is not None else None
+    )
+    ielts = [
+        requirements.get((row[1], row[3]), requirements.get((row[1], None)))
+        for row in rows
+    ]
+
+    scores = score_leaderboard([row[5] for row in rows], [row[4] for row in rows], ielts)
+    majors = np.array([row[2] for row in rows], dtype=np.int64)
+    ranks = np.array([row[5] if row[5] else np.inf for row in rows], dtype=np.float64)
+    # Trong mỗi chuyên ngành: điểm giảm dần, cùng điểm thì trường xếp hạng tốt hơn, rồi theo id
+    order = np.lexsort((np.arange(len(rows)), ranks, -scores['total'], majors))
+    sorted_majors = majors[order]
+    positions = np.arange(len(rows)) - np.searchsorted(sorted_majors, sorted_majors, side='left') + 1
+
+    computed_at = timezone.now()
+    new_entries = []
+    for i, position in zip(order.tolist(), positions.tolist()):
+        program_id, university_id, major_id, _, tuition_fee, latest_rank = rows[i]
+        rank_score, tuition_score, requirement_score = scores['components'][i].tolist()
+        new_entries.append(MajorLeaderboardEntry(
+            major_id=major_id,
+            position=position,
+            university_id=university_id,
+            university_program_id=program_id,
+            score=float(scores['total'][i]),
+            rank_score=rank_score,
+            tuition_score=tuition_score,
+            requirement_score=requirement_score,
+            latest_rank=latest_rank,
+            tuition_fee=tuition_fee,
+            ielts=ielts[i],
+            computed_at=computed_at,
+        ))
+
+    with transaction.atomic():
+        entries.delete()
+        MajorLeaderboardEntry.objects.bulk_create(new_entries, batch_size=500)
+
+    return len(new_entries)
+
+
+def get_leaderboard_page(major_id: int, page: int, page_size: int) -> dict:
+    """
+    Một trang bảng xếp hạng của chuyên ngành (2 query, đều dùng index (major_id, position))
+
+    Returns:
+        {'entries': [MajorLeaderboardEntry...], 'total': số chương trình của chuyên ngành}
+    """
+    total = MajorLeaderboardEntry.objects.filter(major_id=major_id).aggregate(
+        total=Max('position')
+    )['total'] or 0
+    start = (page - 1) * page_size
+    entries = list(
+        MajorLeaderboardEntry.objects.filter(
+            major_id=major_id, position__gt=start, position__lte=start + page_size
+        ).select_related(
+            'university__country', 'university_program__program'
+        ).order_by('position')
+    ) if start < total else []
+    return {'entries': entries, 'total': total}
+
+
+class _PendingRefresh:
+    """Các chuyên ngành chờ làm mới của một transaction"""
+
+    def __init__(self):
+        self.major_ids = set()
+        self.full = False
+        # Danh sách on_commit của transaction đã đăng ký flush; Django thay danh sách mới
+        # sau mỗi lần commit/rollback nên so sánh danh sách cho biết transaction đã kết thúc
+        self.callbacks = None
+
+    def add(self, major_ids):
+        if major_ids is None:
+            self.full = True
+        else:
+            self.major_ids.update(major_id for major_id in major_ids if major_id)
+
+    def flush(self):
+        _refresh_after_commit(None if self.full else sorted(self.major_ids))
+
+
+# Transaction đang gom thay đổi của từng thread
+_pending = threading.local()
+
+
+def _refresh_after_commit(major_ids):
+    if major_ids == []:
+        return
+    try:
+        # Savepoint để lỗi (VD: bảng chưa được tạo) không làm hỏng transaction bên ngoài
+        with transaction.atomic():
+            refresh_major_leaderboard(major_ids)
+    except DatabaseError as e:
+        logger.warning(f"Không cập nhật được bảng xếp hạng chuyên ngành: {str(e)}")
+
+
+def schedule_leaderboard_refresh(major_ids=None):
+    """
+    Làm mới các chuyên ngành sau khi transaction hiện tại commit (gộp nhiều thay đổi
+    liên tiếp, VD: loaddata, thành một lần tính cho mỗi chuyên ngành)
+
+    Thay đổi của transaction bị rollback bị bỏ cùng callback on_commit của nó,
+    không lẫn sang transaction sau.
+
+    Args:
+        major_ids: các chuyên ngành bị ảnh hưởng, None = toàn bộ
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _refresh_after_commit(None if major_ids is None else sorted(set(major_ids)))
+        return
+
+    batch = getattr(_pending, 'batch', None)
+    if batch is None or batch.callbacks is not connection.run_on_commit:
+        batch = _pending.batch = _PendingRefresh()
+        transaction.on_commit(batch.flush)
+        batch.callbacks = connection.run_on_commit
+    batch.add(major_ids)
@@ -0,0 +1,386 @@
+"""
+Cổng gọi LLM (Gemini) dùng chung cho chatbot và phân tích so sánh
+
+Trong mỗi process:
+- giới hạn số lời gọi đồng thời (bounded semaphore)
+- gộp các prompt giống hệt đang chạy thành một lời gọi (single-flight)
+- giới hạn tốc độ bằng token bucket (quota free tier tính theo phút)
+- deadline cho mỗi lời gọi, bao gồm cả thời gian chờ lượt; backend chạy trong thread
+  pool nên lời gọi (hay từng phần của stream) bị treo cũng không giữ request quá deadline.
+  Stream: deadline áp cho phần đầu tiên, sau đó mỗi phần có giới hạn chờ riêng và cả
+  stream có giới hạn tổng (câu trả lời dài nhưng vẫn đều đặn không bị cắt ở LLM_TIMEOUT)
+- thử lại với exponential backoff khi gặp 429/5xx
+- đếm metrics: số request đang chờ, thời gian chờ, số lần gộp/thử lại/lỗi
+
+Giới hạn tính theo process: tổng tốc độ thực tế = LLM_RATE_PER_MINUTE x số worker.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from django.conf import settings
+from typing import Callable, Iterator, Optional
+import hashlib
+import logging
+import random
+import threading
+import time
+from .ai_dependencies import load_genai
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = 'models/gemini-2.5-flash'
+# Đánh dấu stream đã hết phần
+_END = object()
+
+
+class LLMError(Exception):
+    """Lỗi từ cổng LLM (không phải lỗi của backend)"""
+
+
+class LLMTimeout(LLMError):
+    """Vượt deadline: chờ lượt, chờ quota hoặc chờ backend quá lâu"""
+
+
+class LLMStreamTruncated(LLMTimeout):
+    """Stream vượt giới hạn tổng thời gian sau khi đã trả một phần câu trả lời"""
+
+
+class LLMBackendError(Exception):
+    """Lỗi có mã HTTP - dùng cho backend giả; lỗi google.api_core cũng có thuộc tính code"""
+
+    def __init__(self, code: int, message: str = ''):
+        super().__init__(message or f'HTTP {code}')
+        self.code = code
+
+
+def is_retryable(error: Exception) -> bool:
+    """429 (hết quota tạm thời) và 5xx đáng thử lại; lỗi khác (prompt bị chặn, sai key...) thì không"""
+    code = getattr(error, 'code', None)
+    if not isinstance(code, int):
+        return False
+    return code == 429 or 500 <= code < 600
+
+
+class GeminiBackend:
+    """Gọi Gemini thật (model tạo lazy ở lần gọi đầu)"""
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = load_genai().GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt: str) -> str:
+        return self._get_model().generate_content(prompt).text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._get_model().generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk không có nội dung văn bản (VD: chỉ có safety ratings)
+                continue
+            if text:
+                yield text
+
+
+class FakeLLMBackend:
+    """
+    Backend giả cho test và chạy offline (LLM_BACKEND=fake)
+
+    Args:
+        reply: chuỗi trả về, hoặc hàm prompt -> chuỗi
+        delay: thời gian "suy nghĩ" mỗi lời gọi (giây)
+        errors: các lỗi ném ra lần lượt ở những lời gọi đầu tiên
+    """
+
+    def __init__(self, reply=None, delay: float = 0.0, errors=()):
+        self.reply = reply if reply is not None else (lambda prompt: f"[fake] {prompt[:80]}")
+        self.delay = delay
+        self.errors = list(errors)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt: str) -> str:
+        with self._lock:
+            self.calls.append(prompt)
+            error = self.errors.pop(0) if self.errors else None
+        if self.delay:
+            time.sleep(self.delay)
+        if error is not None:
+            raise error
+        return self.reply(prompt) if callable(self.reply) else self.reply
+
+    def generate(self, prompt: str) -> str:
+        return self._answer(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for word in self._answer(prompt).split(' '):
+            yield word + ' '
+
+
+class TokenBucket:
+    """Token bucket: trung bình rate_per_second lời gọi/giây, cho phép dồn tối đa capacity lời gọi"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Lấy một token, chờ nếu cần; False nếu không kịp trước deadline"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LLMGateway:
+    def __init__(self, backend, max_concurrency: int = 4, rate_per_minute: float = 10, burst: int = 3,
+                 timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 1.0, backoff_max: float = 8.0,
+                 stream_idle_timeout: float = 15.0, stream_max_duration: float = 180.0):
+        self.backend = backend
+        self.timeout = timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.stream_max_duration = stream_max_duration
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Lời gọi bị bỏ lại do quá deadline vẫn giữ slot cho tới khi backend trả về
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm-gateway')
+        self._bucket = TokenBucket(rate_per_minute / 60, max(burst, 1)) if rate_per_minute else None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'calls': 0, 'coalesced': 0, 'retries': 0, 'failures': 0, 'deadline_exceeded': 0,
+            'queue_depth': 0, 'max_queue_depth': 0, 'in_flight': 0,
+            'waits': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0,
+        }
+
+    # --- metrics -------------------------------------------------------------
+
+    def _count(self, name: str, delta=1):
+        with self._metrics_lock:
+            self._metrics[name] += delta
+
+    def get_metrics(self) -> dict:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        waits = metrics['waits']
+        metrics['wait_ms_avg'] = round(metrics['wait_seconds_total'] / waits * 1000, 1) if waits else 0.0
+        metrics['wait_ms_max'] = round(metrics.pop('wait_seconds_max') * 1000, 1)
+        del metrics['wait_seconds_total']
+        return metrics
+
+    def _timeout(self, message: str) -> LLMTimeout:
+        self._count('deadline_exceeded')
+        return LLMTimeout(message)
+
+    # --- lượt gọi ------------------------------------------------------------
+
+    def _acquire(self, deadline: float):
+        """
+        Chờ quota rồi chờ slot đồng thời; thời gian chờ tính vào metrics
+
+        Lấy token trước để lời gọi đang chờ quota không chiếm slot của lời gọi khác.
+        """
+        start = time.monotonic()
+        with self._metrics_lock:
+            self._metrics['queue_depth'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._metrics['queue_depth'])
+        try:
+            if self._bucket is not None and not self._bucket.acquire(deadline):
+                raise self._timeout('Vượt giới hạn tốc độ gọi Gemini')
+            if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise self._timeout('Hết thời gian chờ lượt gọi Gemini')
+        finally:
+            waited = time.monotonic() - start
+            with self._metrics_lock:
+                self._metrics['queue_depth'] -= 1
+                self._metrics['waits'] += 1
+                self._metrics['wait_seconds_total'] += waited
+                self._metrics['wait_seconds_max'] = max(self._metrics['wait_seconds_max'], waited)
+        with self._metrics_lock:
+            self._metrics['in_flight'] += 1
+            self._metrics['calls'] += 1
+
+    def _release(self, *args):
+        with self._metrics_lock:
+            self._metrics['in_flight'] -= 1
+        self._slots.release()
+
+    def _backoff(self, error: Exception, attempt: int, deadline: float):
+        """Chờ trước lần thử lại, hoặc ném lại lỗi nếu không nên / không kịp thử lại"""
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max) * random.uniform(0.5, 1.0)
+        if not is_retryable(error) or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            self._count('failures')
+            raise error
+        self._count('retries')
+        logger.warning(f"Gemini lỗi ({str(error)}), thử lại sau {delay:.1f}s (lần {attempt + 1})")
+        time.sleep(delay)
+
+    def _call(self, func: Callable[[], str], deadline: float) -> str:
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            future = self._executor.submit(func)
+            future.add_done_callback(self._release)
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                raise self._timeout('Gemini phản hồi quá thời gian cho phép')
+            except Exception as e:
+                self._backoff(e, attempt, deadline)
+                attempt += 1
+
+    # --- API -----------------------------------------------------------------
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Sinh câu trả lời; các lời gọi cùng prompt đang chạy dùng chung một kết quả
+
+        Raises:
+            LLMTimeout: quá deadline (timeout giây, mặc định LLM_TIMEOUT)
+            Exception: lỗi của backend sau khi đã thử lại
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+        with self._inflight_lock:
+            shared = self._inflight.get(key)
+            if shared is None:
+                shared = self._inflight[key] = Future()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            self._count('coalesced')
+            try:
+                return shared.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeout:
+                raise self._timeout('Hết thời gian chờ câu trả lời đang được tạo')
+
+        try:
+            result = self._call(lambda: self.backend.generate(prompt), deadline)
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        else:
+            shared.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Sinh câu trả lời từng phần (không gộp - mỗi người dùng một luồng)
+
+        Chỉ thử lại khi lỗi xảy ra trước phần đầu tiên. Từng phần được lấy trong thread
+        pool nên backend treo vẫn dừng đúng hạn:
+        - phần đầu tiên (kể cả chờ lượt): trong timeout giây, mặc định LLM_TIMEOUT
+        - mỗi phần tiếp theo: trong stream_idle_timeout giây kể từ phần trước
+        - cả stream: trong stream_max_duration giây
+
+        Raises:
+            LLMTimeout: chưa có phần đầu tiên hoặc backend ngừng gửi giữa chừng
+            LLMStreamTruncated: vượt giới hạn tổng, câu trả lời đã gửi bị cắt
+        """
+        started_at = time.monotonic()
+        first_deadline = started_at + (timeout or self.timeout)
+        max_deadline = max(started_at + self.stream_max_duration, first_deadline)
+        attempt = 0
+        while True:
+            self._acquire(first_deadline)
+            chunks = self.backend.stream(prompt)
+            pending = None
+            started = False
+            try:
+                while True:
+                    if started:
+                        wait_until = min(time.monotonic() + self.stream_idle_timeout, max_deadline)
+                    else:
+                        wait_until = first_deadline
+                    pending = self._executor.submit(next, chunks, _END)
+                    try:
+                        text = pending.result(timeout=max(wait_until - time.monotonic(), 0))
+                    except FutureTimeout:
+                        if not started:
+                            raise self._timeout('Gemini phản hồi quá thời gian cho phép')
+                        if wait_until >= max_deadline:
+                            self._count('deadline_exceeded')
+                            raise LLMStreamTruncated('Câu trả lời quá dài nên đã bị cắt')
+                        raise self._timeout('Gemini ngừng phản hồi giữa chừng')
+                    pending = None
+                    if text is _END:
+                        return
+                    started = True
+                    yield text
+            except LLMTimeout:
+                raise
+            except Exception as e:
+                if started:
+                    self._count('failures')
+                    raise
+                error = e
+            finally:
+                if pending is None:
+                    self._release()
+                else:
+                    # Phần đang chờ vẫn chạy trong thread pool: giữ slot tới khi backend trả về
+                    pending.add_done_callback(self._release)
+            self._backoff(error, attempt, first_deadline)
+            attempt += 1
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def _build_backend():
+    if settings.LLM_BACKEND == 'fake':
+        logger.warning("LLM_BACKEND=fake: dùng câu trả lời giả, không gọi Gemini")
+        return FakeLLMBackend()
+    return GeminiBackend()
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(
+                    _build_backend(),
+                    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                    rate_per_minute=settings.LLM_RATE_PER_MINUTE,
+                    burst=settings.LLM_BURST,
+                    timeout=settings.LLM_TIMEOUT,
+                    max_retries=settings.LLM_MAX_RETRIES,
+                    stream_idle_timeout=settings.LLM_STREAM_IDLE_TIMEOUT,
+                    stream_max_duration=settings.LLM_STREAM_MAX_DURATION,
+                )
+    return _gateway
+
+
+def get_llm_metrics() -> Optional[dict]:
+    """Metrics của cổng LLM trong process này (None nếu chưa gọi LLM lần nào)"""
+    return _gateway.get_metrics() if _gateway is not None else None
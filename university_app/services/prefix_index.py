@@ -0,0 +1,79 @@
+from bisect import bisect_left
+from typing import List, Tuple
+import logging
+from ..models import University
+from .data_version import VersionedProcessCache
+from .university_search import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """
+    Index tiền tố (mảng đã sắp xếp + bisect) cho autocomplete tên trường
+
+    Thứ tự ưu tiên kết quả: tiền tố của tên đầy đủ -> tên viết tắt -> đầu một từ trong tên.
+    """
+
+    def __init__(self, rows):
+        names = []
+        short_names = []
+        words = []
+        for name, short_name in rows:
+            if not name:
+                continue
+            name_norm = normalize_text(name)
+            names.append((name_norm, name))
+            if short_name:
+                short_names.append((normalize_text(short_name), name))
+            # Mỗi vị trí bắt đầu một từ (trừ từ đầu tiên đã có trong names)
+            word_starts = [i + 1 for i, ch in enumerate(name_norm) if ch == ' ']
+            for start in word_starts:
+                words.append((name_norm[start:], name))
+
+        self.names = sorted(set(names))
+        self.short_names = sorted(set(short_names))
+        self.words = sorted(set(words))
+        # Tên hiển thị theo thứ tự chữ cái (cho danh sách đầy đủ)
+        self.all_names = sorted({name for _, name in self.names})
+
+    def __len__(self):
+        return len(self.all_names)
+
+    @staticmethod
+    def _scan(entries: List[Tuple[str, str]], prefix: str):
+        position = bisect_left(entries, (prefix, ''))
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            yield entries[position][1]
+            position += 1
+
+    def search(self, prefix: str, limit: int = 10) -> List[str]:
+        """Trả về tối đa `limit` tên trường khớp tiền tố (không phân biệt hoa thường, dấu)"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return self.all_names[:limit]
+
+        results = []
+        seen = set()
+        for entries in (self.names, self.short_names, self.words):
+            for name in self._scan(entries, prefix):
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+def _build_prefix_index() -> PrefixIndex:
+    index = PrefixIndex(University.objects.values_list('name', 'short_name'))
+    logger.info(f"Đã build prefix index cho {len(index)} trường")
+    return index
+
+
+# Index dùng chung trong process, build lại khi phiên bản dữ liệu thay đổi
+_prefix_index = VersionedProcessCache(_build_prefix_index)
+
+
+def get_prefix_index() -> PrefixIndex:
+    return _prefix_index.get()
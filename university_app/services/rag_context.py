@@ -0,0 +1,103 @@
+"""
+Dựng context cho prompt chatbot từ các trường tìm được
+
+Toàn bộ dữ liệu lấy trong 3 query cố định (trường + quốc gia + xếp hạng, chương trình
++ ngành + bậc, yêu cầu tuyển sinh + tiêu chí) bất kể số trường, và context dừng
+khi chạm ngân sách token nên kích thước prompt không tăng theo số trường tìm được.
+"""
+from django.db.models import Prefetch
+from typing import List, Tuple
+from ..models import University, UniversityProgram, UniversityAdmissionRequirement
+from .ranking_summary import get_ranking_summary
+
+# Số chương trình / yêu cầu tuyển sinh đưa vào mỗi trường
+ITEMS_PER_SECTION = 3
+DESCRIPTION_CHARS = 200
+# Ước lượng thô cho tiếng Việt/tiếng Anh trộn lẫn: ~4 ký tự một token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _bullets(items: List[str]) -> str:
+    return '\n'.join('  - ' + item for item in items) if items else '  Chưa có thông tin'
+
+
+def format_university_block(uni) -> str:
+    """Khối context của một trường - chỉ dùng dữ liệu đã prefetch"""
+    ranking = get_ranking_summary(uni)
+
+    program_details = []
+    for prog in uni.universityprogram_set.all()[:ITEMS_PER_SECTION]:
+        if prog.major and prog.program:
+            fee_str = f"${prog.tuition_fee:,.0f}/năm" if prog.tuition_fee else "N/A"
+            program_details.append(f"{prog.major.name} ({prog.program.level}): {fee_str}")
+
+    req_details = [
+        f"{req.criteria.name}: {req.value}"
+        for req in uni.universityadmissionrequirement_set.all()[:ITEMS_PER_SECTION]
+        if req.criteria
+    ]
+
+    rank = ranking.latest_rank if ranking else 'N/A'
+    source = ranking.latest_source if ranking and ranking.latest_source else 'N/A'
+    return '\n'.join([
+        '',
+        '========================================',
+        f"TRƯỜNG: {uni.name}",
+        '========================================',
+        f"Quốc gia: {uni.country.name if uni.country else 'N/A'}",
+        f"Xếp hạng thế giới: #{rank} ({source})",
+        f"Năm thành lập: {uni.founded_year or 'N/A'}",
+        f"Website: {uni.website or 'N/A'}",
+        '',
+        'Chương trình đào tạo:',
+        _bullets(program_details),
+        '',
+        'Yêu cầu tuyển sinh:',
+        _bullets(req_details),
+        '',
+        f"Mô tả: {(uni.description or 'Chưa có mô tả')[:DESCRIPTION_CHARS]}...",
+        '',
+        '',
+    ])
+
+
+def build_context(uni_ids: list, token_budget: int) -> Tuple[str, List[str]]:
+    """
+    Dựng context theo thứ tự liên quan của uni_ids, dừng khi vượt ngân sách token
+
+    Trường đầu tiên luôn được đưa vào (kể cả khi một mình đã vượt ngân sách).
+
+    Returns:
+        (context, tên các trường đã đưa vào context)
+    """
+    if not uni_ids:
+        return "", []
+
+    universities = University.objects.filter(id__in=uni_ids).select_related(
+        'country', 'ranking_summary'
+    ).prefetch_related(
+        Prefetch('universityprogram_set',
+                 queryset=UniversityProgram.objects.select_related('major', 'program').order_by('id')),
+        Prefetch('universityadmissionrequirement_set',
+                 queryset=UniversityAdmissionRequirement.objects.select_related('criteria').order_by('id')),
+    )
+    by_id = {uni.id: uni for uni in universities}
+
+    blocks, names, used = [], [], 0
+    for uni_id in uni_ids:
+        uni = by_id.get(uni_id)
+        if uni is None:
+            continue  # Trường đã bị xóa nhưng vector index chưa đồng bộ
+        block = format_university_block(uni)
+        tokens = estimate_tokens(block)
+        if blocks and used + tokens > token_budget:
+            break
+        blocks.append(block)
+        names.append(uni.name)
+        used += tokens
+
+    return ''.join(blocks), names
@@ -0,0 +1,97 @@
+"""
+Sinh document cho vector index của chatbot theo từng lô
+
+Mỗi lô tốn 3 query cố định (trường + quốc gia + xếp hạng, chuyên ngành, học phí
+trung bình) thay vì vài query cho mỗi trường, và chỉ giữ một lô trong bộ nhớ.
+"""
+from django.db.models import Avg
+from typing import Iterator, List, Optional, Tuple
+import hashlib
+import json
+from ..models import University, UniversityProgram
+from .ranking_summary import get_ranking_summary
+
+CORPUS_CHUNK_SIZE = 200
+# Số chuyên ngành đưa vào document mỗi trường
+MAJORS_PER_DOCUMENT = 5
+
+Document = Tuple[str, str, dict]
+
+
+def content_hash(document: str, metadata: dict) -> str:
+    payload = json.dumps([document, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _format_document(uni, ranking, majors: str, avg_tuition) -> str:
+    return f"""
+            Tên trường: {uni.name}
+            Tên viết tắt: {uni.short_name or 'N/A'}
+            Quốc gia: {uni.country.name if uni.country else 'Không xác định'}
+            Mô tả: {uni.description or 'Chưa có mô tả'}
+            Chuyên ngành đào tạo: {majors or 'Chưa cập nhật'}
+            Xếp hạng thế giới: {ranking.latest_rank if ranking else 'Chưa có xếp hạng'}
+            Nguồn xếp hạng: {ranking.latest_source if ranking and ranking.latest_source else 'N/A'}
+            Năm thành lập: {uni.founded_year or 'Không rõ'}
+            Học phí trung bình: {f'${avg_tuition:,.0f}/năm' if avg_tuition else 'Chưa có thông tin'}
+            Website: {uni.website or 'Chưa có'}
+            """
+
+
+def _build_chunk(universities: list) -> List[Document]:
+    ids = [uni.id for uni in universities]
+
+    majors = {}
+    for university_id, major_name in UniversityProgram.objects.filter(
+        university_id__in=ids
+    ).order_by('university_id', 'id').values_list('university_id', 'major__name'):
+        names = majors.setdefault(university_id, [])
+        # Giống universityprogram_set.all()[:5]: 5 chương trình đầu, bỏ chương trình không có ngành
+        if len(names) < MAJORS_PER_DOCUMENT:
+            names.append(major_name)
+
+    avg_tuition = dict(
+        UniversityProgram.objects.filter(university_id__in=ids)
+        .values('university_id').annotate(avg_fee=Avg('tuition_fee'))
+        .values_list('university_id', 'avg_fee')
+    )
+
+    documents = []
+    for uni in universities:
+        ranking = get_ranking_summary(uni)
+        major_names = ", ".join(name for name in majors.get(uni.id, []) if name)
+        doc = _format_document(uni, ranking, major_names, avg_tuition.get(uni.id))
+        metadata = {
+            'name': uni.name,
+            'country': uni.country.name if uni.country else 'Unknown',
+            'id': uni.id,
+            'ranking': ranking.latest_rank if ranking and ranking.latest_rank else 9999
+        }
+        metadata['content_hash'] = content_hash(doc, metadata)
+        documents.append((f"uni_{uni.id}", doc, metadata))
+    return documents
+
+
+def iter_document_chunks(university_ids: Optional[list] = None,
+                         chunk_size: int = CORPUS_CHUNK_SIZE) -> Iterator[List[Document]]:
+    """
+    Sinh document (doc_id, document, metadata) theo lô, duyệt trường theo id (keyset)
+
+    Args:
+        university_ids: chỉ sinh cho các trường này (None = toàn bộ)
+        chunk_size: số trường mỗi lô
+    """
+    queryset = University.objects.select_related('country', 'ranking_summary').order_by('id')
+    if university_ids is not None:
+        queryset = queryset.filter(id__in=university_ids)
+
+    last_id = None
+    while True:
+        page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        universities = list(page[:chunk_size])
+        if not universities:
+            return
+        yield _build_chunk(universities)
+        if len(universities) < chunk_size:
+            return
+        last_id = universities[-1].id
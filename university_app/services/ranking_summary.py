@@ -0,0 +1,82 @@
+from django.db import transaction
+from typing import Dict, Iterable, Optional
+import logging
+from ..models import Ranking, UniversityRankingSummary
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự ưu tiên nguồn xếp hạng khi hiển thị: QS -> THE -> ARWU -> mới nhất
+PREFERRED_RANKING_SOURCES = ['QS', 'THE', 'ARWU']
+
+
+def _tinh_tong_hop(university_id: int, rankings: list) -> UniversityRankingSummary:
+    """Tính bản ghi tổng hợp từ các ranking đã sắp xếp theo (-fyear, id)"""
+    latest_by_source = {}
+    for ranking in rankings:
+        source_name = ranking.ranking_sources.name if ranking.ranking_sources else 'Unknown'
+        if source_name not in latest_by_source:
+            latest_by_source[source_name] = {'rank': ranking.frank, 'year': ranking.fyear}
+
+    latest = rankings[0]
+    latest_source = latest.ranking_sources.name if latest.ranking_sources else None
+
+    best_source = next((s for s in PREFERRED_RANKING_SOURCES if s in latest_by_source), None)
+    if best_source:
+        best = latest_by_source[best_source]
+        best_rank, best_year = best['rank'], best['year']
+    else:
+        best_source, best_rank, best_year = latest_source, latest.frank, latest.fyear
+
+    return UniversityRankingSummary(
+        university_id=university_id,
+        latest_rank=latest.frank,
+        latest_year=latest.fyear,
+        latest_source=latest_source,
+        best_rank=best_rank,
+        best_year=best_year,
+        best_source=best_source,
+        latest_by_source=latest_by_source
+    )
+
+
+def refresh_ranking_summary(university_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Tính lại bảng university_ranking_summary
+
+    Args:
+        university_ids: Danh sách id trường cần cập nhật, None để rebuild toàn bộ
+
+    Returns:
+        Số bản ghi tổng hợp đã ghi
+    """
+    rankings = Ranking.objects.select_related('ranking_sources').order_by('university_id', '-fyear', 'id')
+    summaries = UniversityRankingSummary.objects.all()
+    if university_ids is not None:
+        university_ids = set(university_ids)
+        if not university_ids:
+            return 0
+        rankings = rankings.filter(university_id__in=university_ids)
+        summaries = summaries.filter(university_id__in=university_ids)
+
+    rankings_by_university: Dict[int, list] = {}
+    for ranking in rankings:
+        rankings_by_university.setdefault(ranking.university_id, []).append(ranking)
+
+    rows = [
+        _tinh_tong_hop(university_id, university_rankings)
+        for university_id, university_rankings in rankings_by_university.items()
+    ]
+
+    with transaction.atomic():
+        summaries.delete()
+        UniversityRankingSummary.objects.bulk_create(rows, batch_size=500)
+
+    return len(rows)
+
+
+def get_ranking_summary(university) -> Optional[UniversityRankingSummary]:
+    """Lấy bản ghi tổng hợp đã select_related/prefetch của trường, None nếu chưa có xếp hạng"""
+    try:
+        return university.ranking_summary
+    except UniversityRankingSummary.DoesNotExist:
+        return None
@@ -0,0 +1,147 @@
+"""
+Chấm điểm trường theo dạng cột bằng NumPy
+
+Mỗi tiêu chí là một bảng ngưỡng tra bằng np.searchsorted, nên chấm 5 trường hay cả
+danh mục một chuyên ngành đều là vài phép toán trên mảng. Trọng số mặc định giữ
+nguyên cách tính cũ của AIAnalysisService: xếp hạng 0.4, học phí 0.3, tỷ lệ chấp nhận
+0.2, học bổng 0.1.
+"""
+from typing import Dict, Optional, Sequence
+import numpy as np
+from ..models import UniversityProgram
+
+CRITERIA = ('xep_hang', 'hoc_phi', 'ty_le', 'hoc_bong')
+DEFAULT_WEIGHTS = (0.4, 0.3, 0.2, 0.1)
+
+# Xếp hạng: <=10 -> 100, <=50 -> 90, <=100 -> 80, <=200 -> 70, <=500 -> 60, còn lại 40
+RANK_BOUNDS = np.array([10, 50, 100, 200, 500])
+RANK_SCORES = np.array([100, 90, 80, 70, 60, 40])
+# Học phí (USD/năm): <=20k -> 100, <=30k -> 85, <=40k -> 70, <=50k -> 50, còn lại 30
+TUITION_BOUNDS = np.array([20000, 30000, 40000, 50000])
+TUITION_SCORES = np.array([100, 85, 70, 50, 30])
+# Tỷ lệ chấp nhận (%): <20 -> 30, >=20 -> 50, >=40 -> 70, >=60 -> 85, >=80 -> 100
+ACCEPTANCE_BOUNDS = np.array([20, 40, 60, 80])
+ACCEPTANCE_SCORES = np.array([30, 50, 70, 85, 100])
+SCHOLARSHIP_SCORE = 10
+# IELTS yêu cầu: <=6.0 -> 100, <=6.5 -> 85, <=7.0 -> 70, <=7.5 -> 55, còn lại 40
+IELTS_BOUNDS = np.array([6.0, 6.5, 7.0, 7.5])
+IELTS_SCORES = np.array([100, 85, 70, 55, 40])
+
+# Bảng xếp hạng chuyên ngành: xếp hạng, học phí, yêu cầu tuyển sinh
+LEADERBOARD_WEIGHTS = (0.5, 0.3, 0.2)
+
+# Xếp loại theo điểm tổng: <50 Kém, >=50 Trung bình, >=65 Khá, >=75 Tốt, >=85 Xuất sắc
+GRADE_BOUNDS = np.array([50, 65, 75, 85])
+GRADE_LABELS = np.array(["Kém", "Trung bình", "Khá", "Tốt", "Xuất sắc"])
+
+
+def _column(values) -> np.ndarray:
+    # None / giá trị thiếu -> 0 (được chấm 0 điểm như cách tính cũ)
+    return np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+
+
+def _lookup(values: np.ndarray, bounds: np.ndarray, scores: np.ndarray, side: str) -> np.ndarray:
+    """Tra bảng ngưỡng; giá trị <= 0 (chưa có dữ liệu) được 0 điểm"""
+    return np.where(values > 0, scores[np.searchsorted(bounds, values, side=side)], 0)
+
+
+def normalize_weights(weights: Optional[Sequence[float]]) -> np.ndarray:
+    """Trọng số người dùng chọn, chuẩn hóa tổng = 1 để điểm tổng vẫn trên thang 100"""
+    if weights is None:
+        return np.array(DEFAULT_WEIGHTS)
+    vector = np.asarray(weights, dtype=np.float64)
+    if vector.shape != (len(CRITERIA),):
+        raise ValueError(f"Cần {len(CRITERIA)} trọng số theo thứ tự {', '.join(CRITERIA)}")
+    if np.any(vector < 0) or vector.sum() <= 0:
+        raise ValueError("Trọng số phải không âm và có ít nhất một trọng số dương")
+    return vector / vector.sum()
+
+
+def score_components(rank, tuition, acceptance, scholarship) -> np.ndarray:
+    """Ma trận điểm thành phần (số trường x 4) theo thứ tự CRITERIA"""
+    return np.column_stack([
+        _lookup(_column(rank), RANK_BOUNDS, RANK_SCORES, side='left'),
+        _lookup(_column(tuition), TUITION_BOUNDS, TUITION_SCORES, side='left'),
+        _lookup(_column(acceptance), ACCEPTANCE_BOUNDS, ACCEPTANCE_SCORES, side='right'),
+        np.where(np.asarray(scholarship, dtype=bool), SCHOLARSHIP_SCORE, 0),
+    ])
+
+
+def grade(totals) -> np.ndarray:
+    return GRADE_LABELS[np.searchsorted(GRADE_BOUNDS, np.asarray(totals, dtype=np.float64), side='right')]
+
+
+def score_universities(rank, tuition, acceptance, scholarship,
+                       weights: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+    """
+    Chấm điểm nhiều trường một lần
+
+    Args:
+        rank, tuition, acceptance, scholarship: các cột cùng độ dài
+        weights: trọng số (xếp hạng, học phí, tỷ lệ chấp nhận, học bổng), mặc định DEFAULT_WEIGHTS
+
+    Returns:
+        {'components': ma trận điểm thành phần, 'total': điểm tổng (làm tròn 2 số), 'grade': xếp loại}
+    """
+    components = score_components(rank, tuition, acceptance, scholarship)
+    totals = components @ normalize_weights(weights)
+    return {'components': components, 'total': np.round(totals, 2), 'grade': grade(totals)}
+
+
+def load_major_columns(major_name: str) -> Dict[str, np.ndarray]:
+    """
+    Cột dữ liệu của mọi trường có đào tạo chuyên ngành (1 query)
+
+    Mỗi trường lấy chương trình đầu tiên (theo id) của chuyên ngành. Database không
+    lưu tỷ lệ chấp nhận / học bổng nên hai cột này bằng 0.
+    """
+    rows = list(
+        UniversityProgram.objects.filter(major__name__iexact=major_name)
+        .order_by('university_id', 'id')
+        .values_list('university_id', 'id', 'tuition_fee', 'university__ranking_summary__latest_rank')
+    )
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return {'university_id': empty, 'program_id': empty, 'rank': np.array([]), 'tuition': np.array([]),
+                'acceptance': np.array([]), 'scholarship': np.array([], dtype=bool)}
+
+    university_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    _, first = np.unique(university_ids, return_index=True)
+    return {
+        'university_id': university_ids[first],
+        'program_id': np.array([rows[i][1] for i in first], dtype=np.int64),
+        'tuition': _column([rows[i][2] for i in first]),
+        'rank': _column([rows[i][3] for i in first]),
+        'acceptance': np.zeros(len(first)),
+        'scholarship': np.zeros(len(first), dtype=bool),
+    }
+
+
+def score_major_catalogue(major_name: str, weights: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+    """Chấm điểm toàn bộ trường của một chuyên ngành, sắp xếp điểm giảm dần"""
+    columns = load_major_columns(major_name)
+    scores = score_universities(
+        columns['rank'], columns['tuition'], columns['acceptance'], columns['scholarship'], weights
+    )
+    # Điểm bằng nhau: trường xếp hạng tốt hơn trước (0 = chưa xếp hạng, xếp cuối)
+    rank_key = np.where(columns['rank'] > 0, columns['rank'], np.inf)
+    order = np.lexsort((columns['university_id'], rank_key, -scores['total']))
+    result = {name: values[order] for name, values in columns.items()}
+    result.update({name: values[order] for name, values in scores.items()})
+    return result
+
+
+def score_leaderboard(rank, tuition, ielts) -> Dict[str, np.ndarray]:
+    """
+    Điểm tổng hợp cho bảng xếp hạng chuyên ngành
+
+    Returns:
+        {'components': ma trận (số chương trình x 3) điểm xếp hạng/học phí/yêu cầu,
+         'total': điểm tổng theo LEADERBOARD_WEIGHTS (làm tròn 2 số)}
+    """
+    components = np.column_stack([
+        _lookup(_column(rank), RANK_BOUNDS, RANK_SCORES, side='left'),
+        _lookup(_column(tuition), TUITION_BOUNDS, TUITION_SCORES, side='left'),
+        _lookup(_column(ielts), IELTS_BOUNDS, IELTS_SCORES, side='left'),
+    ]).reshape(-1, 3)
+    return {'components': components, 'total': np.round(components @ np.array(LEADERBOARD_WEIGHTS), 2)}
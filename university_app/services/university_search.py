@@ -0,0 +1,177 @@
+from django.db import connection, DatabaseError
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import logging
+import unicodedata
+from ..models import University
+from .data_version import VersionedProcessCache
+
+logger = logging.getLogger(__name__)
+
+# Tỷ lệ trigram của từ khóa phải xuất hiện trong tên trường (tương tự word_similarity của pg_trgm).
+# Dùng chung cho cả hai nhánh: PostgreSQL đặt pg_trgm.word_similarity_threshold bằng giá trị này.
+MIN_SIMILARITY = 0.5
+# Số kết quả mặc định; None = không giới hạn (khi còn lọc tiếp theo quốc gia/chuyên ngành)
+DEFAULT_LIMIT = 200
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Chuẩn hóa để so khớp: chữ thường, bỏ dấu tiếng Việt, gộp khoảng trắng"""
+    if not text:
+        return ''
+    text = text.lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.split())
+
+
+def trigrams(text: str) -> set:
+    """Tách trigram theo từng từ giống pg_trgm (thêm 2 khoảng trắng đầu, 1 khoảng trắng cuối)"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+class TrigramIndex:
+    """Inverted index n-gram trong bộ nhớ cho tên và tên viết tắt của trường"""
+
+    def __init__(self, rows):
+        self.fields: Dict[int, Tuple[str, str]] = {}
+        self.field_trigrams: Dict[int, Tuple[set, set]] = {}
+        self.postings: Dict[str, set] = {}
+
+        for university_id, name, short_name in rows:
+            name_norm = normalize_text(name)
+            short_norm = normalize_text(short_name)
+            name_tris = trigrams(name_norm)
+            short_tris = trigrams(short_norm)
+            self.fields[university_id] = (name_norm, short_norm)
+            self.field_trigrams[university_id] = (name_tris, short_tris)
+            for tri in name_tris | short_tris:
+                self.postings.setdefault(tri, set()).add(university_id)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def search(self, query: str, limit: Optional[int] = DEFAULT_LIMIT,
+               min_similarity: float = MIN_SIMILARITY) -> List[Tuple[int, float]]:
+        """
+        Tìm trường theo độ tương đồng trigram
+
+        Returns:
+            List (university_id, score) sắp xếp giảm dần; score 1.0 khi từ khóa
+            là chuỗi con của tên (giữ nguyên kết quả của icontains)
+        """
+        query_norm = normalize_text(query)
+        query_tris = trigrams(query_norm)
+        if not query_tris:
+            return []
+
+        hits = Counter()
+        for tri in query_tris:
+            for university_id in self.postings.get(tri, ()):
+                hits[university_id] += 1
+
+        ranked = []
+        for university_id in hits:
+            name_norm, short_norm = self.fields[university_id]
+            if query_norm == name_norm or query_norm == short_norm:
+                ranked.append((university_id, 1.0, 2))
+                continue
+            if query_norm in name_norm or query_norm in short_norm:
+                ranked.append((university_id, 1.0, 1))
+                continue
+            name_tris, short_tris = self.field_trigrams[university_id]
+            score = max(len(query_tris & name_tris), len(query_tris & short_tris)) / len(query_tris)
+            if score >= min_similarity:
+                ranked.append((university_id, score, 0))
+
+        # Khớp chính xác > chuỗi con > độ tương đồng, cùng mức thì tên ngắn hơn trước
+        ranked.sort(key=lambda item: (-item[2], -item[1], len(self.fields[item[0]][0]), item[0]))
+        return [(university_id, score) for university_id, score, _ in ranked[:limit]]
+
+
+def _build_trigram_index() -> TrigramIndex:
+    rows = University.objects.values_list('id', 'name', 'short_name')
+    index = TrigramIndex(rows)
+    logger.info(f"Đã build trigram index cho {len(index)} trường")
+    return index
+
+
+# Index dùng chung trong process, build lại khi phiên bản dữ liệu thay đổi
+_trigram_index = VersionedProcessCache(_build_trigram_index)
+_pg_trgm_available: Optional[bool] = None
+
+
+def get_trigram_index() -> TrigramIndex:
+    return _trigram_index.get()
+
+
+def _has_pg_trgm() -> bool:
+    """Kiểm tra (một lần mỗi process) các index do lệnh create_search_indexes tạo ra"""
+    global _pg_trgm_available
+
+    if connection.vendor != 'postgresql':
+        return False
+    if _pg_trgm_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_proc WHERE proname = 'f_unaccent'")
+            _pg_trgm_available = cursor.fetchone() is not None
+        if not _pg_trgm_available:
+            logger.warning("Chưa có pg_trgm index, dùng trigram index trong bộ nhớ. Hãy chạy: python manage.py create_search_indexes")
+    return _pg_trgm_available
+
+
+def _search_postgres(query: str, limit: Optional[int]) -> List[Tuple[int, float]]:
+    """Tìm kiếm bằng pg_trgm GIN index (word_similarity + LIKE không dấu)"""
+    sql = """
+        SELECT id, CASE
+            WHEN f_unaccent(lower(name)) LIKE '%%' || f_unaccent(lower(%(q)s)) || '%%'
+              OR f_unaccent(lower(short_name)) LIKE '%%' || f_unaccent(lower(%(q)s)) || '%%' THEN 1.0
+            ELSE GREATEST(
+                word_similarity(f_unaccent(lower(%(q)s)), f_unaccent(lower(name))),
+                COALESCE(word_similarity(f_unaccent(lower(%(q)s)), f_unaccent(lower(short_name))), 0)
+            )
+        END AS score
+        FROM universities
+        WHERE f_unaccent(lower(%(q)s)) <%% f_unaccent(lower(name))
+           OR f_unaccent(lower(%(q)s)) <%% f_unaccent(lower(short_name))
+           OR f_unaccent(lower(name)) LIKE '%%' || f_unaccent(lower(%(q)s)) || '%%'
+           OR f_unaccent(lower(short_name)) LIKE '%%' || f_unaccent(lower(%(q)s)) || '%%'
+        ORDER BY score DESC, length(name), id
+        LIMIT %(limit)s
+    """
+    with connection.cursor() as cursor:
+        # Ngưỡng của toán tử <% (mặc định 0.6) phải giống nhánh trong bộ nhớ; LIMIT NULL = không giới hạn
+        cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(MIN_SIMILARITY)])
+        cursor.execute(sql, {'q': query, 'limit': limit})
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def search_universities(query: str, limit: Optional[int] = DEFAULT_LIMIT) -> List[Tuple[int, float]]:
+    """
+    Tìm trường theo tên/tên viết tắt, xếp theo độ tương đồng, không phân biệt dấu
+
+    PostgreSQL dùng pg_trgm GIN index; SQLite/SQL Server (hoặc khi chưa tạo index)
+    dùng trigram index trong bộ nhớ.
+
+    Args:
+        limit: số kết quả tối đa, None = trả về mọi trường khớp
+
+    Returns:
+        List (university_id, score) sắp xếp giảm dần theo score
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    if _has_pg_trgm():
+        try:
+            return _search_postgres(query, limit)
+        except DatabaseError as e:
+            logger.error(f"Lỗi tìm kiếm pg_trgm, chuyển sang index trong bộ nhớ: {str(e)}")
+
+    return get_trigram_index().search(query, limit=limit)
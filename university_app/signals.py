@@ -0,0 +1,120 @@
+"""
+Signal handlers giữ các bảng dữ liệu dẫn xuất, cache và vector index đồng bộ với dữ liệu gốc
+(chạy cả khi sửa qua admin lẫn khi loaddata với raw=True)
+"""
+from django.db import DatabaseError, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+import logging
+from .models import (
+    Country, University, RankingSource, Ranking, Program, Major,
+    UniversityProgram, Criteria, UniversityAdmissionRequirement
+)
+
+logger = logging.getLogger(__name__)
+
+# Các model dữ liệu gốc - mọi thay đổi làm tăng phiên bản dữ liệu
+DATA_MODELS = [
+    Country, University, RankingSource, Ranking, Program, Major,
+    UniversityProgram, Criteria, UniversityAdmissionRequirement
+]
+
+
+def _refresh_ranking_summary(university_ids):
+    from .services.ranking_summary import refresh_ranking_summary
+
+    try:
+        # Savepoint để lỗi (VD: bảng tổng hợp chưa được tạo) không làm hỏng transaction của loaddata/admin
+        with transaction.atomic():
+            refresh_ranking_summary(university_ids)
+    except DatabaseError as e:
+        logger.warning(f"Không cập nhật được bảng tổng hợp xếp hạng: {str(e)}")
+
+
+def _previous_value(sender, instance, field):
+    """Giá trị đang lưu trong database của bản ghi sắp được ghi đè (None nếu là bản ghi mới)"""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Ranking)
+def ranking_saving(sender, instance, **kwargs):
+    """Nhớ trường cũ để cập nhật cả trường bị chuyển ranking đi"""
+    instance._previous_university_id = _previous_value(sender, instance, 'university_id')
+
+
+@receiver(post_save, sender=Ranking)
+@receiver(post_delete, sender=Ranking)
+def ranking_changed(sender, instance, **kwargs):
+    """Cập nhật xếp hạng tổng hợp của trường có ranking vừa thay đổi (cả trường cũ nếu đổi trường)"""
+    university_ids = {instance.university_id, getattr(instance, '_previous_university_id', None)}
+    _refresh_ranking_summary(university_ids - {None})
+
+
+@receiver(post_save, sender=RankingSource)
+def ranking_source_changed(sender, instance, created, **kwargs):
+    """Đổi tên nguồn xếp hạng làm thay đổi latest_source/best_source của các trường liên quan"""
+    if created:
+        return
+    university_ids = Ranking.objects.filter(
+        ranking_sources=instance
+    ).values_list('university_id', flat=True).distinct()
+    _refresh_ranking_summary(list(university_ids))
+
+
+def _affected_university_ids(sender, instance):
+    """Trường có document chatbot bị ảnh hưởng; None = có thể ảnh hưởng mọi trường"""
+    if sender is University:
+        return [instance.pk]
+    if sender in (Ranking, UniversityProgram, UniversityAdmissionRequirement):
+        return [instance.university_id] if instance.university_id else []
+    return None
+
+
+@receiver(pre_save, sender=UniversityProgram)
+def university_program_saving(sender, instance, **kwargs):
+    """Nhớ chuyên ngành cũ để bảng xếp hạng của nó bỏ chương trình đã chuyển đi"""
+    instance._previous_major_id = _previous_value(sender, instance, 'major_id')
+
+
+def _affected_major_ids(sender, instance):
+    """Chuyên ngành có bảng xếp hạng bị ảnh hưởng; None = mọi chuyên ngành"""
+    if sender is UniversityProgram:
+        major_ids = {instance.major_id, getattr(instance, '_previous_major_id', None)}
+        return sorted(major_ids - {None})
+    if sender in (Ranking, UniversityAdmissionRequirement):
+        # Ranking chuyển trường làm đổi xếp hạng tổng hợp của cả trường cũ
+        university_ids = {instance.university_id, getattr(instance, '_previous_university_id', None)}
+        programs = UniversityProgram.objects.filter(university_id__in=university_ids - {None})
+        if sender is UniversityAdmissionRequirement and instance.program_id:
+            programs = programs.filter(program_id=instance.program_id)
+        return list(programs.values_list('major_id', flat=True).distinct())
+    if sender is Criteria:
+        return None
+    return []
+
+
+def data_changed(sender, instance, **kwargs):
+    """Tăng phiên bản dữ liệu để các cache phụ thuộc (trang chủ, ...) hết hiệu lực"""
+    from .services.chatbot import schedule_index_sync
+    from .services.data_version import bump_data_version
+    from .services.leaderboard import schedule_leaderboard_refresh
+
+    # Chỉ tăng sau khi commit để request khác không cache lại dữ liệu cũ dưới phiên bản mới
+    transaction.on_commit(bump_data_version)
+
+    # Bảng xếp hạng chuyên ngành: tính lại sau khi commit (đọc xếp hạng tổng hợp mới)
+    major_ids = _affected_major_ids(sender, instance)
+    if major_ids != []:
+        schedule_leaderboard_refresh(major_ids)
+
+    # Đồng bộ vector index của chatbot (chỉ embed lại document thay đổi)
+    university_ids = _affected_university_ids(sender, instance)
+    if university_ids != []:
+        transaction.on_commit(lambda: schedule_index_sync(university_ids))
+
+
+for _model in DATA_MODELS:
+    post_save.connect(data_changed, sender=_model, dispatch_uid=f'data_version_save_{_model.__name__}')
+    post_delete.connect(data_changed, sender=_model, dispatch_uid=f'data_version_delete_{_model.__name__}')
@@ -1,3 +1,1354 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+import os
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+import numpy as np
+
+from django.core import serializers
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .aggregates import GroupConcat
+from .models import (
+    Country, University, Major, Program, Criteria, RankingSource,
+    Ranking, UniversityProgram, UniversityAdmissionRequirement,
+    UniversityRankingSummary, AIAnalysisCache, MajorLeaderboardEntry
+)
+from .services.ai_dependencies import HEAVY_MODULES, start_background_preload
+from .services.ai_analysis import AIAnalysisService
+from .services.analysis_cache import (
+    make_analysis_key, get_cached_analysis, store_analysis, purge_analysis_cache, get_analysis_cache_stats
+)
+from .services.analysis_jobs import submit_job, get_job, JOB_DONE, JOB_FAILED, JOB_TIMEOUT
+from .services.answer_cache import (
+    SemanticAnswerCache, normalize_question, get_exact_answer, set_exact_answer
+)
+from .services import chatbot as chatbot_service
+from .services.data_version import bump_data_version, get_data_version
+from .services.embeddings import (
+    EmbeddingServer, SocketEmbeddingFunction, mean_pooling, resolve_backend,
+    BACKEND_ONNX_INT8, BACKEND_SENTENCE_TRANSFORMERS, ONNX_MODEL_FILE, ONNX_CONFIG_FILE,
+)
+from .services.hybrid_search import (
+    BM25Index, detect_constraints, reciprocal_rank_fusion, to_chroma_where, DEFAULT_TOP_RANK,
+)
+from .services import leaderboard as leaderboard_service
+from .services.leaderboard import get_leaderboard_page, parse_requirement_value, refresh_major_leaderboard
+from .services.gemini_rag import GeminiChatbotRAG
+from .services.llm_gateway import FakeLLMBackend, LLMBackendError, LLMGateway, LLMStreamTruncated, LLMTimeout
+from .services.import_audit import find_modules, measure_imports, parse_importtime
+from .services.prefix_index import PrefixIndex
+from .services.rag_context import build_context, estimate_tokens
+from .services.rag_corpus import iter_document_chunks
+from .services.ranking_summary import refresh_ranking_summary
+from .services.scoring import score_major_catalogue, score_universities
+from .services.university_search import TrigramIndex, normalize_text, search_universities
+from .views import generate_comparison_data, generate_ai_analysis
+
+
+def tao_du_lieu_mau(so_truong=5):
+    """Tạo dữ liệu mẫu: mỗi trường có 2 chương trình, 2 xếp hạng và yêu cầu tuyển sinh"""
+    country = Country.objects.create(name='Hoa Kỳ')
+    qs = RankingSource.objects.create(name='QS')
+    the = RankingSource.objects.create(name='THE')
+    bachelor = Program.objects.create(name='Bachelor of Science', level='Bachelor')
+    master = Program.objects.create(name='Master of Science', level='Master')
+    cs = Major.objects.create(name='Computer Science')
+    business = Major.objects.create(name='Business')
+    ielts = Criteria.objects.create(name='IELTS', unit='')
+    gpa = Criteria.objects.create(name='GPA', unit='/4.0')
+
+    universities = []
+    for i in range(1, so_truong + 1):
+        uni = University.objects.create(
+            name=f'University {i}', short_name=f'U{i}', country=country,
+            founded_year=1800 + i, website=f'u{i}.edu', description=f'Trường số {i}'
+        )
+        Ranking.objects.create(university=uni, ranking_sources=the, fyear=2023, frank=i * 12)
+        Ranking.objects.create(university=uni, ranking_sources=qs, fyear=2024, frank=i * 10)
+        UniversityProgram.objects.create(
+            university=uni, program=bachelor, major=cs, tuition_fee=20000 + i * 1000, duration='4'
+        )
+        UniversityProgram.objects.create(
+            university=uni, program=master, major=business, tuition_fee=30000 + i * 1000, duration='2'
+        )
+        UniversityAdmissionRequirement.objects.create(
+            university=uni, criteria=ielts, program=bachelor, value='6.5'
+        )
+        UniversityAdmissionRequirement.objects.create(
+            university=uni, criteria=gpa, program=bachelor, value='3.5'
+        )
+        UniversityAdmissionRequirement.objects.create(
+            university=uni, criteria=ielts, program=master, value='7.0'
+        )
+        universities.append(uni)
+    return universities
+
+
+class GenerateComparisonDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tao_du_lieu_mau(so_truong=5)
+
+    def test_so_query_khong_phu_thuoc_so_truong(self):
+        # universities + country + programs + rankings + requirements
+        with self.assertNumQueries(5):
+            data = generate_comparison_data(University.objects.all(), 'Computer Science')
+        self.assertEqual(len(data), 5)
+
+        with self.assertNumQueries(5):
+            generate_comparison_data(University.objects.all()[:2], 'Computer Science')
+
+    def test_giu_nguyen_cau_truc_du_lieu(self):
+        data = generate_comparison_data(University.objects.filter(name='University 2'), 'Computer Science')
+        self.assertEqual(data, [{
+            'ten_truong': 'University 2',
+            'quoc_gia': 'Hoa Kỳ',
+            'nam_thanh_lap': 1802,
+            'website': 'u2.edu',
+            'xep_hang_the_gioi': 20,
+            'nguon_xep_hang': 'QS',
+            'hoc_phi': 22000,
+            'thoi_gian_hoc': '4',
+            'cap_do': 'Bachelor',
+            'yeu_cau_tuyen_sinh': {
+                'IELTS': {'value': '6.5', 'unit': ''},
+                'GPA': {'value': '3.5', 'unit': '/4.0'},
+            }
+        }])
+
+    def test_truong_khong_co_chuyen_nganh(self):
+        data = generate_comparison_data(University.objects.filter(name='University 1'), 'Physics')
+        self.assertIsNone(data[0]['hoc_phi'])
+        self.assertEqual(data[0]['yeu_cau_tuyen_sinh'], {})
+
+
+class GroupConcatTests(TestCase):
+    def test_sql_server_ep_kieu_nvarchar_max(self):
+        qs = University.objects.values('country').annotate(chuyen_nganh=GroupConcat('universityprogram__major__name'))
+        aggregate = qs.query.annotations['chuyen_nganh']
+        sql, params = aggregate.as_microsoft(qs.query.get_compiler(connection=connection), connection)
+        self.assertEqual(sql, 'STRING_AGG(CAST("majors"."name" AS NVARCHAR(MAX)), %s)')
+        self.assertEqual(params, ['|'])
+
+
+class RankingSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.uni = tao_du_lieu_mau(so_truong=1)[0]
+        cls.arwu = RankingSource.objects.create(name='ARWU')
+
+    def test_uu_tien_qs_the_arwu(self):
+        Ranking.objects.create(university=self.uni, ranking_sources=self.arwu, fyear=2025, frank=7)
+        summary = UniversityRankingSummary.objects.get(university=self.uni)
+        self.assertEqual((summary.latest_rank, summary.latest_source, summary.latest_year), (7, 'ARWU', 2025))
+        self.assertEqual((summary.best_rank, summary.best_source, summary.best_year), (10, 'QS', 2024))
+        self.assertEqual(summary.latest_by_source['THE'], {'rank': 12, 'year': 2023})
+
+    def test_cap_nhat_khi_xoa_ranking(self):
+        self.uni.ranking_set.filter(ranking_sources__name='QS').delete()
+        summary = UniversityRankingSummary.objects.get(university=self.uni)
+        self.assertEqual((summary.best_rank, summary.best_source), (12, 'THE'))
+
+        self.uni.ranking_set.all().delete()
+        self.assertFalse(UniversityRankingSummary.objects.filter(university=self.uni).exists())
+
+    def test_cap_nhat_ca_truong_cu_khi_doi_truong(self):
+        other = University.objects.create(name='Other University', short_name='OU', country=self.uni.country)
+        ranking = self.uni.ranking_set.get(ranking_sources__name='QS')
+        ranking.university = other
+        ranking.save()
+        summary = UniversityRankingSummary.objects.get(university=self.uni)
+        self.assertEqual((summary.latest_rank, summary.latest_year), (12, 2023))
+        self.assertEqual(UniversityRankingSummary.objects.get(university=other).latest_rank, 10)
+
+    def test_cap_nhat_khi_loaddata(self):
+        data = serializers.serialize('json', [
+            Ranking(id=999, university=self.uni, ranking_sources=self.arwu, fyear=2030, frank=3)
+        ])
+        for obj in serializers.deserialize('json', data):
+            obj.save()
+        self.assertEqual(UniversityRankingSummary.objects.get(university=self.uni).latest_rank, 3)
+
+    def test_rebuild_toan_bo(self):
+        UniversityRankingSummary.objects.all().delete()
+        self.assertEqual(refresh_ranking_summary(), 1)
+        self.assertEqual(UniversityRankingSummary.objects.get(university=self.uni).best_rank, 10)
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TrangChuCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tao_du_lieu_mau(so_truong=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lan_thu_hai_khong_query_database(self):
+        response = self.client.get(reverse('university_app:trang_chu'))
+        self.assertEqual(response.context['thong_ke']['tong_truong'], 3)
+        self.assertEqual(response.context['truong_noi_bat'][0]['xep_hang_the_gioi'], 10)
+        self.assertEqual(response.context['truong_noi_bat'][0]['hoc_phi'], 26000)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('university_app:trang_chu'))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'data-version', 'TIMEOUT': 1,
+    }})
+    def test_phien_ban_tang_va_khong_het_han(self):
+        version = get_data_version()
+        with mock.patch('university_app.services.data_version.time.time_ns', return_value=0):
+            self.assertEqual(bump_data_version(), version + 1)
+        self.assertGreater(bump_data_version(), version + 1)
+        # Không bị gán thời hạn mặc định của cache (TIMEOUT=1)
+        self.assertIsNone(cache._expire_info[cache.make_key('data_version')])
+
+    def test_sua_du_lieu_lam_cache_het_hieu_luc(self):
+        self.client.get(reverse('university_app:trang_chu'))
+        version = get_data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            University.objects.create(name='University 4', country=Country.objects.first())
+        self.assertGreater(get_data_version(), version)
+
+        response = self.client.get(reverse('university_app:trang_chu'))
+        self.assertEqual(response.context['thong_ke']['tong_truong'], 4)
+
+
+class KetQuaTimKiemTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        universities = tao_du_lieu_mau(so_truong=12)
+        # Cùng chuyên ngành ở 2 chương trình khác nhau không bị lặp trong danh sách
+        UniversityProgram.objects.create(
+            university=universities[0], program=Program.objects.get(level='Master'),
+            major=Major.objects.get(name='Computer Science'), tuition_fee=40000, duration='2'
+        )
+
+    def setUp(self):
+        # on_commit không chạy trong TestCase - tăng phiên bản để index tìm kiếm build lại
+        bump_data_version()
+
+    def test_so_query_khong_phu_thuoc_page_size(self):
+        url = reverse('university_app:ket_qua_tim_kiem')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['danh_sach_truong']), 6)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 12})
+        self.assertEqual(len(response.json()['danh_sach_truong']), 12)
+
+    def test_page_size_bi_gioi_han(self):
+        url = reverse('university_app:ket_qua_tim_kiem')
+        phan_trang = self.client.get(url, {'page_size': 10000}).json()['phan_trang']
+        self.assertEqual(phan_trang['kich_thuoc_trang'], 50)
+        phan_trang = self.client.get(url, {'page_size': 'abc'}).json()['phan_trang']
+        self.assertEqual(phan_trang['kich_thuoc_trang'], 6)
+
+    def test_tu_khoa_khong_bi_cat_truoc_khi_loc(self):
+        # Bộ lọc chuyên ngành chạy sau tìm kiếm nên tìm kiếm không được giới hạn số kết quả
+        with mock.patch('university_app.views.search_universities', wraps=search_universities) as search:
+            response = self.client.get(reverse('university_app:ket_qua_tim_kiem'), {
+                'tu_khoa': 'University', 'ma_chuyen_nganh': Major.objects.get(name='Business').id
+            })
+        search.assert_called_once_with('University', limit=None)
+        self.assertEqual(response.json()['phan_trang']['tong_ket_qua'], 12)
+        self.assertEqual(len(search_universities('University', limit=None)), 12)
+        self.assertEqual(len(search_universities('University', limit=5)), 5)
+
+    def test_tu_khoa_giu_thu_tu_tuong_dong_khi_phan_trang(self):
+        url = reverse('university_app:ket_qua_tim_kiem')
+        thu_tu = [University.objects.get(pk=university_id).name for university_id, _ in search_universities('University 1', limit=None)]
+        ket_qua = []
+        for trang in (1, 2, 3):
+            # id thỏa bộ lọc + các trường của trang
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'tu_khoa': 'University 1', 'page_size': 5, 'trang': trang})
+            ket_qua += [truong['ten_truong'] for truong in response.json()['danh_sach_truong']]
+        self.assertEqual(ket_qua, thu_tu)
+        self.assertEqual(ket_qua[0], 'University 1')
+
+    def test_du_lieu_moi_truong(self):
+        response = self.client.get(reverse('university_app:ket_qua_tim_kiem'), {
+            'tu_khoa': 'University 1', 'ma_chuyen_nganh': Major.objects.get(name='Computer Science').id
+        })
+        truong = response.json()['danh_sach_truong'][0]
+        self.assertEqual(truong['ten_truong'], 'University 1')
+        self.assertEqual(truong['xep_hang_the_gioi'], 11)
+        self.assertEqual(sorted(truong['chuyen_nganh'].split(', ')), ['Business', 'Computer Science'])
+
+
+class UniversitySearchTests(TestCase):
+    def test_bo_dau_tieng_viet(self):
+        self.assertEqual(normalize_text('  Đại học  Quốc gia Hà Nội '), 'dai hoc quoc gia ha noi')
+
+    def test_xep_hang_theo_do_tuong_dong(self):
+        index = TrigramIndex([
+            (1, 'Harvard University', 'Harvard'),
+            (2, 'Đại học Bách khoa Hà Nội', 'HUST'),
+            (3, 'Harvard Extension School', None),
+        ])
+        self.assertEqual(index.search('harvard')[0][0], 1)
+        self.assertEqual(index.search('havard university')[0][0], 1)
+        self.assertEqual(index.search('dai hoc bach khoa')[0], (2, 1.0))
+        self.assertEqual(index.search('hust'), [(2, 1.0)])
+        self.assertEqual(index.search('oxford'), [])
+
+    def test_search_universities_dung_du_lieu_db(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            country = Country.objects.create(name='Việt Nam')
+            uni = University.objects.create(name='Đại học Quốc gia Hà Nội', short_name='VNU', country=country)
+        self.assertEqual(search_universities('dai hoc quoc gia')[0][0], uni.id)
+        self.assertEqual(search_universities('   '), [])
+
+
+class DanhSachTruongApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        country = Country.objects.create(name='Hoa Kỳ')
+        for name, short_name in [
+            ('Stanford University', 'Stanford'),
+            ('Massachusetts Institute of Technology', 'MIT'),
+            ('Đại học Bách khoa Hà Nội', 'HUST'),
+            ('University of Michigan', 'UMich'),
+        ]:
+            University.objects.create(name=name, short_name=short_name, country=country)
+
+    def setUp(self):
+        bump_data_version()
+
+    def test_prefix_index_thu_tu_uu_tien(self):
+        index = PrefixIndex(University.objects.values_list('name', 'short_name'))
+        self.assertEqual(index.search('mi'), ['Massachusetts Institute of Technology', 'University of Michigan'])
+        self.assertEqual(index.search('dai hoc'), ['Đại học Bách khoa Hà Nội'])
+        self.assertEqual(index.search('u', limit=1), ['University of Michigan'])
+        self.assertEqual(index.search('xyz'), [])
+
+    def test_api_tra_ve_top_n_va_etag(self):
+        url = reverse('university_app:danh_sach_truong_api')
+        response = self.client.get(url, {'q': 'stan', 'limit': 5})
+        self.assertEqual(response.json(), ['Stanford University'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': 'stan', 'limit': 5}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_api_khong_tham_so_tra_ve_toan_bo(self):
+        response = self.client.get(reverse('university_app:danh_sach_truong_api'))
+        self.assertEqual(len(response.json()), 4)
+
+
+class ChiTietTruongTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.small, cls.large = tao_du_lieu_mau(so_truong=2)
+        phd = Program.objects.create(name='Doctor of Philosophy', level='PhD')
+        for i in range(20):
+            major = Major.objects.create(name=f'Major {i}')
+            UniversityProgram.objects.create(
+                university=cls.large, program=phd, major=major, tuition_fee=10000, duration='5'
+            )
+        Criteria.objects.create(name='TOEFL')
+        UniversityAdmissionRequirement.objects.create(
+            university=cls.large, criteria=Criteria.objects.get(name='TOEFL'), program=phd, value='100'
+        )
+
+    def _query_count(self, university, **params):
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('university_app:chi_tiet_truong', args=[university.name])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_so_query_khong_phu_thuoc_so_chuong_trinh(self):
+        small_queries, _ = self._query_count(self.small)
+        large_queries, response = self._query_count(self.large)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(response.context['tong_chuong_trinh'], 22)
+
+    def test_tim_kiem_va_phan_trang(self):
+        baseline, _ = self._query_count(self.large)
+        queries, response = self._query_count(self.large, search='phd', page=3)
+        self.assertEqual(queries, baseline)
+        self.assertEqual(response.context['tong_chuong_trinh'], 20)
+        self.assertEqual(response.context['programs'].number, 3)
+        self.assertEqual(len(response.context['programs']), 2)
+        program = response.context['programs'][0]
+        self.assertEqual(program['major_name'], 'Major 4')
+        self.assertEqual(program['requirements'], [{'criteria': 'TOEFL', 'value': '100', 'unit': None}])
+        # Học phí trung bình vẫn tính trên toàn bộ chương trình
+        self.assertAlmostEqual(response.context['average_tuition'], (22000 + 32000 + 20 * 10000) / 22)
+
+    def test_api_infinite_scroll_keyset(self):
+        url = reverse('university_app:chuong_trinh_truong_api', args=[self.large.name])
+        majors = []
+        params = {'limit': 10}
+        while True:
+            with self.assertNumQueries(3):
+                data = self.client.get(url, params).json()
+            majors.extend(program['major_name'] for program in data['programs'])
+            if not data['has_more']:
+                break
+            params['after'] = data['next_after']
+        self.assertEqual(len(majors), 22)
+        self.assertEqual(len(set(majors)), 22)
+
+    def test_api_tham_so_khong_hop_le(self):
+        url = reverse('university_app:chuong_trinh_truong_api', args=[self.large.name])
+        self.assertEqual(self.client.get(url, {'after': 'abc'}).status_code, 400)
+        url = reverse('university_app:chuong_trinh_truong_api', args=['Không tồn tại'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class SoSanhTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        universities = tao_du_lieu_mau(so_truong=4)
+        # Ngành chỉ có ở một trường không phải ngành chung
+        UniversityProgram.objects.create(
+            university=universities[0], program=Program.objects.get(level='Master'),
+            major=Major.objects.create(name='Physics'), tuition_fee=35000, duration='2'
+        )
+
+    def setUp(self):
+        bump_data_version()
+
+    def _so_sanh(self, comparison_list):
+        session = self.client.session
+        session['comparison_list'] = comparison_list
+        session.save()
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('university_app:so_sanh')
+        # Build prefix index trước để không tính vào số query
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_nganh_chung_mot_query(self):
+        _, response = self._so_sanh(['University 1', 'U2', 'University 3'])
+        self.assertEqual([major.name for major in response.context['common_majors']],
+                         ['Business', 'Computer Science'])
+        self.assertEqual(len(response.context['danh_sach_truong']), 3)
+
+    def test_so_query_khong_phu_thuoc_so_truong(self):
+        queries_2, _ = self._so_sanh(['University 1', 'University 2'])
+        queries_4, response = self._so_sanh(['University 1', 'University 2', 'University 3', 'University 4'])
+        self.assertEqual(queries_2, queries_4)
+        self.assertEqual(len(response.context['danh_sach_truong']), 4)
+
+    def test_trang_so_sanh_khong_cho_gemini(self):
+        universities = list(University.objects.filter(name__in=['University 1', 'University 2']))
+        session = self.client.session
+        session['comparison_list'] = [uni.name for uni in universities]
+        session.save()
+        url = reverse('university_app:so_sanh')
+
+        with mock.patch('university_app.views.submit_job') as submit:
+            response = self.client.get(url, {'ma_chuyen_nganh': 'Computer Science'})
+        self.assertTrue(submit.called)
+        self.assertEqual(response.context['ket_qua_ai'], '')
+        self.assertEqual(response.context['ai_job_id'], submit.call_args[0][0])
+        self.assertEqual(len(response.context['truong_duoc_chon']), 2)
+
+        # Đã có cache thì hiển thị ngay, không tạo job
+        store_analysis(response.context['ai_job_id'], [uni.id for uni in universities], 'Computer Science', 'Đã phân tích')
+        with mock.patch('university_app.views.submit_job') as submit:
+            response = self.client.get(url, {'ma_chuyen_nganh': 'Computer Science'})
+        self.assertFalse(submit.called)
+        self.assertEqual(response.context['ket_qua_ai'], 'Đã phân tích')
+        self.assertIsNone(response.context['ai_job_id'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AI_ANALYSIS_CACHE_TTL=3600, AI_ANALYSIS_CACHE_MAX_ENTRIES=2)
+class AnalysisCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_hit_khong_goi_gemini(self):
+        key = make_analysis_key([3, 1, 2], 'Computer Science', 1)
+        self.assertEqual(key, make_analysis_key([1, 2, 3], 'Computer Science', 1))
+        self.assertIsNone(get_cached_analysis(key))
+        store_analysis(key, [3, 1, 2], 'Computer Science', 'Phân tích đã lưu')
+
+        data = [{'ten_truong': 'University 1'}]
+        self.assertEqual(generate_ai_analysis(data, 'Computer Science', [2, 1, 3]), 'Phân tích đã lưu')
+        self.assertEqual(AIAnalysisCache.objects.get(cache_key=key).hit_count, 1)
+        stats = get_analysis_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_khoa_doi_theo_phien_ban(self):
+        key = make_analysis_key([1, 2], 'Business', 1)
+        self.assertNotEqual(key, make_analysis_key([1, 2], 'Business', 2))
+        bump_data_version()
+        self.assertNotEqual(key, make_analysis_key([1, 2], 'Business', 1))
+
+    def test_het_han_va_lru(self):
+        store_analysis('key0', [0], 'Business', 'Phân tích 0')
+        store_analysis('key1', [1], 'Business', 'Phân tích 1')
+        AIAnalysisCache.objects.filter(cache_key='key0').update(last_accessed=timezone.now() - timedelta(hours=1))
+        store_analysis('key2', [2], 'Business', 'Phân tích 2')
+        # Giới hạn 2 bản: bản truy cập lâu nhất bị xóa
+        self.assertEqual(sorted(AIAnalysisCache.objects.values_list('cache_key', flat=True)), ['key1', 'key2'])
+
+        AIAnalysisCache.objects.filter(cache_key='key1').update(expires_at=timezone.now())
+        self.assertIsNone(get_cached_analysis('key1'))
+        self.assertEqual(get_cached_analysis('key2'), 'Phân tích 2')
+
+        self.assertEqual(purge_analysis_cache(), 2)
+        self.assertEqual(get_analysis_cache_stats()['hits'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AI_ANALYSIS_JOB_TIMEOUT=5)
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _doi_ket_qua(self, job_id):
+        for _ in range(100):
+            job = get_job(job_id)
+            if job['status'] not in ('pending', 'running'):
+                return job
+            time.sleep(0.02)
+        self.fail('Job không hoàn thành')
+
+    def test_job_chay_nen(self):
+        submit_job('job-ok', lambda a, b: a + b, 'Phân tích ', 'xong', fallback='dự phòng')
+        job = self._doi_ket_qua('job-ok')
+        self.assertEqual((job['status'], job['result']), (JOB_DONE, 'Phân tích xong'))
+
+        response = self.client.get(reverse('university_app:phan_tich_ai_api', args=['job-ok']))
+        self.assertEqual(response.json(), {'success': True, 'status': JOB_DONE, 'analysis': 'Phân tích xong'})
+        response = self.client.get(reverse('university_app:phan_tich_ai_api', args=['khong-co']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_loi_tra_ve_du_phong(self):
+        def loi():
+            raise RuntimeError('Gemini lỗi')
+        submit_job('job-loi', loi, fallback='dự phòng')
+        job = self._doi_ket_qua('job-loi')
+        self.assertEqual((job['status'], job['result']), (JOB_FAILED, 'dự phòng'))
+
+    def test_job_van_xong_khi_cache_bi_evict(self):
+        with mock.patch('university_app.services.analysis_jobs._get_executor') as executor:
+            # Trang poll trong lúc job đang chạy
+            submit_job('job-evict', lambda: get_job('job-evict')['status'], fallback='dự phòng')
+        # Entry bị evict trước khi thread nền bắt đầu chạy
+        cache.clear()
+        run, *args = executor.return_value.submit.call_args[0]
+        run(*args)
+        job = get_job('job-evict')
+        self.assertEqual((job['status'], job['result']), (JOB_DONE, 'running'))
+
+    def test_gemini_loi_danh_dau_failed_va_chay_lai(self):
+        data = [{
+            'ten_truong': 'University 1', 'quoc_gia': 'Hoa Kỳ', 'xep_hang_the_gioi': 10,
+            'hoc_phi': 20000, 'thoi_gian_hoc': 4, 'yeu_cau_tuyen_sinh': [],
+        }]
+        with mock.patch('university_app.views.get_llm_gateway') as gateway:
+            gateway.return_value.generate.side_effect = LLMBackendError('Gemini lỗi')
+            submit_job('job-gemini', generate_ai_analysis, data, 'Computer Science', None, False, True, fallback='dự phòng')
+            job = self._doi_ket_qua('job-gemini')
+            self.assertEqual((job['status'], job['result']), (JOB_FAILED, 'dự phòng'))
+
+            # Job FAILED không chặn lần gửi lại
+            gateway.return_value.generate.side_effect = None
+            gateway.return_value.generate.return_value = 'Phân tích từ Gemini'
+            submit_job('job-gemini', generate_ai_analysis, data, 'Computer Science', None, False, True, fallback='dự phòng')
+            job = self._doi_ket_qua('job-gemini')
+        self.assertEqual(job['status'], JOB_DONE)
+        self.assertTrue(job['result'].startswith('Phân tích từ Gemini'))
+
+    def test_job_qua_thoi_gian(self):
+        release = threading.Event()
+        with override_settings(AI_ANALYSIS_JOB_TIMEOUT=0):
+            submit_job('job-cham', release.wait, fallback='dự phòng')
+            time.sleep(0.01)
+            job = get_job('job-cham')
+            response = self.client.get(reverse('university_app:phan_tich_ai_api', args=['job-cham']))
+        release.set()
+        self.assertEqual((job['status'], job['result']), (JOB_TIMEOUT, 'dự phòng'))
+        self.assertEqual(response.json()['analysis'], 'dự phòng')
+
+
+class ChatbotStreamTests(TestCase):
+    def _stream(self, message, chat_stream):
+        chatbot = mock.Mock()
+        chatbot.chat_stream.side_effect = chat_stream
+        with mock.patch('university_app.views.get_chatbot_instance', return_value=chatbot):
+            response = self.client.post(
+                reverse('university_app:chatbot_gemini_stream'),
+                data={'message': message}, content_type='application/json'
+            )
+            body = b''.join(response.streaming_content).decode('utf-8')
+        return response, body
+
+    def test_stream_token_roi_footer(self):
+        def chat_stream(message):
+            yield 'token', 'MIT là\n'
+            yield 'token', ' trường top 1'
+            yield 'footer', '\n\n📚 Thông tin dựa trên: MIT'
+
+        response, body = self._stream('MIT?', chat_stream)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(body, (
+            'event: token\ndata: "MIT là\\n"\n\n'
+            'event: token\ndata: " trường top 1"\n\n'
+            'event: footer\ndata: "\\n\\n📚 Thông tin dựa trên: MIT"\n\n'
+            'event: done\ndata: ""\n\n'
+        ))
+
+    def test_loi_giua_chung_van_ket_thuc_stream(self):
+        def chat_stream(message):
+            yield 'token', 'Đang trả lời'
+            raise RuntimeError('mất kết nối')
+
+        _, body = self._stream('MIT?', chat_stream)
+        self.assertIn('event: error\ndata: "Lỗi: mất kết nối"', body)
+        self.assertTrue(body.endswith('event: done\ndata: ""\n\n'))
+
+    def test_cau_hoi_rong(self):
+        response = self.client.post(
+            reverse('university_app:chatbot_gemini_stream'), data={'message': ' '}, content_type='application/json'
+        )
+        self.assertFalse(response.json()['success'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHATBOT_CACHE_TTL=60)
+class AnswerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_khop_chinh_xac_sau_chuan_hoa(self):
+        self.assertEqual(normalize_question('  So sánh MIT   và Stanford? '), 'so sánh mit và stanford')
+        set_exact_answer('So sánh MIT và Stanford', 'MIT hơn', '\n\n📚 MIT')
+        self.assertEqual(get_exact_answer('so sánh mit và  stanford?'), ('MIT hơn', '\n\n📚 MIT'))
+        # Giữ dấu tiếng Việt: câu khác dấu là câu khác
+        self.assertIsNone(get_exact_answer('so sanh mit va stanford'))
+
+        bump_data_version()
+        self.assertIsNone(get_exact_answer('So sánh MIT và Stanford'))
+
+    def test_gan_nghia_cung_tap_truong(self):
+        semantic = SemanticAnswerCache(max_entries=2, ttl=60, threshold=0.9)
+        semantic.set([1.0, 0.0, 0.1], [2, 1], 'Trả lời A', 'footer A')
+
+        self.assertEqual(semantic.get([0.99, 0.01, 0.1], [1, 2]), ('Trả lời A', 'footer A'))
+        # Gần nghĩa nhưng tập trường khác / khác nghĩa
+        self.assertIsNone(semantic.get([0.99, 0.01, 0.1], [1, 3]))
+        self.assertIsNone(semantic.get([0.0, 1.0, 0.0], [1, 2]))
+
+        # Giới hạn số bản ghi: bản dùng lâu nhất bị loại
+        semantic.set([0.0, 1.0, 0.0], [5], 'Trả lời B', '')
+        semantic.set([0.0, 0.0, 1.0], [6], 'Trả lời C', '')
+        self.assertEqual(len(semantic), 2)
+        self.assertIsNone(semantic.get([1.0, 0.0, 0.1], [1, 2]))
+
+        # Dữ liệu thay đổi thì xóa toàn bộ
+        bump_data_version()
+        self.assertIsNone(semantic.get([0.0, 0.0, 1.0], [6]))
+        self.assertEqual(len(semantic), 0)
+
+    def test_het_han(self):
+        semantic = SemanticAnswerCache(max_entries=10, ttl=0, threshold=0.9)
+        semantic.set([1.0, 0.0], [1], 'Trả lời', '')
+        time.sleep(0.01)
+        self.assertIsNone(semantic.get([1.0, 0.0], [1]))
+        self.assertEqual(len(semantic), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IndexSyncSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.university = tao_du_lieu_mau(so_truong=1)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def _sua_du_lieu(self, chatbot, change):
+        with mock.patch.object(chatbot_service, '_chatbot_instance', chatbot):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            # Chờ thread đồng bộ xử lý xong
+            chatbot_service._sync_executor.submit(lambda: None).result()
+
+    def test_chi_dong_bo_truong_bi_sua(self):
+        chatbot = mock.Mock()
+
+        def change():
+            Ranking.objects.create(
+                university=self.university, ranking_sources=RankingSource.objects.get(name='QS'),
+                fyear=2025, frank=5
+            )
+            self.university.website = 'new.edu'
+            self.university.save()
+
+        self._sua_du_lieu(chatbot, change)
+        # Các thay đổi liên tiếp có thể được gộp vào một lần đồng bộ
+        synced = [call.args[0] for call in chatbot.sync_index.call_args_list]
+        self.assertTrue(synced)
+        self.assertTrue(all(ids == [self.university.id] for ids in synced))
+
+    def test_du_lieu_dung_chung_dong_bo_toan_bo(self):
+        chatbot = mock.Mock()
+        self._sua_du_lieu(chatbot, lambda: Country.objects.filter(name='Hoa Kỳ').first().save())
+        chatbot.sync_index.assert_called_once_with(None)
+
+    def test_chua_nap_chatbot_chi_danh_dau(self):
+        self._sua_du_lieu(None, lambda: self.university.save())
+        self.assertTrue(cache.get(chatbot_service.INDEX_DIRTY_KEY))
+
+    def test_process_da_nap_chatbot_dong_bo_khi_co_danh_dau(self):
+        # Process khác đánh dấu lúc chưa nạp chatbot; process này đã nạp từ trước
+        cache.set(chatbot_service.INDEX_DIRTY_KEY, True, timeout=None)
+        chatbot = mock.Mock()
+        with mock.patch.object(chatbot_service, '_chatbot_instance', chatbot):
+            self.assertIs(chatbot_service.get_chatbot_instance(), chatbot)
+            chatbot_service._sync_executor.submit(lambda: None).result()
+        chatbot.sync_index.assert_called_once_with(None)
+        self.assertIsNone(cache.get(chatbot_service.INDEX_DIRTY_KEY))
+
+
+class RagCorpusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tao_du_lieu_mau(so_truong=5)
+        refresh_ranking_summary()
+
+    def test_so_query_theo_lo(self):
+        # Mỗi lô: trường (kèm quốc gia, xếp hạng) + chuyên ngành + học phí trung bình
+        with self.assertNumQueries(9):
+            chunks = list(iter_document_chunks(chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([doc_id for chunk in chunks for doc_id, _, _ in chunk],
+                         [f'uni_{uid}' for uid in University.objects.order_by('id').values_list('id', flat=True)])
+
+    def test_noi_dung_document(self):
+        university = University.objects.get(name='University 2')
+        [[(doc_id, doc, metadata)]] = list(iter_document_chunks([university.id]))
+        self.assertEqual(doc_id, f'uni_{university.id}')
+        self.assertIn('Chuyên ngành đào tạo: Computer Science, Business', doc)
+        self.assertIn('Xếp hạng thế giới: 20', doc)
+        self.assertIn('Học phí trung bình: $27,000/năm', doc)
+        self.assertEqual(metadata['ranking'], 20)
+        self.assertEqual(len(metadata['content_hash']), 64)
+
+        # Document không đổi thì hash không đổi (không phải embed lại)
+        [[(_, _, again)]] = list(iter_document_chunks([university.id]))
+        self.assertEqual(again['content_hash'], metadata['content_hash'])
+
+
+class EmbeddingServerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, 'embedding.sock')
+        self.server = EmbeddingServer(self.socket_path, self._encode, max_batch=64, max_wait=0.2)
+        self.server.bind()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.tmpdir.cleanup()
+
+    def _encode(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def test_tra_embedding_qua_socket(self):
+        client = SocketEmbeddingFunction(self.socket_path, timeout=5)
+        self.assertTrue(client.ping())
+        self.assertEqual(client(['ab', 'abcd']), [[2.0, 1.0], [4.0, 1.0]])
+
+    def test_gop_request_dong_thoi(self):
+        client = SocketEmbeddingFunction(self.socket_path, timeout=5)
+        results = {}
+
+        def goi(i):
+            results[i] = client(['x' * i])
+
+        threads = [threading.Thread(target=goi, args=(i,)) for i in range(1, 6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: [[float(i), 1.0]] for i in range(1, 6)})
+        self.assertLess(len(self.calls), 5)
+
+    def test_khong_co_sidecar_thi_nap_trong_process(self):
+        local = mock.Mock(return_value=[[0.5]])
+        client = SocketEmbeddingFunction(
+            os.path.join(self.tmpdir.name, 'missing.sock'), timeout=1, fallback_factory=lambda: local
+        )
+        self.assertFalse(client.ping())
+        self.assertEqual(client(['a']), [[0.5]])
+        self.assertEqual(client(['b']), [[0.5]])
+        self.assertEqual(local.call_count, 2)
+
+
+class EmbeddingBackendTests(TestCase):
+    def test_mean_pooling_bo_qua_padding(self):
+        token_embeddings = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]])
+        attention_mask = np.array([[1, 1, 0]])
+        np.testing.assert_allclose(mean_pooling(token_embeddings, attention_mask), [[2.0, 3.0]])
+
+    def test_onnx_thieu_file_export_dung_sentence_transformers(self):
+        with tempfile.TemporaryDirectory() as model_dir:
+            with override_settings(EMBEDDING_BACKEND=BACKEND_ONNX_INT8, EMBEDDING_ONNX_DIR=model_dir):
+                self.assertEqual(resolve_backend(), BACKEND_SENTENCE_TRANSFORMERS)
+
+                for name in (ONNX_MODEL_FILE, ONNX_CONFIG_FILE, 'tokenizer.json'):
+                    open(os.path.join(model_dir, name), 'w').close()
+                self.assertEqual(resolve_backend(), BACKEND_ONNX_INT8)
+
+
+class ImportAuditTests(TestCase):
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   chromadb.api\n"
+            "import time:        80 |        200 | chromadb\n"
+        )
+        timings = parse_importtime(stderr)
+        self.assertEqual(timings, {'chromadb.api': 120, 'chromadb': 200})
+        self.assertEqual(find_modules(timings, ['chromadb']), timings)
+        self.assertEqual(find_modules({'chromadbx': 1}, ['chromadb']), {})
+
+    def test_khoi_dong_khong_import_thu_vien_ai(self):
+        # Cold start thật: process mới nạp Django + toàn bộ urls/views
+        timings = measure_imports()
+        self.assertIn('university_app.views', timings)
+        self.assertEqual(find_modules(timings, HEAVY_MODULES), {})
+
+    @override_settings(AI_PRELOAD_DEPENDENCIES=False)
+    def test_nap_truoc_tat_theo_cau_hinh(self):
+        self.assertIsNone(start_background_preload())
+
+
+class HybridSearchTests(TestCase):
+    KNOWN = ['US', 'United States', 'Japan', 'United Kingdom']
+
+    def test_nhan_ra_quoc_gia_va_xep_hang(self):
+        self.assertEqual(
+            detect_constraints('Các trường đại học ở Mỹ xếp hạng cao', self.KNOWN),
+            {'countries': ['US', 'United States'], 'max_rank': DEFAULT_TOP_RANK}
+        )
+        self.assertEqual(
+            detect_constraints('Top 50 trường ở Nhật Bản', self.KNOWN),
+            {'countries': ['Japan'], 'max_rank': 50}
+        )
+        self.assertEqual(detect_constraints('Du học Anh cần IELTS bao nhiêu?', self.KNOWN),
+                         {'countries': ['United Kingdom']})
+        # "tiếng Anh", "cập nhật", "mỹ thuật" không phải quốc gia; quốc gia không có dữ liệu thì bỏ qua
+        self.assertEqual(detect_constraints('Ngành mỹ thuật cần điểm tiếng Anh, cập nhật chưa?', self.KNOWN), {})
+        self.assertEqual(detect_constraints('Trường ở Canada', self.KNOWN), {})
+
+    def test_where_cho_chroma(self):
+        self.assertIsNone(to_chroma_where({}))
+        self.assertEqual(to_chroma_where({'countries': ['Japan']}), {'country': 'Japan'})
+        self.assertEqual(
+            to_chroma_where({'countries': ['US', 'United States'], 'max_rank': 50}),
+            {'$and': [
+                {'$or': [{'country': 'US'}, {'country': 'United States'}]},
+                {'ranking': {'$lte': 50}},
+            ]}
+        )
+
+    def test_reciprocal_rank_fusion(self):
+        # 2 đứng đầu nhờ có mặt ở cả hai danh sách
+        self.assertEqual(reciprocal_rank_fusion([[1, 2, 3], [2, 4]]), [2, 1, 4, 3])
+
+    def test_bm25_khong_dau_va_loc_metadata(self):
+        tao_du_lieu_mau(so_truong=3)
+        japan = Country.objects.create(name='Japan')
+        University.objects.create(name='Tokyo Institute of Technology', short_name='Tokyo Tech', country=japan)
+        refresh_ranking_summary()
+
+        index = BM25Index(doc for chunk in iter_document_chunks() for doc in chunk)
+        [(doc_id, _)] = index.search('tokyo', limit=5)
+        self.assertEqual(index.metadatas[doc_id]['name'], 'Tokyo Institute of Technology')
+        # Câu hỏi không dấu vẫn khớp document có dấu
+        self.assertEqual(len(index.search('hoc phi', limit=10)), 4)
+
+        ranked = index.search('truong hoc phi', limit=10, constraints={'countries': ['Hoa Kỳ'], 'max_rank': 20})
+        self.assertEqual(sorted(index.metadatas[doc_id]['name'] for doc_id, _ in ranked),
+                         ['University 1', 'University 2'])
+        self.assertEqual(index.countries, {'Hoa Kỳ', 'Japan'})
+
+
+class RagContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.universities = tao_du_lieu_mau(so_truong=5)
+        refresh_ranking_summary()
+
+    def test_so_query_co_dinh_va_giu_thu_tu(self):
+        ids = [uni.id for uni in reversed(self.universities)]
+        with self.assertNumQueries(3):
+            context, names = build_context(ids, token_budget=10000)
+        self.assertEqual(names, [f'University {i}' for i in range(5, 0, -1)])
+        self.assertLess(context.index('TRƯỜNG: University 5'), context.index('TRƯỜNG: University 1'))
+        self.assertIn('  - IELTS: 6.5\n  - GPA: 3.5\n  - IELTS: 7.0', context)
+        self.assertIn('  - Computer Science (Bachelor): $21,000/năm', context)
+        self.assertIn('Xếp hạng thế giới: #10 (QS)', context)
+
+    def test_ngan_sach_token(self):
+        ids = [uni.id for uni in self.universities]
+        one, _ = build_context(ids[:1], token_budget=10000)
+        context, names = build_context(ids, token_budget=estimate_tokens(one) * 2)
+        self.assertEqual(names, ['University 1', 'University 2'])
+        self.assertLessEqual(estimate_tokens(context), estimate_tokens(one) * 2)
+
+        # Trường liên quan nhất luôn có mặt
+        _, names = build_context(ids, token_budget=1)
+        self.assertEqual(names, ['University 1'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ChatbotPrewarmTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_chi_mot_process_lam_nong_moi_phien_ban(self):
+        self.assertTrue(chatbot_service._claim_prewarm())
+        self.assertFalse(chatbot_service._claim_prewarm())
+        # Dữ liệu thay đổi thì câu trả lời cũ hết hiệu lực, được làm nóng lại
+        bump_data_version()
+        self.assertTrue(chatbot_service._claim_prewarm())
+
+
+class HealthzReadyTests(TestCase):
+    def setUp(self):
+        self.addCleanup(chatbot_service._warmup.update, dict(chatbot_service._warmup))
+        chatbot_service._warmup.update(
+            state=chatbot_service.WARMUP_DISABLED, started_at=None, finished_at=None, error=None
+        )
+
+    def test_tat_lam_nong_van_san_sang(self):
+        response = self.client.get('/healthz/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['warmup']['state'], 'disabled')
+
+    @override_settings(CHATBOT_WARMUP_ON_BOOT=True)
+    def test_503_khi_dang_lam_nong(self):
+        release = threading.Event()
+        chatbot = mock.Mock()
+        chatbot.warm_up.side_effect = lambda: release.wait(5)
+
+        with mock.patch.object(chatbot_service, 'get_chatbot_instance', return_value=chatbot):
+            thread = chatbot_service.start_warmup()
+            response = self.client.get('/healthz/ready')
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(response.json()['ready'])
+            # Gọi lại khi đang chạy không tạo thêm thread
+            self.assertIsNone(chatbot_service.start_warmup())
+
+            release.set()
+            thread.join(5)
+
+        response = self.client.get('/healthz/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['warmup']['state'], 'ready')
+        chatbot.warm_up.assert_called_once_with()
+
+    def test_lam_nong_loi_chua_san_sang_va_thu_lai(self):
+        chatbot = mock.Mock()
+        chatbot.warm_up.side_effect = RuntimeError('Chroma lỗi')
+        with mock.patch.object(chatbot_service, 'get_chatbot_instance', return_value=chatbot):
+            chatbot_service.start_warmup(force=True).join(5)
+
+            response = self.client.get('/healthz/ready')
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(response.json()['ready'])
+            self.assertEqual(response.json()['warmup']['state'], 'failed')
+            self.assertEqual(response.json()['warmup']['error'], 'Chroma lỗi')
+            self.assertEqual(chatbot.warm_up.call_count, 1)
+
+            # Hết thời gian chờ: probe kế tiếp làm nóng lại
+            release = threading.Event()
+            chatbot.warm_up.side_effect = lambda: release.wait(5)
+            with mock.patch.object(chatbot_service, 'WARMUP_RETRY_SECONDS', 0):
+                response = self.client.get('/healthz/ready')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['warmup']['state'], 'warming')
+            release.set()
+            for _ in range(100):
+                if chatbot_service.get_warmup_status()['state'] == 'ready':
+                    break
+                time.sleep(0.02)
+
+        response = self.client.get('/healthz/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(chatbot.warm_up.call_count, 2)
+
+
+class LLMGatewayTests(TestCase):
+    def _gateway(self, backend, **kwargs):
+        options = dict(max_concurrency=4, rate_per_minute=0, timeout=5, backoff_base=0.01)
+        options.update(kwargs)
+        return LLMGateway(backend, **options)
+
+    def _run_parallel(self, func, args_list):
+        results = [None] * len(args_list)
+
+        def run(i, args):
+            results[i] = func(*args)
+
+        threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_gop_prompt_giong_nhau(self):
+        backend = FakeLLMBackend(reply='Câu trả lời', delay=0.2)
+        gateway = self._gateway(backend)
+        results = self._run_parallel(gateway.generate, [('Cùng một câu hỏi',)] * 5)
+
+        self.assertEqual(results, ['Câu trả lời'] * 5)
+        self.assertEqual(len(backend.calls), 1)
+        metrics = gateway.get_metrics()
+        self.assertEqual((metrics['calls'], metrics['coalesced'], metrics['in_flight']), (1, 4, 0))
+
+    def test_gioi_han_dong_thoi(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def reply(prompt):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return prompt
+
+        gateway = self._gateway(FakeLLMBackend(reply=reply), max_concurrency=2)
+        results = self._run_parallel(gateway.generate, [(f'Câu {i}',) for i in range(6)])
+
+        self.assertEqual(results, [f'Câu {i}' for i in range(6)])
+        self.assertEqual(peak[0], 2)
+        self.assertGreaterEqual(gateway.get_metrics()['max_queue_depth'], 3)
+
+    def test_thu_lai_khi_429_va_5xx(self):
+        backend = FakeLLMBackend(reply='OK', errors=[LLMBackendError(429), LLMBackendError(503)])
+        gateway = self._gateway(backend)
+        self.assertEqual(gateway.generate('prompt'), 'OK')
+        self.assertEqual(len(backend.calls), 3)
+        self.assertEqual(gateway.get_metrics()['retries'], 2)
+
+        # Lỗi 4xx khác không thử lại
+        backend = FakeLLMBackend(errors=[LLMBackendError(400)])
+        gateway = self._gateway(backend)
+        with self.assertRaises(LLMBackendError):
+            gateway.generate('prompt')
+        self.assertEqual(len(backend.calls), 1)
+        self.assertEqual(gateway.get_metrics()['failures'], 1)
+
+    def test_deadline_va_gioi_han_toc_do(self):
+        gateway = self._gateway(FakeLLMBackend(delay=0.5))
+        with self.assertRaises(LLMTimeout):
+            gateway.generate('chậm', timeout=0.05)
+
+        # 1 lời gọi / 6 giây, không dồn: lời gọi thứ hai không kịp deadline
+        gateway = self._gateway(FakeLLMBackend(), rate_per_minute=10, burst=1)
+        gateway.generate('câu 1')
+        with self.assertRaises(LLMTimeout):
+            gateway.generate('câu 2', timeout=0.1)
+        self.assertEqual(gateway.get_metrics()['deadline_exceeded'], 1)
+
+    def test_stream_thu_lai_truoc_phan_dau_tien(self):
+        backend = FakeLLMBackend(reply='Xin chào bạn', errors=[LLMBackendError(500)])
+        gateway = self._gateway(backend)
+        self.assertEqual(''.join(gateway.stream('prompt')), 'Xin chào bạn ')
+        self.assertEqual(len(backend.calls), 2)
+        self.assertEqual(gateway.get_metrics()['in_flight'], 0)
+
+    def test_stream_deadline_khi_backend_treo(self):
+        # Backend không trả phần nào trong 2 giây: stream phải dừng ở deadline, không chờ backend
+        gateway = self._gateway(FakeLLMBackend(reply='Trả lời muộn', delay=2), max_concurrency=1)
+        started = time.monotonic()
+        with self.assertRaises(LLMTimeout):
+            list(gateway.stream('prompt', timeout=0.2))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(gateway.get_metrics()['deadline_exceeded'], 1)
+        # Slot chỉ trả lại khi lời gọi treo kết thúc, rồi lời gọi mới chạy được
+        self.assertEqual(gateway.get_metrics()['in_flight'], 1)
+        gateway.backend.delay = 0
+        self.assertEqual(''.join(gateway.stream('prompt', timeout=5)), 'Trả lời muộn ')
+
+    def _slow_backend(self, chunks, chunk_delay):
+        class SlowBackend:
+            def stream(self, prompt):
+                for chunk in chunks:
+                    time.sleep(chunk_delay)
+                    yield chunk
+        return SlowBackend()
+
+    def test_stream_dai_khong_bi_cat_o_timeout(self):
+        # Tổng thời gian (~0.5s) vượt timeout nhưng từng phần đến đều: không bị cắt
+        gateway = self._gateway(self._slow_backend(['a'] * 5, 0.1), stream_idle_timeout=0.5)
+        self.assertEqual(''.join(gateway.stream('prompt', timeout=0.3)), 'aaaaa')
+
+    def test_stream_dung_khi_ngung_giua_chung(self):
+        gateway = self._gateway(self._slow_backend(['a', 'b'], 0.3), stream_idle_timeout=0.1)
+        with self.assertRaises(LLMTimeout) as ctx:
+            list(gateway.stream('prompt', timeout=1))
+        self.assertNotIsInstance(ctx.exception, LLMStreamTruncated)
+
+    def test_stream_vuot_tong_thoi_gian_bi_cat(self):
+        gateway = self._gateway(
+            self._slow_backend(['a'] * 10, 0.1), stream_idle_timeout=1, stream_max_duration=0.35
+        )
+        received = []
+        with self.assertRaises(LLMStreamTruncated):
+            for text in gateway.stream('prompt', timeout=1):
+                received.append(text)
+        self.assertTrue(1 <= len(received) < 10)
+
+    def test_chatbot_bao_cau_tra_loi_bi_cat(self):
+        def stream(prompt):
+            yield 'Phần đầu'
+            raise LLMStreamTruncated('Câu trả lời quá dài nên đã bị cắt')
+
+        chatbot = object.__new__(GeminiChatbotRAG)
+        chatbot.llm = mock.Mock(stream=stream)
+        chatbot._lookup_cache = mock.Mock(return_value=(None, [1.0], [1]))
+        chatbot._build_context = mock.Mock(return_value=('MIT', ['MIT']))
+        chatbot._remember = mock.Mock()
+        events = list(chatbot.chat_stream('MIT?'))
+        self.assertEqual([event for event, _ in events], ['token', 'truncated', 'footer'])
+        self.assertFalse(chatbot._remember.called)
+
+    def test_lay_quota_truoc_slot(self):
+        # Lời gọi đang chờ quota không chiếm slot: lời gọi khác vẫn lấy được slot
+        gateway = self._gateway(FakeLLMBackend(), max_concurrency=1, rate_per_minute=10, burst=1)
+        slot_free = []
+        bucket_acquire = gateway._bucket.acquire
+
+        def acquire(deadline):
+            if gateway._slots.acquire(blocking=False):
+                gateway._slots.release()
+                slot_free.append(True)
+            else:
+                slot_free.append(False)
+            return bucket_acquire(deadline)
+
+        gateway._bucket.acquire = acquire
+        gateway.generate('câu 1')
+        with self.assertRaises(LLMTimeout):
+            gateway.generate('câu 2', timeout=0.1)
+        self.assertEqual(slot_free, [True, True])
+
+    def test_phan_tich_ai_goi_qua_cong(self):
+        backend = FakeLLMBackend(reply='Phân tích từ Gemini')
+        data = [{
+            'ten_truong': 'University 1', 'quoc_gia': 'Hoa Kỳ', 'xep_hang_the_gioi': 10,
+            'hoc_phi': 20000, 'thoi_gian_hoc': 4, 'yeu_cau_tuyen_sinh': [],
+        }]
+        with mock.patch('university_app.views.get_llm_gateway', return_value=self._gateway(backend)):
+            analysis = generate_ai_analysis(data, 'Computer Science')
+        self.assertTrue(analysis.startswith('Phân tích từ Gemini'))
+        self.assertIn('Computer Science', backend.calls[0])
+
+
+class ScoringTests(TestCase):
+    def test_bang_nguong_giu_nguyen_cach_tinh_cu(self):
+        ket_qua = score_universities(
+            rank=[10, 11, 500, 501, 0, None],
+            tuition=[20000, 20001, 50000, 50001, 0, None],
+            acceptance=[80, 79.9, 20, 19.9, 0, None],
+            scholarship=[True, False, True, False, False, False],
+        )
+        self.assertEqual(ket_qua['components'].tolist(), [
+            [100, 100, 100, 10],
+            [90, 85, 85, 0],
+            [60, 50, 50, 10],
+            [40, 30, 30, 0],
+            [0, 0, 0, 0],
+            [0, 0, 0, 0],
+        ])
+        # 100*0.4 + 100*0.3 + 100*0.2 + 10*0.1
+        self.assertEqual(ket_qua['total'][0], 91.0)
+        self.assertEqual(ket_qua['grade'].tolist()[:2], ['Xuất sắc', 'Tốt'])
+        self.assertEqual(ket_qua['grade'][-1], 'Kém')
+
+    def test_trong_so_nguoi_dung(self):
+        # Chỉ quan tâm học phí: trường rẻ hơn thắng dù xếp hạng thấp hơn
+        ket_qua = score_universities([5, 300], [60000, 15000], [0, 0], [False, False], weights=[0, 2, 0, 0])
+        self.assertEqual(ket_qua['total'].tolist(), [30.0, 100.0])
+        with self.assertRaises(ValueError):
+            score_universities([1], [1], [1], [False], weights=[1, 1])
+        with self.assertRaises(ValueError):
+            score_universities([1], [1], [1], [False], weights=[0, 0, 0, 0])
+
+    def test_ai_analysis_dung_bo_cham_diem(self):
+        truong = [
+            {'ten_truong': 'A', 'xep_hang_the_gioi': 45, 'hoc_phi': 25000, 'ty_le_chap_nhan': 30, 'co_hoc_bong': True},
+            {'ten_truong': 'B', 'xep_hang_the_gioi': 0, 'hoc_phi': 0},
+        ]
+        bang_diem = AIAnalysisService()._tinh_diem_truong(truong)
+        self.assertEqual(bang_diem['A'], {
+            'diem_tong': 72.5, 'diem_xep_hang': 90, 'diem_hoc_phi': 85, 'diem_ty_le': 50,
+            'diem_hoc_bong': 10, 'xep_loai': 'Khá',
+        })
+        self.assertEqual(bang_diem['B']['diem_tong'], 0.0)
+
+    def test_cham_ca_danh_muc_chuyen_nganh(self):
+        universities = tao_du_lieu_mau(so_truong=5)
+        refresh_ranking_summary()
+
+        with self.assertNumQueries(1):
+            ket_qua = score_major_catalogue('computer science')
+        # Học phí 21k-25k (85 điểm) như nhau, xếp hạng 10..50 (90/100 điểm)
+        self.assertEqual(ket_qua['university_id'].tolist(), [uni.id for uni in universities])
+        self.assertEqual(ket_qua['total'].tolist(), [65.5, 61.5, 61.5, 61.5, 61.5])
+        self.assertEqual(len(score_major_catalogue('Không tồn tại')['total']), 0)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.universities = tao_du_lieu_mau(so_truong=5)
+        cls.cs = Major.objects.get(name='Computer Science')
+        refresh_major_leaderboard()
+
+    def test_tinh_san_theo_chuyen_nganh(self):
+        self.assertEqual(MajorLeaderboardEntry.objects.count(), 10)
+        entries = list(MajorLeaderboardEntry.objects.filter(major=self.cs).order_by('position'))
+        # Học phí 21k-25k (85), IELTS 6.5 (85), xếp hạng 10 (100) rồi 20..50 (90)
+        self.assertEqual([entry.university_id for entry in entries], [uni.id for uni in self.universities])
+        self.assertEqual([entry.score for entry in entries], [92.5, 87.5, 87.5, 87.5, 87.5])
+        self.assertEqual(
+            (entries[0].rank_score, entries[0].tuition_score, entries[0].requirement_score, entries[0].ielts),
+            (100, 85, 85, 6.5)
+        )
+        self.assertEqual(parse_requirement_value('6,5 (no band < 6.0)'), 6.5)
+        self.assertIsNone(parse_requirement_value('Không yêu cầu'))
+
+    def test_doc_trang_la_range_scan(self):
+        with self.assertNumQueries(2):
+            page = get_leaderboard_page(self.cs.id, 2, 2)
+            self.assertEqual([entry.position for entry in page['entries']], [3, 4])
+            self.assertEqual(page['entries'][0].university.country.name, 'Hoa Kỳ')
+        self.assertEqual(page['total'], 5)
+        self.assertEqual(get_leaderboard_page(self.cs.id, 9, 2)['entries'], [])
+
+    def test_api_phan_trang(self):
+        url = reverse('university_app:bang_xep_hang_api', args=[self.cs.id])
+        data = self.client.get(url, {'trang': 3, 'page_size': 2}).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['chuyen_nganh']['ten_chuyen_nganh'], 'Computer Science')
+        self.assertEqual([item['vi_tri'] for item in data['danh_sach']], [5])
+        self.assertEqual(data['danh_sach'][0]['bac_hoc'], 'Bachelor')
+        self.assertEqual(data['phan_trang']['tong_ket_qua'], 5)
+        self.assertEqual(data['phan_trang']['tong_trang'], 3)
+        self.assertFalse(data['phan_trang']['co_trang_sau'])
+
+        response = self.client.get(reverse('university_app:bang_xep_hang_api', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(reverse('university_app:bang_xep_hang'), {'ma_chuyen_nganh': self.cs.id})
+        self.assertContains(response, 'University 1')
+
+    def setUp(self):
+        # Thay đổi từ setUpTestData không bao giờ commit trong TestCase - bỏ để test bắt đầu sạch
+        leaderboard_service._pending.batch = None
+
+    def test_cap_nhat_chuyen_nganh_sau_commit(self):
+        # Học phí 15k (100 điểm): University 5 lên vị trí 2, chỉ tính lại Computer Science
+        with mock.patch.object(leaderboard_service, 'refresh_major_leaderboard',
+                               wraps=leaderboard_service.refresh_major_leaderboard) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                program = UniversityProgram.objects.get(university=self.universities[4], major=self.cs)
+                program.tuition_fee = 15000
+                program.save()
+                program.duration = '3'
+                program.save()
+        refresh.assert_called_once_with([self.cs.id])
+        entry = MajorLeaderboardEntry.objects.get(major=self.cs, university=self.universities[4])
+        self.assertEqual((entry.position, entry.score), (2, 92.0))
+
+    def test_doi_chuyen_nganh_cap_nhat_ca_chuyen_nganh_cu(self):
+        business = Major.objects.get(name='Business')
+        with self.captureOnCommitCallbacks(execute=True):
+            program = UniversityProgram.objects.get(university=self.universities[0], major=self.cs)
+            program.major = business
+            program.save()
+        self.assertFalse(MajorLeaderboardEntry.objects.filter(university_program=program, major=self.cs).exists())
+        self.assertEqual(MajorLeaderboardEntry.objects.filter(major=self.cs).count(), 4)
+        self.assertEqual(
+            MajorLeaderboardEntry.objects.get(major=self.cs, position=1).university_id, self.universities[1].id
+        )
+        self.assertTrue(MajorLeaderboardEntry.objects.filter(university_program=program, major=business).exists())
+
+    def test_rollback_khong_de_lai_thay_doi(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Criteria.objects.create(name='TOEFL')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+
+        with mock.patch.object(leaderboard_service, 'refresh_major_leaderboard') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                UniversityProgram.objects.get(university=self.universities[0], major=self.cs).save()
+        refresh.assert_called_once_with([self.cs.id])
+
+
+class LayDuLieuTruongTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tao_du_lieu_mau(so_truong=8)
+
+    def test_giu_nguyen_cau_truc_truong_data(self):
+        ket_qua = AIAnalysisService()._lay_du_lieu_truong_tu_db(
+            [{'ten_truong': 'University 1', 'co_hoc_bong': True}, {'ten_truong': 'Không tồn tại XYZ'}],
+            'computer'
+        )
+        self.assertEqual(ket_qua, [{
+            'ten_truong': 'University 1', 'quoc_gia': 'Hoa Kỳ', 'xep_hang_the_gioi': 10,
+            'hoc_phi': 21000, 'nam_thanh_lap': 1801, 'thoi_gian_hoc': '4', 'cap_do': 'Bachelor',
+            'yeu_cau_tuyen_sinh': {'IELTS': '6.5', 'GPA': '3.5'}, 'website': 'u1.edu',
+            'ty_le_chap_nhan': 0, 'co_hoc_bong': True,
+        }])
+
+    def test_so_query_khong_phu_thuoc_so_truong(self):
+        service = AIAnalysisService()
+        for so_truong in (2, 8):
+            truong = [{'ten_truong': f'University {i}'} for i in range(1, so_truong + 1)]
+            # tìm tên (kèm quốc gia + xếp hạng) + chương trình + yêu cầu tuyển sinh
+            with self.assertNumQueries(3):
+                ket_qua = service._lay_du_lieu_truong_tu_db(truong, 'Business')
+            self.assertEqual([t['ten_truong'] for t in ket_qua], [t['ten_truong'] for t in truong])
+            self.assertEqual(ket_qua[0]['yeu_cau_tuyen_sinh'], {'IELTS': '7.0'})
+
+    def test_ten_viet_tat_va_ten_gan_dung(self):
+        ket_qua = AIAnalysisService()._lay_du_lieu_truong_tu_db(
+            [{'ten_truong': 'U3'}, {'ten_truong': 'Univercity 4'}], 'Computer Science'
+        )
+        self.assertEqual([t['ten_truong'] for t in ket_qua], ['University 3', 'University 4'])
@@ -16,14 +16,24 @@ urlpatterns = [
     path('so-sanh/xoa/', views.clear_comparison, name='clear_comparison'),
     path('so-sanh/toggle/<str:university_name>/', views.toggle_comparison, name='toggle_comparison'),
     path('so-sanh/luu/', views.luu_ket_qua_so_sanh, name='luu_ket_qua_so_sanh'),
+    path('so-sanh/phan-tich/<str:job_id>/', views.phan_tich_ai_api, name='phan_tich_ai_api'),
     
+    # Bảng xếp hạng theo chuyên ngành (tính sẵn)
+    path('bang-xep-hang/', views.bang_xep_hang, name='bang_xep_hang'),
+
     # Trang chi tiết trường (sử dụng tên trường)
     path('truong/<str:ten_truong>/', views.chi_tiet_truong, name='chi_tiet_truong'),
     
     # API endpoints
     path('api/danh-sach-truong/', views.danh_sach_truong_api, name='danh_sach_truong_api'),
+    path('api/truong/<str:ten_truong>/chuong-trinh/', views.chuong_trinh_truong_api, name='chuong_trinh_truong_api'),
+    path('api/bang-xep-hang/<int:major_id>/', views.bang_xep_hang_api, name='bang_xep_hang_api'),
     path('api/chatbot-gemini/', views.chatbot_gemini, name='chatbot_gemini'),
+    path('api/chatbot-gemini/stream/', views.chatbot_gemini_stream, name='chatbot_gemini_stream'),
     path('api/chatbot-gemini/rebuild/', views.rebuild_chatbot_db, name='rebuild_chatbot_db'),
     path('api/chatbot-gemini/stats/', views.chatbot_stats, name='chatbot_stats'),
 
+    # Health check cho load balancer
+    path('healthz/ready', views.healthz_ready, name='healthz_ready'),
+
 ]
\ No newline at end of file
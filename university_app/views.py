@@ -1,14 +1,34 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
-from django.db.models import Q, Avg, Min, Max, Count
+from django.db.models import (
+    Q, Avg, Min, Max, Count, Prefetch, prefetch_related_objects,
+    Exists, OuterRef, Subquery, FloatField, TextField
+)
 from django.core.paginator import Paginator
+from django.core.cache import cache
 from django.db import connection
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
 from .models import (
     University, Major, UniversityAdmissionRequirement, Country, 
     Program, Criteria, Ranking, RankingSource, UniversityProgram
 )
+from .aggregates import GroupConcat, split_group_concat
+from .services.analysis_cache import make_analysis_key, get_cached_analysis, store_analysis
+from .services.analysis_jobs import submit_job, get_job, JOB_DONE, JOB_FAILED, JOB_TIMEOUT
+from .services.chatbot import (
+    get_chatbot_instance, get_warmup_status, retry_failed_warmup, WARMUP_DISABLED, WARMUP_READY
+)
+from .services.data_version import get_data_version, versioned_key
+from .services.leaderboard import get_leaderboard_page
+from .services.llm_gateway import get_llm_gateway, get_llm_metrics
+from .services.prefix_index import get_prefix_index
+from .services.ranking_summary import get_ranking_summary
+from .services.university_search import search_universities
+import hashlib
 import json
 import logging
 from urllib.parse import unquote
@@ -16,32 +36,70 @@ from urllib.parse import unquote
 logger = logging.getLogger(__name__)
 
 def generate_comparison_data(universities, selected_major):
-    """Generate comparison data for universities with selected major"""
+    """
+    Generate comparison data for universities with selected major
+
+    Loads programs, rankings and admission requirements for the whole set in a
+    fixed number of queries (no per-university round-trips).
+    """
     comparison_data = []
-    
+
+    universities = list(universities)
+    if not universities:
+        return comparison_data
+
+    prefetch_related_objects(
+        universities,
+        'country',
+        Prefetch(
+            'universityprogram_set',
+            queryset=UniversityProgram.objects.filter(
+                major__name=selected_major
+            ).select_related('program').order_by('id'),
+            to_attr='selected_programs'
+        ),
+        'ranking_summary',
+    )
+
+    # Get admission requirements for all selected programs in one query
+    program_keys = {
+        (uni.id, uni.selected_programs[0].program_id)
+        for uni in universities if uni.selected_programs
+    }
+    requirements_by_program = {}
+    if program_keys:
+        requirement_rows = UniversityAdmissionRequirement.objects.filter(
+            university_id__in={uni_id for uni_id, _ in program_keys},
+            program_id__in={program_id for _, program_id in program_keys}
+        ).select_related('criteria').order_by('id')
+        for req in requirement_rows:
+            key = (req.university_id, req.program_id)
+            if key in program_keys:
+                requirements_by_program.setdefault(key, []).append(req)
+
     for uni in universities:
         # Get program info for the selected major
-        program = uni.universityprogram_set.filter(major__name=selected_major).first()
-        
-        # Get latest ranking
-        latest_ranking = uni.ranking_set.order_by('-fyear').first()
-        
+        program = uni.selected_programs[0] if uni.selected_programs else None
+
+        # Get latest ranking (precomputed)
+        latest_ranking = get_ranking_summary(uni)
+
         # Get admission requirements for this major/program
         requirements = {}
         if program:
-            for req in uni.universityadmissionrequirement_set.filter(program=program.program):
+            for req in requirements_by_program.get((uni.id, program.program_id), []):
                 requirements[req.criteria.name] = {
                     'value': req.value,
                     'unit': req.criteria.unit if req.criteria else ''
                 }
-        
+
         uni_data = {
             'ten_truong': uni.name,
             'quoc_gia': uni.country.name if uni.country else 'Unknown',
             'nam_thanh_lap': uni.founded_year,
             'website': uni.website,
-            'xep_hang_the_gioi': latest_ranking.frank if latest_ranking else None,
-            'nguon_xep_hang': latest_ranking.ranking_sources.name if latest_ranking and latest_ranking.ranking_sources else 'N/A',
+            'xep_hang_the_gioi': latest_ranking.latest_rank if latest_ranking else None,
+            'nguon_xep_hang': (latest_ranking.latest_source or 'N/A') if latest_ranking else 'N/A',
             'hoc_phi': program.tuition_fee if program else None,
             'thoi_gian_hoc': program.duration if program else None,
             'cap_do': program.program.level if program and program.program else None,
@@ -51,20 +109,28 @@ def generate_comparison_data(universities, selected_major):
     
     return comparison_data
 
-def generate_ai_analysis(comparison_data, selected_major):
-    """Generate AI analysis for comparison using Gemini"""
+# Tăng khi sửa prompt bên dưới để cache phân tích cũ không còn được dùng
+AI_ANALYSIS_PROMPT_VERSION = 1
+
+
+def generate_ai_analysis(comparison_data, selected_major, university_ids=None, check_cache=True, raise_errors=False):
+    """
+    Generate AI analysis for comparison using Gemini (cached per comparison set)
+
+    raise_errors=True (job nền): raise khi Gemini lỗi thay vì trả phân tích dự phòng,
+    để job được đánh dấu FAILED và lần sau chạy lại
+    """
     if not comparison_data:
         return ""
 
-    try:
-        # Import Gemini
-        import google.generativeai as genai
-        from django.conf import settings
-
-        # Configure Gemini (using same model as chatbot)
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        model = genai.GenerativeModel('models/gemini-2.5-flash')
+    cache_key = None
+    if university_ids:
+        cache_key = make_analysis_key(university_ids, selected_major, AI_ANALYSIS_PROMPT_VERSION)
+        cached = get_cached_analysis(cache_key) if check_cache else None
+        if cached is not None:
+            return cached
 
+    try:
         # Chuẩn bị dữ liệu cho Gemini
         prompt = f"""Bạn là chuyên gia tư vấn du học. Phân tích và so sánh các trường đại học sau đây cho chuyên ngành {selected_major}.
 
@@ -147,18 +213,25 @@ FORMAT:
 - Trả lời BẰNG TIẾNG VIỆT
 - Phân tích CHUYÊN SÂU, THỰC CHẤT, dựa trên DATA đã cung cấp"""
 
-        # Gọi Gemini API
-        response = model.generate_content(prompt)
+        # Gọi Gemini qua cổng LLM dùng chung (same model as chatbot), chờ tối đa bằng thời hạn của job
+        text = get_llm_gateway().generate(prompt, timeout=settings.AI_ANALYSIS_JOB_TIMEOUT)
 
-        if response and response.text:
-            analysis = response.text.strip()
+        if text:
+            analysis = text.strip()
             analysis += "\n\n✨ Phân tích được tạo bởi Gemini AI"
+            # Chỉ lưu kết quả thật từ Gemini, không lưu phân tích dự phòng
+            if cache_key:
+                store_analysis(cache_key, university_ids, selected_major, analysis)
             return analysis
         else:
             logger.warning("Gemini API returned empty response")
+            if raise_errors:
+                raise ValueError('Gemini API returned empty response')
             return _generate_fallback_analysis(comparison_data, selected_major)
 
     except Exception as e:
+        if raise_errors:
+            raise
         logger.error(f"Lỗi khi gọi Gemini API: {str(e)}")
         # Fallback về phân tích thủ công nếu Gemini fail
         return _generate_fallback_analysis(comparison_data, selected_major)
@@ -254,74 +327,72 @@ def get_sample_universities():
     
     
     
+
+def _build_trang_chu_context():
+    """Dữ liệu trang chủ: trường nổi bật và thống kê tổng quan"""
+    # Check if database has data
+    total_universities = University.objects.count()
+    logger.info(f"Homepage: Found {total_universities} universities in database")
+    
+    if total_universities == 0:
+        logger.warning("Homepage: Database has no universities!")
+        # Use sample data when database is empty
+        return {
+            'truong_noi_bat': get_sample_universities(),
+            'thong_ke': {'tong_truong': 0, 'tong_chuyen_nganh': 0, 'tong_quoc_gia': 0}
+        }
+    
+    # Sử dụng Django ORM để lấy top 6 trường đại học (kèm học phí trung bình)
+    top_universities = University.objects.select_related(
+        'country', 'ranking_summary'
+    ).annotate(
+        avg_tuition=Avg('universityprogram__tuition_fee')
+    ).order_by('founded_year')[:6]
+    
+    truong_noi_bat = []
+    
+    for uni in top_universities:
+        # Ranking theo thứ tự ưu tiên QS -> THE -> ARWU -> mới nhất (đã tính sẵn)
+        ranking_summary = get_ranking_summary(uni)
+        
+        # Đảm bảo tên trường không rỗng
+        university_name = uni.name.strip() if uni.name else (uni.short_name or 'Unknown University')
+        if not university_name:
+            university_name = uni.short_name or f'University ID {uni.id}'
+        
+        truong_data = {
+            'ma_truong': uni.short_name or uni.name[:10],
+            'ten_truong': university_name,
+            'quoc_gia': uni.country.name if uni.country else 'Unknown',
+            'mo_ta': (uni.description or 'No description')[:100] + '...',
+            'xep_hang_the_gioi': ranking_summary.best_rank if ranking_summary else None,
+            'hoc_phi': int(uni.avg_tuition) if uni.avg_tuition else None,
+            'co_hoc_bong': True,
+            'hinh_anh': None
+        }
+        truong_noi_bat.append(truong_data)
+    
+    # Thống kê tổng quan sử dụng Django ORM
+    thong_ke = {
+        'tong_truong': total_universities,
+        'tong_chuyen_nganh': Major.objects.count(),
+        'tong_quoc_gia': Country.objects.count()
+    }
+    
+    return {
+        'truong_noi_bat': truong_noi_bat,
+        'thong_ke': thong_ke
+    }
 
 def trang_chu(request):
     """Trang chủ hiển thị các trường đại học nổi bật"""
     try:
-        # Check if database has data
-        total_universities = University.objects.count()
-        logger.info(f"Homepage: Found {total_universities} universities in database")
-        
-        if total_universities == 0:
-            logger.warning("Homepage: Database has no universities!")
-            # Use sample data when database is empty
-            return render(request, 'university_app/trang_chu.html', {
-                'truong_noi_bat': get_sample_universities(),
-                'thong_ke': {'tong_truong': 0, 'tong_chuyen_nganh': 0, 'tong_quoc_gia': 0}
-            })
-        
-        # Sử dụng Django ORM để lấy top 6 trường đại học
-        top_universities = University.objects.select_related('country').order_by('founded_year')[:6]
-        
-        truong_noi_bat = []
-        sample_rankings = [1, 2, 3, 5, 8, 12]
-        
-        for i, uni in enumerate(top_universities):
-            # Lấy ranking theo thứ tự ưu tiên: QS -> THE -> ARWU -> any other
-            preferred_sources = ['QS', 'THE', 'ARWU']
-            best_ranking = None
-            
-            for source in preferred_sources:
-                ranking = uni.ranking_set.filter(ranking_sources__name=source).order_by('-fyear').first()
-                if ranking:
-                    best_ranking = ranking
-                    break
-            
-            # Nếu không có từ các nguồn ưu tiên, lấy ranking mới nhất
-            if not best_ranking:
-                best_ranking = uni.ranking_set.order_by('-fyear').first()
-            
-            # Lấy học phí trung bình từ các chương trình
-            avg_tuition = uni.universityprogram_set.aggregate(avg_fee=Avg('tuition_fee'))['avg_fee']
-            
-            # Đảm bảo tên trường không rỗng
-            university_name = uni.name.strip() if uni.name else (uni.short_name or 'Unknown University')
-            if not university_name:
-                university_name = uni.short_name or f'University ID {uni.id}'
-            
-            truong_data = {
-                'ma_truong': uni.short_name or uni.name[:10],
-                'ten_truong': university_name,
-                'quoc_gia': uni.country.name if uni.country else 'Unknown',
-                'mo_ta': (uni.description or 'No description')[:100] + '...',
-                'xep_hang_the_gioi': best_ranking.frank if best_ranking else None,
-                'hoc_phi': int(avg_tuition) if avg_tuition else None,
-                'co_hoc_bong': True,
-                'hinh_anh': None
-            }
-            truong_noi_bat.append(truong_data)
-        
-        # Thống kê tổng quan sử dụng Django ORM
-        thong_ke = {
-            'tong_truong': University.objects.count(),
-            'tong_chuyen_nganh': Major.objects.count(),
-            'tong_quoc_gia': Country.objects.count()
-        }
-        
-        context = {
-            'truong_noi_bat': truong_noi_bat,
-            'thong_ke': thong_ke
-        }
+        # Cache theo phiên bản dữ liệu - tự hết hiệu lực khi admin sửa dữ liệu
+        cache_key = versioned_key('trang_chu')
+        context = cache.get(cache_key)
+        if context is None:
+            context = _build_trang_chu_context()
+            cache.set(cache_key, context)
         
         return render(request, 'university_app/trang_chu.html', context)
         
@@ -392,6 +463,18 @@ def tim_kiem(request):
             'danh_sach_chuyen_nganh': []
         })
 
+# Số trường mỗi trang trong kết quả tìm kiếm (frontend có thể đổi qua page_size)
+SEARCH_PAGE_SIZE = 6
+SEARCH_MAX_PAGE_SIZE = 50
+
+def _parse_page_size(value, default=SEARCH_PAGE_SIZE, maximum=SEARCH_MAX_PAGE_SIZE):
+    """Đọc page_size từ query string, giới hạn trong [1, maximum]"""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, maximum))
+
 def ket_qua_tim_kiem(request):
     """API trả về kết quả tìm kiếm"""
     try:
@@ -400,16 +483,23 @@ def ket_qua_tim_kiem(request):
         quoc_gia = request.GET.get('quoc_gia', '').strip()
         chuyen_nganh_id = request.GET.get('ma_chuyen_nganh', '').strip()
         trang = int(request.GET.get('trang', 1))
-        
-        # Query cơ bản
-        queryset = University.objects.select_related('country')
-        
-        # Lọc theo từ khóa
-        if tu_khoa:
-            queryset = queryset.filter(
-                Q(name__icontains=tu_khoa) | 
-                Q(short_name__icontains=tu_khoa)
-            )
+        page_size = _parse_page_size(request.GET.get('page_size'))
+        
+        # Query cơ bản: xếp hạng trung bình và danh sách chuyên ngành tính bằng subquery
+        # để mỗi trang chỉ tốn 2 query (COUNT + trang hiện tại) bất kể page_size
+        avg_ranking = Ranking.objects.filter(
+            university_id=OuterRef('pk')
+        ).values('university_id').annotate(avg_rank=Avg('frank')).values('avg_rank')
+        major_names = UniversityProgram.objects.filter(
+            university_id=OuterRef('pk')
+        ).values('university_id').annotate(
+            major_names=GroupConcat('major__name')
+        ).values('major_names')
+        
+        queryset = University.objects.select_related('country').annotate(
+            avg_rank=Subquery(avg_ranking, output_field=FloatField()),
+            major_names=Subquery(major_names, output_field=TextField())
+        )
         
         # Lọc theo quốc gia
         if quoc_gia:
@@ -419,27 +509,41 @@ def ket_qua_tim_kiem(request):
         if chuyen_nganh_id:
             try:
                 # Lọc các trường có chương trình với chuyên ngành này
-                queryset = queryset.filter(
-                    universityprogram__major_id=int(chuyen_nganh_id)
-                ).distinct()
+                queryset = queryset.filter(Exists(
+                    UniversityProgram.objects.filter(
+                        university_id=OuterRef('pk'),
+                        major_id=int(chuyen_nganh_id)
+                    )
+                ))
             except ValueError:
                 pass
         
-        # Sắp xếp
-        queryset = queryset.order_by('name')
-        
-        # Phân trang
-        paginator = Paginator(queryset, 6)
-        page_obj = paginator.get_page(trang)
+        if tu_khoa:
+            # Lọc theo từ khóa (trigram, không phân biệt dấu, xếp theo độ tương đồng).
+            # Không đưa toàn bộ id khớp vào SQL (IN + ORDER BY CASE vượt giới hạn 2100 tham số
+            # của SQL Server): lấy id thỏa bộ lọc, giao ở Python giữ thứ tự độ tương đồng,
+            # rồi chỉ nạp các trường của trang hiện tại
+            allowed_ids = set(queryset.values_list('pk', flat=True))
+            matched_ids = [
+                university_id for university_id, _ in search_universities(tu_khoa, limit=None)
+                if university_id in allowed_ids
+            ]
+            paginator = Paginator(matched_ids, page_size)
+            page_obj = paginator.get_page(trang)
+            positions = {university_id: position for position, university_id in enumerate(page_obj)}
+            universities = sorted(
+                queryset.filter(pk__in=positions), key=lambda uni: positions[uni.pk]
+            ) if positions else []
+        else:
+            paginator = Paginator(queryset.order_by('name'), page_size)
+            page_obj = paginator.get_page(trang)
+            universities = page_obj
         
         # Chuẩn bị dữ liệu trả về
         danh_sach_truong = []
-        for uni in page_obj:
-            # Lấy ranking trung bình
-            avg_ranking = uni.ranking_set.aggregate(avg_rank=Avg('frank'))['avg_rank']
-            
-            # Lấy danh sách chuyên ngành
-            majors = uni.universityprogram_set.select_related('major').values_list('major__name', flat=True).distinct()
+        for uni in universities:
+            # Danh sách chuyên ngành (đã lọc trùng)
+            majors = split_group_concat(uni.major_names)
             
             # Đảm bảo tên trường không rỗng
             university_name = uni.name.strip() if uni.name else (uni.short_name or 'Unknown University')
@@ -451,8 +555,8 @@ def ket_qua_tim_kiem(request):
                 'ma_truong': uni.short_name or uni.name[:10],
                 'ten_truong': university_name,
                 'quoc_gia': uni.country.name if uni.country else 'Unknown',
-                'xep_hang_the_gioi': int(avg_ranking) if avg_ranking else 'N/A',
-                'chuyen_nganh': ', '.join(list(majors)[:3]) + ('...' if len(majors) > 3 else '')
+                'xep_hang_the_gioi': int(uni.avg_rank) if uni.avg_rank else 'N/A',
+                'chuyen_nganh': ', '.join(majors[:3]) + ('...' if len(majors) > 3 else '')
             })
         
         return JsonResponse({
@@ -461,6 +565,7 @@ def ket_qua_tim_kiem(request):
                 'trang_hien_tai': page_obj.number,
                 'tong_trang': paginator.num_pages,
                 'tong_ket_qua': paginator.count,
+                'kich_thuoc_trang': page_size,
                 'co_trang_truoc': page_obj.has_previous(),
                 'co_trang_sau': page_obj.has_next()
             }
@@ -475,6 +580,7 @@ def ket_qua_tim_kiem(request):
                 'trang_hien_tai': 1,
                 'tong_trang': 0,
                 'tong_ket_qua': 0,
+                'kich_thuoc_trang': SEARCH_PAGE_SIZE,
                 'co_trang_truoc': False,
                 'co_trang_sau': False
             }
@@ -531,48 +637,13 @@ def so_sanh(request):
                 request.session['comparison_list'] = comparison_list
                 messages.success(request, f'Đã xóa "{university_name}" khỏi danh sách so sánh.')
         
-        # FIX: Get common majors for universities in comparison list
-        common_majors = []
-        selected_major = request.GET.get('ma_chuyen_nganh', '').strip()
-        comparison_results = {}
-        ai_analysis = ""
-        
-        if len(comparison_list) >= 2:
-            # Find universities in the comparison list
-            universities_in_comparison = University.objects.filter(
-                Q(name__in=comparison_list) | Q(short_name__in=comparison_list)
-            )
-            
-            if universities_in_comparison.exists():
-                # Get all majors for the first university
-                first_uni = universities_in_comparison.first()
-                first_uni_majors = set(
-                    first_uni.universityprogram_set.values_list('major__name', flat=True)
-                )
-                
-                # Find majors that exist in ALL universities
-                for uni in universities_in_comparison:
-                    uni_majors = set(
-                        uni.universityprogram_set.values_list('major__name', flat=True)
-                    )
-                    first_uni_majors = first_uni_majors.intersection(uni_majors)
-                
-                # Get the actual major objects
-                if first_uni_majors:
-                    common_majors = Major.objects.filter(name__in=first_uni_majors).order_by('name')
-                
-                # If major is selected, generate comparison
-                if selected_major and selected_major in first_uni_majors:
-                    comparison_results = generate_comparison_data(universities_in_comparison, selected_major)
-                    ai_analysis = generate_ai_analysis(comparison_results, selected_major)
-        
-        # Lấy thông tin chi tiết các trường trong danh sách so sánh
-        danh_sach_truong = []
+        # Tập trường so sánh được lấy một lần cho cả request và dùng lại ở các bước sau
+        universities = []
         if comparison_list:
             logger.info(f"Looking up universities for comparison: {comparison_list}")
-            
+
             # Tìm kiếm bằng cả name và short_name
-            universities = University.objects.filter(
+            universities = list(University.objects.filter(
                 Q(name__in=comparison_list) | Q(short_name__in=comparison_list)
             ).select_related('country').prefetch_related(
                 'ranking_set__ranking_sources',
@@ -580,61 +651,95 @@ def so_sanh(request):
                 'universityprogram_set__program',
                 'universityadmissionrequirement_set__criteria',
                 'universityadmissionrequirement_set__program'
-            )
+            ))
+
+            logger.info(f"Found {len(universities)} universities for comparison")
+
+        # FIX: Get common majors for universities in comparison list
+        common_majors = []
+        selected_major = request.GET.get('ma_chuyen_nganh', '').strip()
+        comparison_results = {}
+        ai_analysis = ""
+        ai_job_id = None
+        
+        if len(comparison_list) >= 2 and universities:
+            # Ngành có ở TẤT CẢ các trường: GROUP BY ngành HAVING COUNT(DISTINCT trường) = N
+            university_ids = [uni.id for uni in universities]
+            common_majors = list(Major.objects.filter(
+                universityprogram__university_id__in=university_ids
+            ).annotate(
+                so_truong=Count('universityprogram__university', distinct=True)
+            ).filter(so_truong=len(university_ids)).order_by('name'))
+            common_major_names = {major.name for major in common_majors}
+            
+            # If major is selected, generate comparison
+            if selected_major and selected_major in common_major_names:
+                comparison_results = generate_comparison_data(universities, selected_major)
+                # Có cache thì hiển thị ngay, chưa có thì phân tích nền - trang không chờ Gemini
+                ai_job_id = make_analysis_key(university_ids, selected_major, AI_ANALYSIS_PROMPT_VERSION)
+                ai_analysis = get_cached_analysis(ai_job_id) or ""
+                if ai_analysis:
+                    ai_job_id = None
+                else:
+                    submit_job(
+                        ai_job_id, generate_ai_analysis,
+                        comparison_results, selected_major, university_ids, False, True,
+                        fallback=_generate_fallback_analysis(comparison_results, selected_major)
+                    )
+        
+        # Lấy thông tin chi tiết các trường trong danh sách so sánh
+        danh_sach_truong = []
+        for uni in universities:
+            # Lấy ranking
+            rankings = {}
+            for ranking in uni.ranking_set.all():
+                source_name = ranking.ranking_sources.name if ranking.ranking_sources else 'Unknown'
+                if source_name not in rankings:
+                    rankings[source_name] = []
+                rankings[source_name].append({
+                    'year': ranking.fyear,
+                    'rank': ranking.frank
+                })
             
-            logger.info(f"Found {universities.count()} universities for comparison")
+            # Lấy chương trình học
+            programs = {}
+            for prog in uni.universityprogram_set.all():
+                program_name = prog.program.name if prog.program else 'Unknown'
+                if program_name not in programs:
+                    programs[program_name] = []
+                programs[program_name].append({
+                    'major': prog.major.name if prog.major else 'Unknown',
+                    'tuition_fee': prog.tuition_fee,
+                    'duration': prog.duration
+                })
             
-            for uni in universities:
-                # Lấy ranking
-                rankings = {}
-                for ranking in uni.ranking_set.all():
-                    source_name = ranking.ranking_sources.name if ranking.ranking_sources else 'Unknown'
-                    if source_name not in rankings:
-                        rankings[source_name] = []
-                    rankings[source_name].append({
-                        'year': ranking.fyear,
-                        'rank': ranking.frank
-                    })
+            # Lấy yêu cầu tuyển sinh
+            requirements = {}
+            for req in uni.universityadmissionrequirement_set.all():
+                criteria_name = req.criteria.name if req.criteria else 'Unknown'
+                program_name = req.program.name if req.program else 'General'
                 
-                # Lấy chương trình học
-                programs = {}
-                for prog in uni.universityprogram_set.all():
-                    program_name = prog.program.name if prog.program else 'Unknown'
-                    if program_name not in programs:
-                        programs[program_name] = []
-                    programs[program_name].append({
-                        'major': prog.major.name if prog.major else 'Unknown',
-                        'tuition_fee': prog.tuition_fee,
-                        'duration': prog.duration
-                    })
+                if program_name not in requirements:
+                    requirements[program_name] = {}
                 
-                # Lấy yêu cầu tuyển sinh
-                requirements = {}
-                for req in uni.universityadmissionrequirement_set.all():
-                    criteria_name = req.criteria.name if req.criteria else 'Unknown'
-                    program_name = req.program.name if req.program else 'General'
-                    
-                    if program_name not in requirements:
-                        requirements[program_name] = {}
-                    
-                    requirements[program_name][criteria_name] = {
-                        'value': req.value,
-                        'unit': req.criteria.unit if req.criteria else ''
-                    }
-                
-                danh_sach_truong.append({
-                    'ten_truong': uni.name,
-                    'quoc_gia': uni.country.name if uni.country else 'Unknown',
-                    'nam_thanh_lap': uni.founded_year,
-                    'website': uni.website,
-                    'mo_ta': uni.description,
-                    'rankings': rankings,
-                    'programs': programs,
-                    'requirements': requirements
-                })
+                requirements[program_name][criteria_name] = {
+                    'value': req.value,
+                    'unit': req.criteria.unit if req.criteria else ''
+                }
+            
+            danh_sach_truong.append({
+                'ten_truong': uni.name,
+                'quoc_gia': uni.country.name if uni.country else 'Unknown',
+                'nam_thanh_lap': uni.founded_year,
+                'website': uni.website,
+                'mo_ta': uni.description,
+                'rankings': rankings,
+                'programs': programs,
+                'requirements': requirements
+            })
         
-        # Lấy danh sách tất cả trường để chọn
-        all_universities = University.objects.values_list('name', flat=True).order_by('name')
+        # Lấy danh sách tất cả trường để chọn (từ prefix index dùng chung)
+        all_universities = get_prefix_index().all_names
         
         
         
@@ -673,6 +778,7 @@ def so_sanh(request):
             'ma_chuyen_nganh_chon': selected_major,  # Selected major
             'truong_duoc_chon': comparison_results,  # Comparison results
             'ket_qua_ai': ai_analysis,  # AI analysis
+            'ai_job_id': ai_job_id,  # Background AI analysis job (polled by the page)
             'da_co_ket_qua': bool(comparison_results),  # Has comparison results
             'ten_chuyen_nganh': selected_major,  # Major name for display
             'ranking_chart_data': ranking_chart_data,
@@ -698,6 +804,55 @@ def so_sanh(request):
             'ten_chuyen_nganh': ""
         })
 
+# Số chương trình mỗi trang ở trang chi tiết trường / mỗi lần tải thêm qua API
+PROGRAMS_PAGE_SIZE = 2
+PROGRAMS_API_LIMIT = 10
+PROGRAMS_API_MAX_LIMIT = 50
+
+def _university_programs_queryset(university, search_query=''):
+    """Chương trình của trường (lọc theo từ khóa ở database), sắp xếp ổn định theo id"""
+    queryset = UniversityProgram.objects.filter(
+        university=university
+    ).select_related('major', 'program').order_by('id')
+    if search_query:
+        queryset = queryset.filter(
+            Q(program__name__icontains=search_query) |
+            Q(major__name__icontains=search_query) |
+            Q(program__level__icontains=search_query)
+        )
+    return queryset
+
+def _hydrate_programs(university, university_programs):
+    """Chuyển một trang chương trình thành dict cho template/API, kèm yêu cầu tuyển sinh (1 query)"""
+    university_programs = list(university_programs)
+    
+    # Gom yêu cầu tuyển sinh theo program_id cho các chương trình trong trang
+    requirements_by_program = {}
+    program_ids = {prog.program_id for prog in university_programs}
+    if program_ids:
+        requirements = UniversityAdmissionRequirement.objects.filter(
+            university=university, program_id__in=program_ids
+        ).select_related('criteria').order_by('id')
+        for req in requirements:
+            requirements_by_program.setdefault(req.program_id, []).append({
+                'criteria': req.criteria.name if req.criteria else 'Unknown',
+                'value': req.value,
+                'unit': req.criteria.unit if req.criteria else ''
+            })
+    
+    programs = []
+    for prog in university_programs:
+        programs.append({
+            'id': prog.id,
+            'program_name': prog.program.name if prog.program else 'Unknown',
+            'major_name': prog.major.name if prog.major else 'Unknown',
+            'tuition_fee': prog.tuition_fee,
+            'duration': prog.duration,
+            'level': prog.program.level if prog.program and prog.program.level else 'Other',
+            'requirements': requirements_by_program.get(prog.program_id, [])
+        })
+    return programs
+
 def chi_tiet_truong(request, ten_truong):
     """Trang chi tiết thông tin trường đại học"""
     try:
@@ -722,25 +877,18 @@ def chi_tiet_truong(request, ten_truong):
                 'error_message': "Cơ sở dữ liệu chưa có dữ liệu trường đại học. Vui lòng liên hệ quản trị viên."
             })
         
+        # Rankings: 1 query (select_related bên trong Prefetch); chương trình được phân trang ở database
+        detail_queryset = University.objects.select_related('country').prefetch_related(
+            Prefetch('ranking_set', queryset=Ranking.objects.select_related('ranking_sources'))
+        )
+        
         # Try to find university with exact name match
         try:
-            university = University.objects.select_related('country').prefetch_related(
-                'ranking_set__ranking_sources',
-                'universityprogram_set__major',
-                'universityprogram_set__program',
-                'universityadmissionrequirement_set__criteria',
-                'universityadmissionrequirement_set__program'
-            ).get(name=ten_truong)
+            university = detail_queryset.get(name=ten_truong)
         except University.DoesNotExist:
             # Try to find with short_name
             try:
-                university = University.objects.select_related('country').prefetch_related(
-                    'ranking_set__ranking_sources',
-                    'universityprogram_set__major',
-                    'universityprogram_set__program',
-                    'universityadmissionrequirement_set__criteria',
-                    'universityadmissionrequirement_set__program'
-                ).get(short_name=ten_truong)
+                university = detail_queryset.get(short_name=ten_truong)
             except University.DoesNotExist:
                 # Log available universities for debugging
                 available_universities = list(University.objects.values_list('name', flat=True)[:10])
@@ -795,85 +943,15 @@ def chi_tiet_truong(request, ten_truong):
                 'year': latest_rankings[first_source]['year']
             }
         
-        # Lấy thông tin chương trình học với yêu cầu tuyển sinh
-        programs = []
-        programs_by_level = {}
-        total_programs = 0
-        average_tuition = 0
-        total_tuition_count = 0
-        
-        # Get all programs for this university
-        university_programs = university.universityprogram_set.all()
+        # Học phí trung bình tính trên tất cả chương trình, không chỉ kết quả tìm kiếm
+        average_tuition = UniversityProgram.objects.filter(
+            university=university
+        ).aggregate(avg_fee=Avg('tuition_fee'))['avg_fee']
         
-        # Apply search filter if search query exists
-        if search_query:
-            university_programs = university_programs.filter(
-                Q(program__name__icontains=search_query) |
-                Q(major__name__icontains=search_query) |
-                Q(program__level__icontains=search_query)
-            )
-        
-        for prog in university_programs:
-            level = prog.program.level if prog.program and prog.program.level else 'Other'
-            
-            # Get admission requirements for this program
-            program_requirements = []
-            for req in university.universityadmissionrequirement_set.filter(program=prog.program):
-                program_requirements.append({
-                    'criteria': req.criteria.name if req.criteria else 'Unknown',
-                    'value': req.value,
-                    'unit': req.criteria.unit if req.criteria else ''
-                })
-            
-            # Add to flattened list for template
-            program_data = {
-                'program_name': prog.program.name if prog.program else 'Unknown',
-                'major_name': prog.major.name if prog.major else 'Unknown',
-                'tuition_fee': prog.tuition_fee,
-                'duration': prog.duration,
-                'level': level,
-                'requirements': program_requirements  # Add admission requirements
-            }
-            programs.append(program_data)
-            
-            # Calculate average tuition
-            if prog.tuition_fee:
-                average_tuition += prog.tuition_fee
-                total_tuition_count += 1
-            
-            # Keep the by_level structure for other uses
-            if level not in programs_by_level:
-                programs_by_level[level] = []
-            programs_by_level[level].append(program_data)
-            total_programs += 1
-        
-        # Calculate final average tuition (based on all programs, not just search results)
-        all_programs = university.universityprogram_set.all()
-        all_tuitions = [p.tuition_fee for p in all_programs if p.tuition_fee]
-        if all_tuitions:
-            average_tuition = sum(all_tuitions) / len(all_tuitions)
-        else:
-            average_tuition = None
-        
-        # Add pagination for programs (2 per page)
-        from django.core.paginator import Paginator
-        paginator = Paginator(programs, 2)  # 2 programs per page
+        # Phân trang ở database: chỉ trang đang xem mới được lấy kèm yêu cầu tuyển sinh
+        paginator = Paginator(_university_programs_queryset(university, search_query), PROGRAMS_PAGE_SIZE)
         page_obj = paginator.get_page(page_number)
-        
-        # Lấy yêu cầu tuyển sinh
-        admission_requirements = {}
-        
-        for req in university.universityadmissionrequirement_set.all():
-            program_name = req.program.name if req.program else 'General'
-            
-            if program_name not in admission_requirements:
-                admission_requirements[program_name] = []
-            
-            admission_requirements[program_name].append({
-                'criteria': req.criteria.name if req.criteria else 'Unknown',
-                'value': req.value,
-                'unit': req.criteria.unit if req.criteria else ''
-            })
+        page_obj.object_list = _hydrate_programs(university, page_obj.object_list)
         
         # Chuẩn bị context
         context = {
@@ -888,11 +966,9 @@ def chi_tiet_truong(request, ten_truong):
             'xep_hang': latest_rankings,
             'best_ranking': best_ranking_info,  # Add best ranking for consistent display
             'lich_su_xep_hang': rankings,
-            'chuong_trinh_hoc': programs_by_level,
             'programs': page_obj,  # FIX: Add paginated programs
-            'tong_chuong_trinh': total_programs,
+            'tong_chuong_trinh': paginator.count,
             'average_tuition': average_tuition,  # FIX: Add average tuition
-            'yeu_cau_tuyen_sinh': admission_requirements,
             'has_pagination': paginator.num_pages > 1,  # Add pagination flag
             'search_query': search_query,  # Add search query for template
             'comparison_list': request.session.get('comparison_list', [])
@@ -912,15 +988,198 @@ def chi_tiet_truong(request, ten_truong):
             'error_message': "Có lỗi xảy ra khi tải thông tin trường."
         })
 
+def chuong_trinh_truong_api(request, ten_truong):
+    """
+    API phân trang chương trình học của trường cho infinite scroll (keyset theo id)
+
+    Query params:
+        after: id chương trình cuối cùng đã nhận (bỏ trống cho trang đầu)
+        limit: số chương trình mỗi lần (mặc định 10, tối đa 50)
+        search: lọc theo tên chương trình / chuyên ngành / cấp độ
+    """
+    try:
+        ten_truong = unquote(ten_truong)
+        university = (
+            University.objects.filter(name=ten_truong).first() or
+            University.objects.filter(short_name=ten_truong).first()
+        )
+        if not university:
+            return JsonResponse({
+                'success': False,
+                'message': f"Không tìm thấy trường '{ten_truong}'"
+            }, status=404)
+        
+        limit = _parse_page_size(
+            request.GET.get('limit'), default=PROGRAMS_API_LIMIT, maximum=PROGRAMS_API_MAX_LIMIT
+        )
+        queryset = _university_programs_queryset(university, request.GET.get('search', '').strip())
+        
+        after = request.GET.get('after', '').strip()
+        if after:
+            try:
+                queryset = queryset.filter(id__gt=int(after))
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Tham số after không hợp lệ'
+                }, status=400)
+        
+        # Lấy dư 1 bản ghi để biết còn trang sau hay không (không cần COUNT)
+        rows = list(queryset[:limit + 1])
+        has_more = len(rows) > limit
+        programs = _hydrate_programs(university, rows[:limit])
+        
+        return JsonResponse({
+            'success': True,
+            'programs': programs,
+            'next_after': programs[-1]['id'] if has_more else None,
+            'has_more': has_more
+        })
+        
+    except Exception as e:
+        logger.error(f"Lỗi API chương trình học: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi tải chương trình học.'
+        })
+
+# Autocomplete: số gợi ý mặc định / tối đa mỗi lần gọi
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+def _danh_sach_truong_etag(request):
+    """ETag theo phiên bản dữ liệu + tham số, trình duyệt dùng lại response khi chưa đổi"""
+    tham_so = f"{request.GET.get('q', '')}|{request.GET.get('limit', '')}"
+    return f"{get_data_version()}-{hashlib.md5(tham_so.encode('utf-8')).hexdigest()[:12]}"
+
+@etag(_danh_sach_truong_etag)
+@cache_control(public=True, max_age=60)
 def danh_sach_truong_api(request):
-    """API trả về danh sách tên trường cho autocomplete"""
+    """
+    API trả về danh sách tên trường cho autocomplete
+
+    Query params:
+        q: tiền tố tên trường / tên viết tắt (không phân biệt dấu)
+        limit: số gợi ý tối đa (mặc định 10, tối đa 50)
+    Không có q và limit: trả về toàn bộ danh sách như trước.
+    """
     try:
-        universities = University.objects.values_list('name', flat=True).order_by('name')
-        return JsonResponse(list(universities), safe=False)
+        index = get_prefix_index()
+        q = request.GET.get('q', '').strip()
+        if not q and 'limit' not in request.GET:
+            return JsonResponse(index.all_names, safe=False)
+
+        limit = _parse_page_size(
+            request.GET.get('limit'), default=AUTOCOMPLETE_LIMIT, maximum=AUTOCOMPLETE_MAX_LIMIT
+        )
+        return JsonResponse(index.search(q, limit=limit), safe=False)
     except Exception as e:
         logger.error(f"Lỗi API danh sách trường: {str(e)}")
         return JsonResponse([], safe=False)
 
+# Bảng xếp hạng chuyên ngành: số chương trình mỗi trang mặc định / tối đa
+LEADERBOARD_PAGE_SIZE = 20
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+def _parse_page_number(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+def _leaderboard_entry_data(entry):
+    return {
+        'vi_tri': entry.position,
+        'ten_truong': entry.university.name,
+        'quoc_gia': entry.university.country.name if entry.university.country else 'Unknown',
+        'bac_hoc': entry.university_program.program.level if entry.university_program.program else 'N/A',
+        'diem_tong_hop': entry.score,
+        'diem_thanh_phan': {
+            'xep_hang': entry.rank_score,
+            'hoc_phi': entry.tuition_score,
+            'yeu_cau': entry.requirement_score
+        },
+        'xep_hang_the_gioi': entry.latest_rank,
+        'hoc_phi': entry.tuition_fee,
+        'ielts': entry.ielts
+    }
+
+def _leaderboard_data(major_id, trang, page_size):
+    """Một trang bảng xếp hạng đã tính sẵn (range scan theo vị trí, không tính lại điểm)"""
+    page = get_leaderboard_page(major_id, trang, page_size)
+    tong_trang = (page['total'] + page_size - 1) // page_size
+    return {
+        'danh_sach': [_leaderboard_entry_data(entry) for entry in page['entries']],
+        'phan_trang': {
+            'trang_hien_tai': trang,
+            'tong_trang': tong_trang,
+            'tong_ket_qua': page['total'],
+            'kich_thuoc_trang': page_size,
+            'co_trang_truoc': trang > 1,
+            'co_trang_sau': trang < tong_trang
+        }
+    }
+
+def bang_xep_hang_api(request, major_id):
+    """
+    API bảng xếp hạng điểm tổng hợp của một chuyên ngành
+
+    Query params:
+        trang: số trang (mặc định 1)
+        page_size: số chương trình mỗi trang (mặc định 20, tối đa 100)
+    """
+    try:
+        major = Major.objects.filter(id=major_id).first()
+        if not major:
+            return JsonResponse({
+                'success': False,
+                'message': f"Không tìm thấy chuyên ngành {major_id}"
+            }, status=404)
+
+        page_size = _parse_page_size(
+            request.GET.get('page_size'), default=LEADERBOARD_PAGE_SIZE, maximum=LEADERBOARD_MAX_PAGE_SIZE
+        )
+        data = _leaderboard_data(major.id, _parse_page_number(request.GET.get('trang')), page_size)
+        return JsonResponse({
+            'success': True,
+            'chuyen_nganh': {'ma_chuyen_nganh': major.id, 'ten_chuyen_nganh': major.name},
+            **data
+        })
+
+    except Exception as e:
+        logger.error(f"Lỗi API bảng xếp hạng: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Có lỗi xảy ra khi tải bảng xếp hạng.'
+        })
+
+def bang_xep_hang(request):
+    """Trang bảng xếp hạng theo chuyên ngành"""
+    majors = list(Major.objects.order_by('name'))
+    selected = None
+    major_id = request.GET.get('ma_chuyen_nganh', '').strip()
+    if major_id.isdigit():
+        selected = next((major for major in majors if major.id == int(major_id)), None)
+    if selected is None and majors:
+        selected = majors[0]
+
+    context = {
+        'danh_sach_chuyen_nganh': majors,
+        'chuyen_nganh': selected,
+        'danh_sach': [],
+        'phan_trang': None
+    }
+    if selected is not None:
+        try:
+            context.update(_leaderboard_data(
+                selected.id, _parse_page_number(request.GET.get('trang')), LEADERBOARD_PAGE_SIZE
+            ))
+        except Exception as e:
+            logger.error(f"Lỗi trang bảng xếp hạng: {str(e)}")
+            messages.error(request, "Có lỗi xảy ra khi tải bảng xếp hạng.")
+
+    return render(request, 'university_app/bang_xep_hang.html', context)
+
 def clear_comparison(request):
     """Xóa danh sách so sánh"""
     request.session['comparison_list'] = []
@@ -1000,46 +1259,22 @@ def luu_ket_qua_so_sanh(request):
         'message': 'Phương thức không được hỗ trợ.'
     })
 
-# ============================================================================
-# SINGLETON CHATBOT INSTANCE (Memory Optimization for 1GB RAM limit)
-# ============================================================================
-# Create chatbot instance ONCE and reuse for all requests
-# This prevents loading 800MB of ML models on every single request
-_chatbot_instance = None
-_chatbot_lock = None
-
-def get_chatbot_instance():
-    """
-    Get or create global chatbot instance (thread-safe singleton)
-
-    Returns:
-        GeminiChatbotRAG: Singleton chatbot instance
-    """
-    global _chatbot_instance, _chatbot_lock
 
-    # Initialize lock on first call
-    if _chatbot_lock is None:
-        import threading
-        _chatbot_lock = threading.Lock()
-
-    # Double-check locking pattern for thread safety
-    if _chatbot_instance is None:
-        with _chatbot_lock:
-            if _chatbot_instance is None:
-                from .services.gemini_rag import GeminiChatbotRAG
-
-                logger.info("=" * 60)
-                logger.info("🤖 Initializing chatbot instance for the FIRST time...")
-                logger.info("   This will load ~800MB of ML models into RAM")
-                logger.info("   Subsequent requests will REUSE this instance")
-                logger.info("=" * 60)
-
-                _chatbot_instance = GeminiChatbotRAG()
-
-                logger.info("✅ Chatbot instance created and cached!")
-                logger.info("   Ready to serve requests")
+def phan_tich_ai_api(request, job_id):
+    """API trạng thái job phân tích AI của trang so sánh (trang poll đến khi xong)"""
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Không tìm thấy yêu cầu phân tích.'
+        }, status=404)
 
-    return _chatbot_instance
+    finished = job['status'] in (JOB_DONE, JOB_FAILED, JOB_TIMEOUT)
+    return JsonResponse({
+        'success': True,
+        'status': job['status'],
+        'analysis': job['result'] if finished else None
+    })
 
 def chatbot_gemini(request):
     """API cho chatbot Gemini RAG - 100% MIỄN PHÍ (with singleton optimization)"""
@@ -1081,17 +1316,63 @@ def chatbot_gemini(request):
         'message': 'Chỉ chấp nhận POST request'
     })
 
+def _sse_event(event, data):
+    """Định dạng một Server-Sent Event (data mã hóa JSON để giữ nguyên xuống dòng)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def chatbot_gemini_stream(request):
+    """API chatbot Gemini trả lời dạng stream (Server-Sent Events)"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Chỉ chấp nhận POST request'
+        })
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Dữ liệu không hợp lệ'
+        }, status=400)
+
+    user_message = data.get('message', '').strip()
+    if not user_message:
+        return JsonResponse({
+            'success': False,
+            'message': 'Vui lòng nhập câu hỏi'
+        })
+
+    def event_stream():
+        try:
+            chatbot = get_chatbot_instance()
+            for event, text in chatbot.chat_stream(user_message):
+                yield _sse_event(event, text)
+        except MemoryError:
+            logger.error("❌ Out of memory when initializing or using chatbot")
+            yield _sse_event('error', 'Chatbot tạm thời quá tải do giới hạn RAM. Vui lòng thử lại sau hoặc liên hệ admin để nâng cấp server.')
+        except Exception as e:
+            logger.error(f"Lỗi chatbot Gemini stream API: {str(e)}")
+            yield _sse_event('error', f'Lỗi: {str(e)}')
+        yield _sse_event('done', '')
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # Tắt buffer của reverse proxy (nginx) để token đến client ngay
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 def rebuild_chatbot_db(request):
     """API để rebuild vector database (chỉ cho admin)"""
     if request.method == 'POST':
         try:
-            from .services.gemini_rag import GeminiChatbotRAG
-
             # TODO: Thêm authentication check cho admin
             # if not request.user.is_staff:
             #     return JsonResponse({'success': False, 'message': 'Không có quyền truy cập'})
 
-            chatbot = GeminiChatbotRAG()
+            # Dùng instance chung, không nạp thêm một bản model
+            chatbot = get_chatbot_instance()
             success = chatbot.rebuild_database()
 
             if success:
@@ -1122,9 +1403,8 @@ def rebuild_chatbot_db(request):
 def chatbot_stats(request):
     """API lấy thống kê vector database"""
     try:
-        from .services.gemini_rag import GeminiChatbotRAG
-
-        chatbot = GeminiChatbotRAG()
+        # Dùng instance chung, không nạp thêm một bản model
+        chatbot = get_chatbot_instance()
         stats = chatbot.get_stats()
 
         if stats:
@@ -1132,6 +1412,7 @@ def chatbot_stats(request):
             total_in_sql = University.objects.count()
             stats['total_in_sql'] = total_in_sql
             stats['coverage_percent'] = round((stats['total_universities'] / total_in_sql * 100), 2) if total_in_sql > 0 else 0
+            stats['llm_gateway'] = get_llm_metrics()
 
             return JsonResponse({
                 'success': True,
@@ -1164,4 +1445,19 @@ def chatbot_stats(request):
 
 
 
-    
\ No newline at end of file
+    
+
+
+def healthz_ready(request):
+    """
+    Readiness cho load balancer: 503 khi worker đang làm nóng chatbot hoặc làm nóng lỗi
+
+    Làm nóng lỗi được thử lại sau WARMUP_RETRY_SECONDS; worker chỉ sẵn sàng khi làm nóng
+    xong, hoặc khi tắt làm nóng (CHATBOT_WARMUP_ON_BOOT=False).
+    """
+    retry_failed_warmup()
+    status = get_warmup_status()
+    ready = status['state'] in (WARMUP_DISABLED, WARMUP_READY)
+    response = JsonResponse({'ready': ready, 'warmup': status}, status=200 if ready else 503)
+    response['Cache-Control'] = 'no-store'
+    return response
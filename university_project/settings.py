@@ -93,6 +93,41 @@ else:
         }
     }
 
+# Cache configuration
+# - locmem: mỗi worker một cache riêng (mặc định khi DEBUG)
+# - file: chia sẻ giữa các gunicorn worker trên cùng máy (mặc định production)
+# - redis: cache dùng chung giữa nhiều máy, bật bằng REDIS_URL
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('REDIS_URL') else ('locmem' if DEBUG else 'file'))
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '3600'))
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'KEY_PREFIX': 'university',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', os.path.join(BASE_DIR, 'cache_data')),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'KEY_PREFIX': 'university',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'university-cache',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'KEY_PREFIX': 'university',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -143,9 +178,65 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Test runner tạo bảng cho các model managed=False
+TEST_RUNNER = 'university_project.test_runner.UnmanagedModelTestRunner'
+
 # AI API Configuration - Gemini only
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
+# Cache kết quả phân tích Gemini ở trang so sánh (bảng ai_analysis_cache)
+AI_ANALYSIS_CACHE_TTL = int(os.getenv('AI_ANALYSIS_CACHE_TTL', str(7 * 24 * 3600)))
+AI_ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('AI_ANALYSIS_CACHE_MAX_ENTRIES', '500'))
+
+# Phân tích AI chạy nền trong thread pool riêng, trang so sánh poll kết quả
+AI_ANALYSIS_WORKERS = int(os.getenv('AI_ANALYSIS_WORKERS', '2'))
+AI_ANALYSIS_JOB_TIMEOUT = int(os.getenv('AI_ANALYSIS_JOB_TIMEOUT', '60'))
+
+# Cache câu trả lời chatbot: khớp chính xác (Django cache) + gần nghĩa (trong process)
+CHATBOT_CACHE_TTL = int(os.getenv('CHATBOT_CACHE_TTL', str(6 * 3600)))
+CHATBOT_CACHE_MAX_ENTRIES = int(os.getenv('CHATBOT_CACHE_MAX_ENTRIES', '500'))
+CHATBOT_SEMANTIC_THRESHOLD = float(os.getenv('CHATBOT_SEMANTIC_THRESHOLD', '0.92'))
+# Làm nóng câu hỏi gợi ý tốn lượt gọi Gemini nên mặc định tắt; khi bật chỉ một worker chạy
+CHATBOT_PREWARM_SUGGESTIONS = os.getenv('CHATBOT_PREWARM_SUGGESTIONS', 'False') == 'True'
+
+# Vector index chatbot: số trường sinh document mỗi lô / số document mỗi lần gọi embedding
+CHATBOT_INDEX_CHUNK_SIZE = int(os.getenv('CHATBOT_INDEX_CHUNK_SIZE', '200'))
+CHATBOT_EMBEDDING_BATCH_SIZE = int(os.getenv('CHATBOT_EMBEDDING_BATCH_SIZE', '32'))
+
+# Nạp trước chromadb/genai trong thread nền khi gunicorn worker khởi động (gunicorn.conf.py)
+AI_PRELOAD_DEPENDENCIES = os.getenv('AI_PRELOAD_DEPENDENCIES', 'False') == 'True'
+
+# Truy xuất lai BM25 + vector: số ứng viên mỗi phía / số trường đưa vào prompt
+CHATBOT_RETRIEVAL_CANDIDATES = int(os.getenv('CHATBOT_RETRIEVAL_CANDIDATES', '10'))
+CHATBOT_CONTEXT_UNIVERSITIES = int(os.getenv('CHATBOT_CONTEXT_UNIVERSITIES', '5'))
+# Ngân sách token (ước lượng) cho phần dữ liệu trường trong prompt
+CHATBOT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHATBOT_CONTEXT_TOKEN_BUDGET', '1500'))
+
+# Làm nóng chatbot khi gunicorn worker khởi động (gunicorn.conf.py); /healthz/ready báo trạng thái
+CHATBOT_WARMUP_ON_BOOT = os.getenv('CHATBOT_WARMUP_ON_BOOT', 'False') == 'True'
+
+# Cổng gọi Gemini (services/llm_gateway.py), giới hạn tính theo từng process; LLM_BACKEND=fake để chạy offline
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_RATE_PER_MINUTE = float(os.getenv('LLM_RATE_PER_MINUTE', '10'))
+LLM_BURST = int(os.getenv('LLM_BURST', '3'))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+# Stream: LLM_TIMEOUT tính tới phần đầu tiên; sau đó mỗi phần chờ tối đa IDLE giây, cả stream tối đa MAX_DURATION giây
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv('LLM_STREAM_IDLE_TIMEOUT', '15'))
+LLM_STREAM_MAX_DURATION = float(os.getenv('LLM_STREAM_MAX_DURATION', '180'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+
+# Embedding server dùng chung (python manage.py run_embedding_server); để trống = nạp model trong mỗi worker
+EMBEDDING_SERVER_SOCKET = os.getenv('EMBEDDING_SERVER_SOCKET', '')
+EMBEDDING_SERVER_WAIT = float(os.getenv('EMBEDDING_SERVER_WAIT', '30'))
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv('EMBEDDING_SERVER_TIMEOUT', '120'))
+
+# Backend embedding: sentence-transformers (PyTorch) hoặc onnx-int8 (bản export của download_models.py)
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'sentence-transformers')
+EMBEDDING_ONNX_DIR = os.getenv(
+    'EMBEDDING_ONNX_DIR', str(BASE_DIR / '.cache' / 'onnx' / 'paraphrase-multilingual-MiniLM-L12-v2')
+)
+
 
 # Logging configuration - FIXED encoding issue
 LOGGING = {
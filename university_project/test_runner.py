@@ -0,0 +1,29 @@
+"""
+Test runner cho các model managed=False
+Các bảng nghiệp vụ được tạo bằng lệnh create_tables ở production nên Django
+không tự tạo khi chạy test. Runner này tạo chúng trong test database.
+"""
+from django.apps import apps
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+
+class UnmanagedModelTestRunner(DiscoverRunner):
+    """Tạo bảng cho các model managed=False của university_app trước khi chạy test"""
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+
+        unmanaged_models = [
+            model for model in apps.get_app_config('university_app').get_models()
+            if not model._meta.managed
+        ]
+        for alias in connections:
+            connection = connections[alias]
+            existing_tables = set(connection.introspection.table_names())
+            with connection.schema_editor() as editor:
+                for model in unmanaged_models:
+                    if model._meta.db_table not in existing_tables:
+                        editor.create_model(model)
+
+        return old_config